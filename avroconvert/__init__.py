@@ -4,11 +4,33 @@ __author__ = """Shrinivas Vijay Deshmukh"""
 __email__ = 'shrinivas.deshmukh11@gmail.com'
 __version__ = '0.1.0'
 
+from importlib import import_module
 from os import getenv
 from avroconvert.log_source import Logging
 
 logger = Logging(log_level=getenv('LOG_LEVEL', 'INFO')).get_logger()
 
-from avroconvert.avroconvert import AvroConvert
-from avroconvert.sources import gs_reader, s3_reader, fs_reader
-from avroconvert.execute import Execute
\ No newline at end of file
+# The converter (pyarrow) and the source readers (google cloud
+# storage and boto3) are only imported on first use, so that eg.
+# converting local files does not import the cloud storage clients
+_LAZY_ATTRIBUTES = {
+    'AvroConvert': 'avroconvert.avroconvert',
+    'gs_reader': 'avroconvert.sources',
+    's3_reader': 'avroconvert.sources',
+    'fs_reader': 'avroconvert.sources',
+    'Execute': 'avroconvert.execute',
+}
+
+__all__ = ['logger', *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    value = getattr(import_module(_LAZY_ATTRIBUTES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
@@ -1,59 +1,295 @@
 """Main module."""
 from avroconvert import logger
-import csv
-from fastavro import reader
+from avroconvert.blocks import BlockRangeReader, scan_blocks, split_blocks
+from avroconvert.filters import RecordFilter
+from avroconvert.schema import DEFAULT_BATCH_SIZE, SchemaConverter, project_schema
+from avroconvert.sinks import CompressedWriter, dataset_filesystem, is_remote, open_output
+from contextlib import contextmanager, nullcontext
+from datetime import date, datetime, time
+from fastavro import block_reader, parse_schema
 from io import BytesIO
-from itertools import chain
-from json import dump
-from os.path import join, exists, dirname
-from pandas import DataFrame
+from json import dumps
+from os.path import join, exists, dirname, relpath
 from pathlib import Path
-from pyarrow import Table
-from pyarrow.parquet import write_table
+import pyarrow as pa
+from pyarrow import csv, RecordBatchReader, Table
+from time import perf_counter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DEFAULT_ROW_GROUP_BYTES = 128 * 1024 * 1024
+CSV_BUFFER_SIZE = 8 * 1024 * 1024
+JSONL_BUFFER_SIZE = 8 * 1024 * 1024
+# Number of avro schemas whose mapping to arrow is kept
+SCHEMA_CACHE_SIZE = 128
+PARQUET_COMPRESSIONS = ('none', 'snappy', 'gzip', 'brotli', 'lz4', 'zstd')
+# Codecs of the csv and json outputs, and their file extensions. Brotli
+# is not one of them: brotli decoders do not read concatenated streams,
+# which `avroconvert.sinks.CompressedWriter` writes
+TEXT_COMPRESSIONS = {'gzip': 'gz', 'zstd': 'zst', 'lz4': 'lz4'}
+
+
+def check_compression(dst_format: str, compression: str = None, compression_level: int = None) -> str:
+    '''
+    Check that a codec (and compression level) can compress
+    the given output format
+
+    :param dst_format: Output format
+    :type dst_format: str
+
+    :param compression: Codec, eg. zstd. Parquet files are compressed
+                        with one of `PARQUET_COMPRESSIONS`, csv and
+                        json files with one of `TEXT_COMPRESSIONS`
+    :type compression: str
+
+    :param compression_level: Compression level of the codec
+    :type compression_level: int
+
+    :returns: the codec, None if the output is not compressed
+    :rtype: str
+    '''
+    if not compression:
+        if compression_level is not None:
+            raise ValueError('A compression level is given without a compression codec')
+        return None
+    compression = compression.lower()
+    codecs = PARQUET_COMPRESSIONS if dst_format == 'parquet' else ('none',) + tuple(TEXT_COMPRESSIONS)
+    if compression not in codecs:
+        raise ValueError(f'Invalid compression {compression} for the {dst_format} format. '
+                         f'It should be one of {list(codecs)}')
+    if compression == 'none':
+        return compression if dst_format == 'parquet' else None
+    if compression_level is not None:
+        try:
+            pa.Codec(compression, compression_level=compression_level)
+        except Exception as e:
+            raise ValueError(f'Invalid compression level {compression_level} for {compression}: {e}') from e
+    return compression
+
+
+def _bytes_to_string(value):
+    '''
+    Bytes are written to text outputs as in avro's json encoding,
+    where every byte is the unicode code point of the same value
+    '''
+    return value.decode('latin-1')
+
+
+def _json_default(value):
+    '''
+    Encode the values which json has no type for
+    '''
+    if isinstance(value, bytes):
+        return _bytes_to_string(value)
+    if isinstance(value, (date, datetime, time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _to_json_string(value):
+    '''
+    Nested values (records, arrays and maps) are written to
+    csv files as json strings
+    '''
+    return dumps(value, default=_json_default, ensure_ascii=False)
+
+
+def _to_json_lines(rows: list) -> bytes:
+    '''
+    Encode rows to newline delimited json, with orjson
+    if it is installed or the standard json encoder otherwise
+    '''
+    if orjson is not None:
+        return b''.join(orjson.dumps(row, default=_json_default, option=orjson.OPT_APPEND_NEWLINE)
+                        for row in rows)
+    return ''.join(_to_json_string(row) + '\n' for row in rows).encode('utf-8')
+
 
 class AvroConvert:
     '''
     A class used to read avro files and convert them to csv,
-    parquet and json format
+    parquet, json and json lines format
 
     :param outfolder: output folder to write the output files
                      to
     :type outfolder: str
 
-    :param header: Extracts header from the file if it is set to True
+    :param header: Writes a header row with the column names
+                   to every csv file if it is set to True
     :type header: bool
 
     :param dst_format: Specifies the format to convert the avro data to
     :type dst_format: str
+
+    :param batch_size: Number of avro records decoded into each
+                       arrow record batch before it is handed to
+                       the writer
+    :type batch_size: int
+
+    :param row_group_size: Maximum number of rows per parquet row group
+    :type row_group_size: int
+
+    :param row_group_bytes: Maximum (uncompressed, in memory) size of a
+                            parquet row group in bytes
+    :type row_group_bytes: int
+
+    :param partition_by: Columns to partition the parquet output by
+    :type partition_by: list
+
+    :param columns: Columns (top level avro fields) to convert
+    :type columns: list
+
+    :param filter: Expression selecting the records to convert,
+                   see :class:`avroconvert.filters.RecordFilter`
+    :type filter: str
+
+    :param storage_options: Credentials and upload options of an
+                            s3:// or gs:// output folder, see
+                            :func:`avroconvert.sinks.open_output`
+    :type storage_options: dict
+
+    :param compression: Codec of the output files, see `check_compression`
+    :type compression: str
+
+    :param compression_level: Compression level of the codec
+    :type compression_level: int
+
+    :param dictionary: Dictionary encode the parquet columns
+    :type dictionary: bool
+
+    :param data_page_size: Target size of the parquet data pages in bytes
+    :type data_page_size: int
     '''
 
-    def __init__(self, outfolder: str, dst_format: str = 'parquet', header: bool = True):
+    def __init__(self, outfolder: str, dst_format: str = 'parquet', header: bool = True,
+                 batch_size: int = DEFAULT_BATCH_SIZE, row_group_size: int = None,
+                 row_group_bytes: int = DEFAULT_ROW_GROUP_BYTES, partition_by: list = None,
+                 columns: list = None, filter: str = None, storage_options: dict = None,
+                 compression: str = None, compression_level: int = None, dictionary: bool = None,
+                 data_page_size: int = None):
         """
-        :param header: Extracts header from the file if it is set to True
+        :param outfolder: Output folder to write the output files to,
+                          or an s3:// or gs:// url
+        :type outfolder: str
+
+        :param header: Writes a header row with the column names
+                       to every csv file if it is set to True
         :type header: bool
 
         :param dst_format: Specifies the format to convert the avro data to
         :type dst_format: str
 
-        :param data: Contains raw data in the form of bytes as read from 
-                    filesystem, google cloud storage or S3. Multiple 
-                    files are read sequentially and their respective data
-                    is appended to this list which is passed as the
-                    variable `data`
-        :type data: list
+        :param batch_size: Number of avro records decoded into each
+                           arrow record batch before it is handed to
+                           the writer
+        :type batch_size: int
+
+        :param row_group_size: Maximum number of rows per parquet row
+                               group. Decoded rows are flushed to the
+                               output file as soon as a row group is
+                               full
+        :type row_group_size: int
+
+        :param row_group_bytes: Maximum (uncompressed, in memory) size
+                                of a parquet row group in bytes. Decoded
+                                rows are flushed to the output file as
+                                soon as this size is reached
+        :type row_group_bytes: int
+
+        :param partition_by: Columns to partition the parquet output by.
+                             If given, the records of all the input files
+                             are written to a single hive style partitioned
+                             dataset rooted at the output folder, eg.
+                             `OUTFOLDER/country=IN/year=2021/FILE-0.parquet`,
+                             instead of one output file per input file
+        :type partition_by: list
+
+        :param columns: Columns (top level avro fields) to convert, in
+                        the order of the output columns. The other
+                        fields are skipped while decoding, without
+                        building their values. All the fields are
+                        converted if it is not given
+        :type columns: list
+
+        :param filter: Expression selecting the records to convert, eg.
+                       `country == 'IN' and year >= 2021` (see
+                       :class:`avroconvert.filters.RecordFilter`). The
+                       other records are dropped right after they are
+                       decoded, before they are converted to arrow
+        :type filter: str
+
+        :param storage_options: Credentials (`access_key`, `secret_key`,
+                                `session_token`, `endpoint_url` of s3 or
+                                `auth_file` of gcs) and upload options
+                                (`part_size`, `concurrency`, `retries`)
+                                used when the output folder is an s3:// or
+                                gs:// url. The output files are then
+                                uploaded while they are written, without
+                                touching the local disk
+        :type storage_options: dict
+
+        :param compression: Codec of the output files. Parquet files
+                            are compressed with none, snappy (the
+                            default), gzip, brotli, lz4 or zstd. Csv and
+                            json files are not compressed by default;
+                            with gzip, zstd or lz4 they are
+                            compressed while they are written, and the
+                            codec's extension is added to their names,
+                            eg. FILE.csv.zst
+        :type compression: str
+
+        :param compression_level: Compression level of the codec, eg.
+                                  1 to 22 for zstd or 1 to 9 for gzip.
+                                  Higher levels make smaller files at
+                                  the cost of more cpu time
+        :type compression_level: int
+
+        :param dictionary: Dictionary encode the parquet columns, which
+                           shrinks columns of repeated values. Defaults
+                           to True
+        :type dictionary: bool
+
+        :param data_page_size: Target size of the (uncompressed) parquet
+                               data pages in bytes, defaults to 1MB
+        :type data_page_size: int
+
+        The avro data is not given to the converter: every file (or
+        block range of a split file) is passed to `convert_avro`,
+        which reads it's blocks with fastavro's block reader and
+        converts them to arrow record batches
         """
         self.header = header
         self.dst_format = dst_format.lower()
+        self.batch_size = batch_size
+        self.row_group_size = row_group_size
+        self.row_group_bytes = row_group_bytes
+        self.partition_by = list(partition_by) if partition_by else None
+        self.columns = list(columns) if columns else None
+        self.record_filter = RecordFilter(filter) if filter else None
+        self.storage_options = dict(storage_options or dict())
+        self.compression = check_compression(self.dst_format, compression, compression_level)
+        self.compression_level = compression_level
+        self.dictionary = dictionary
+        self.data_page_size = data_page_size
+        self._schemas = dict()
         # self.data = data
         self.outfolder = outfolder
         self._check_output_folder(outfolder)
 
-    def convert_avro(self, filename: str, data: bytes) -> str:
+    def convert_avro(self, filename: str, data: bytes, block_range: tuple = None,
+                     part: int = None, stats: dict = None) -> str:
         '''
         Reads byte data, converts it to avro format and writes
         the data to the local filesystem to the output format
         specified.
 
+        The avro writer schema is mapped to an arrow schema once per
+        file and the records are decoded block by block into arrow
+        record batches, which are streamed to the writer.
+
         :param filename: Name of the input file (with it's source path). 
                         The output file will be saved by the same name,
                         within the same folder hierarchy as it was in 
@@ -66,35 +302,305 @@ class AvroConvert:
                     files are read sequentially and their respective data
                     is appended to this list which is passed as the
                     variable `data`
-        :type data: bytes
+                    It can also be a memory mapped file, which is
+                    decoded in place without being copied
+        :type data: bytes or mmap.mmap
+
+        :param block_range: (header_size, start, end) as returned by
+                            `block_ranges`. If given, only the avro
+                            blocks between the `start` and `end` offsets
+                            of `data` are converted
+        :type block_range: tuple
+
+        :param part: Index of the part when `data` is one of the block
+                     ranges of a split input file (see `split_avro`).
+                     Each part is written to its own output file,
+                     suffixed with the part index
+        :type part: int
+
+        :param stats: If given, the number of `records` converted and
+                      the time spent decoding them (`decode_seconds`)
+                      and writing them (`write_seconds`) are set in it
+        :type stats: dict
 
         :returns: File name with path of the output file
         :rtype: str
         '''
         if not bool(data):
             return None
+        stats = self._start_stats(stats)
         try:
             logger.info('Converting bytes to avro')
             logger.info(f'File {filename} in progress')
-            outfile = join(self.outfolder, self._change_file_extn(filename))
-            avrodata = [r for r in reader(BytesIO(data))]
+            outfile = join(self.outfolder, self._change_file_extn(filename, part=part))
+            with self._open_data(data, block_range) as avro_file:
+                avro_blocks, converter = self._read_blocks(avro_file)
+                batches = converter.to_batches(avro_blocks, self.batch_size,
+                                               record_filter=self.record_filter)
+                writer_function = getattr(self, f'_to_{self.dst_format}')
+                writer_function(batches=self._measure(batches, stats),
+                                schema=converter.arrow_schema, outfile=outfile)
+            self._stop_stats(stats)
             logger.info(
-                f'Total {len(avrodata)} records found in file is {filename}')
+                f'Total {stats["records"]} records found in file is {filename}')
+            logger.info(f'[COMPLETED] File {outfile} complete')
+            return f'File {outfile} complete'
+        except Exception as e:
+            logger.exception(f'[FAILED] File {outfile} failed')
+            raise e
+
+    def compact_avro(self, filename: str, inputs, stats: dict = None) -> str:
+        '''
+        Converts several avro files with the same schema into one
+        output file. The records of every file are streamed, in order,
+        to a single writer, so many small input files make one output
+        file of well sized row groups.
+
+        :param filename: Name the output file is named after, as in
+                         `convert_avro`
+        :type filename: str
+
+        :param inputs: (name, data) tuples of the input files, where
+                       data is as in `convert_avro`. Each file is only
+                       read when the previous one has been converted,
+                       so it can be a generator opening the files one
+                       at a time
+        :type inputs: iterable of tuples
+
+        :param stats: If given, the number of `records` converted and
+                      the time spent decoding and writing them, as in
+                      `convert_avro`
+        :type stats: dict
+
+        :returns: File name with path of the output file
+        :rtype: str
+        '''
+        outfile = join(self.outfolder, self._change_file_extn(filename))
+        inputs = ((name, data) for name, data in inputs if bool(data))
+        stats = self._start_stats(stats)
+        try:
+            first_name, data = next(inputs, (None, None))
+            if first_name is None:
+                return None
+            logger.info(f'File {outfile} in progress')
+            with self._open_data(data) as avro_file:
+                avro_blocks, converter = self._read_blocks(avro_file)
+                num_files = 1
+
+                def batches():
+                    nonlocal num_files
+                    yield from converter.to_batches(avro_blocks, self.batch_size,
+                                                    record_filter=self.record_filter)
+                    for name, data in inputs:
+                        with self._open_data(data) as input_file:
+                            input_blocks, input_converter = self._read_blocks(input_file)
+                            if input_converter.arrow_schema != converter.arrow_schema:
+                                raise ValueError(f'File {name} has a different schema than '
+                                                 f'{first_name}, they cannot be compacted')
+                            yield from input_converter.to_batches(input_blocks, self.batch_size,
+                                                                  record_filter=self.record_filter)
+                        num_files += 1
 
-            writer_function = getattr(self, f'_to_{self.dst_format}')
-            writer_function(data=avrodata, outfile=outfile)
+                writer_function = getattr(self, f'_to_{self.dst_format}')
+                writer_function(batches=self._measure(batches(), stats),
+                                schema=converter.arrow_schema, outfile=outfile)
+            self._stop_stats(stats)
+            logger.info(f'Total {stats["records"]} records found in {num_files} files')
             logger.info(f'[COMPLETED] File {outfile} complete')
             return f'File {outfile} complete'
         except Exception as e:
             logger.exception(f'[FAILED] File {outfile} failed')
             raise e
 
-    def _to_csv(self, data, outfile: str) -> str:
+    @staticmethod
+    def _start_stats(stats: dict = None) -> dict:
+        '''
+        Reset the conversion stats and start their clock
+        '''
+        stats = dict() if stats is None else stats
+        stats.update(records=0, decode_seconds=0.0, write_seconds=0.0, started=perf_counter())
+        return stats
+
+    @staticmethod
+    def _stop_stats(stats: dict) -> None:
+        '''
+        Stop the clock of the conversion stats; the time which was
+        not spent decoding was spent writing
+        '''
+        stats['write_seconds'] = perf_counter() - stats.pop('started') - stats['decode_seconds']
+
+    @staticmethod
+    def _measure(batches, stats: dict):
+        '''
+        Pass on record batches, counting their records and the time
+        spent producing them (ie. decoding) in `stats`
+        '''
+        batches = iter(batches)
+        while True:
+            started = perf_counter()
+            batch = next(batches, None)
+            stats['decode_seconds'] += perf_counter() - started
+            if batch is None:
+                return
+            stats['records'] += batch.num_rows
+            yield batch
+
+    def read_schema(self, data: bytes) -> dict:
         '''
-        Write the avro data to a csv file
+        Reads the writer schema from the header of an avro file,
+        without decoding any block
 
-        :param data: Avro formatted data
-        :type data: avro data
+        :param data: Contains raw data of one avro file, as bytes or
+                     a memory mapped file
+        :type data: bytes or mmap.mmap
+
+        :returns: the avro writer schema
+        :rtype: dict
+        '''
+        with self._open_data(data) as avro_file:
+            return block_reader(avro_file).writer_schema
+
+    def block_ranges(self, data: bytes, num_parts: int) -> list:
+        '''
+        Split an avro container file into at most `num_parts` contiguous
+        ranges of blocks, which can be converted independently (and in
+        parallel) with `convert_avro`. The file is cut at the sync
+        markers between blocks, so blocks are neither decoded nor
+        decompressed.
+
+        :param data: Contains raw data of one avro file, as bytes or
+                     a memory mapped file
+        :type data: bytes or mmap.mmap
+
+        :param num_parts: Maximum number of ranges
+        :type num_parts: int
+
+        :returns: list of (header_size, start, end) tuples, in the order
+                  of the blocks in the file, to be passed to
+                  `convert_avro` as `block_range`
+        :rtype: list
+        '''
+        avro_file = BytesIO(data) if isinstance(data, bytes) else data
+        avro_blocks = scan_blocks(avro_file)
+        return [(avro_blocks.header_size, start, end)
+                for start, end in split_blocks(avro_blocks, num_parts)]
+
+    def split_avro(self, data: bytes, num_parts: int) -> list:
+        '''
+        Split an avro container file into at most `num_parts` smaller
+        avro files, see `block_ranges`. Every part gets a copy of the
+        original header followed by a contiguous range of blocks.
+
+        :param data: Contains raw data of one avro file, in bytes
+        :type data: bytes
+
+        :param num_parts: Maximum number of parts
+        :type num_parts: int
+
+        :returns: list of avro files, in bytes, in the order of the
+                  blocks in the original file
+        :rtype: list
+        '''
+        view = memoryview(data)
+        return [b''.join((view[:header_size], view[start:end]))
+                for header_size, start, end in self.block_ranges(data, num_parts)]
+
+    def _read_blocks(self, avro_file):
+        '''
+        Read the header of an avro file and map it's schema to arrow.
+        If columns are selected, the blocks are decoded with a reader
+        schema of these columns (and of the fields read by the filter),
+        so that fastavro skips the other fields instead of decoding them.
+
+        The mapping of a schema is cached, by the exact schema text of
+        the file header, so files (and block ranges) of a schema which
+        was already seen are set up with a dictionary lookup.
+
+        :param avro_file: binary file object positioned at the start
+                          of the avro file, as returned by `_open_data`
+        :type avro_file: file object
+
+        :returns: tuple of the avro blocks (fastavro's `block_reader`)
+                  and the converter of their records to arrow
+        :rtype: tuple
+        '''
+        avro_blocks = block_reader(avro_file)
+        schema_key = avro_blocks.metadata.get('avro.schema')
+        mapped_schema = self._schemas.get(schema_key)
+        if mapped_schema is None:
+            mapped_schema = self._map_schema(avro_blocks.writer_schema)
+            if len(self._schemas) >= SCHEMA_CACHE_SIZE:
+                del self._schemas[next(iter(self._schemas))]
+            self._schemas[schema_key] = mapped_schema
+        converter, reader_schema = mapped_schema
+        if reader_schema is None:
+            return avro_blocks, converter
+        avro_file.seek(0)
+        return block_reader(avro_file, reader_schema=reader_schema), converter
+
+    def _map_schema(self, writer_schema: dict) -> tuple:
+        '''
+        Map an avro writer schema to the converter of it's records
+        and, if columns are selected, to the (parsed) reader schema
+        the blocks are decoded with
+
+        :returns: tuple of the :class:`SchemaConverter` and the reader
+                  schema, which is None if all the fields are read
+        :rtype: tuple
+        '''
+        if self.record_filter:
+            if not (isinstance(writer_schema, dict) and writer_schema.get('type') == 'record'):
+                raise ValueError('Only avro files of records can be filtered')
+            field_names = [field['name'] for field in writer_schema['fields']]
+            unknown = [field for field in self.record_filter.fields if field not in field_names]
+            if unknown:
+                raise ValueError(f'Unknown fields {", ".join(unknown)} in filter '
+                                 f'{self.record_filter.expression}')
+        if not self.columns:
+            return SchemaConverter(writer_schema), None
+        filter_fields = self.record_filter.fields if self.record_filter else []
+        reader_schema = parse_schema(project_schema(writer_schema, self.columns + filter_fields))
+        return SchemaConverter(project_schema(writer_schema, self.columns)), reader_schema
+
+    def _open_data(self, data, block_range: tuple = None):
+        '''
+        Wrap the raw avro data in a file object for fastavro. Bytes
+        are wrapped in a BytesIO and memory maps are read as they
+        are, neither of which copies the data.
+
+        :param data: Raw avro data
+        :type data: bytes or mmap.mmap
+
+        :param block_range: (header_size, start, end) of the blocks
+                            to read, or None to read the whole file
+        :type block_range: tuple
+
+        :returns: binary file object positioned at the start
+                  of the avro file
+        :rtype: file object
+        '''
+        if block_range:
+            return BlockRangeReader(data, *block_range)
+        if isinstance(data, (bytes, bytearray)):
+            return BytesIO(data)
+        data.seek(0)
+        return nullcontext(data)
+
+    def _to_csv(self, batches, schema, outfile: str) -> str:
+        '''
+        Write the avro data to a csv file. The record batches are
+        written by arrow's csv writer through a large write buffer,
+        without converting the rows to python objects. Every file
+        starts with a header row if `header` is True. Nested columns
+        (records, arrays and maps) are written as json strings and
+        bytes as in avro's json encoding, since csv has no
+        representation for them.
+
+        :param batches: Avro data converted to arrow record batches
+        :type batches: iterable of pyarrow.RecordBatch
+
+        :param schema: Arrow schema of the record batches
+        :type schema: pyarrow.Schema
 
         :param outfile: Output filepath. The avro data which is 
                         converted to csv, will be stored at this location. 
@@ -107,26 +613,62 @@ class AvroConvert:
         :returns: path of the output csv file
         :rtype: str
         '''
-        count = 0
         logger.info(f'Output folder check {outfile}')
         self._check_output_folder(outfile)
-        f = csv.writer(open(outfile, "w+"))
-        for row in data:
-            if self.header == True:
-                header = row.keys()
-                f.writerow(header)
-                self.header = False
-            count += 1
-            f.writerow(row.values())
+        converters = dict()
+        for index, field in enumerate(schema):
+            if pa.types.is_map(field.type):
+                # arrow returns maps as lists of (key, value) tuples
+                converters[index] = lambda value: _to_json_string(dict(value))
+            elif pa.types.is_nested(field.type):
+                converters[index] = _to_json_string
+            elif pa.types.is_binary(field.type) or pa.types.is_fixed_size_binary(field.type):
+                converters[index] = _bytes_to_string
+        csv_schema = schema
+        for index in converters:
+            csv_schema = csv_schema.set(index, schema.field(index).with_type(pa.string()))
+
+        write_options = csv.WriteOptions(include_header=self.header, batch_size=self.batch_size)
+        with self._output(outfile, buffer_size=CSV_BUFFER_SIZE, compression=self.compression) as sink, \
+                csv.CSVWriter(sink, csv_schema, write_options=write_options) as writer:
+            for batch in batches:
+                if converters:
+                    batch = self._convert_columns(batch, converters, csv_schema)
+                writer.write_batch(batch)
         return outfile
 
-    def _to_parquet(self, data, outfile: str) -> str:
+    @staticmethod
+    def _convert_columns(batch, converters: dict, schema):
         '''
-        Write the avro data to a parquet file
+        Apply a converter to the values of some columns of a record batch
+
+        :param converters: converter function for each column index
+        :type converters: dict
+
+        :returns: record batch with the converter's values
+        :rtype: pyarrow.RecordBatch
+        '''
+        columns = list(batch.columns)
+        for index, converter in converters.items():
+            columns[index] = pa.array([None if value is None else converter(value)
+                                       for value in columns[index].to_pylist()],
+                                      type=schema.field(index).type)
+        return pa.RecordBatch.from_arrays(columns, schema=schema)
+
+    def _to_parquet(self, batches, schema, outfile: str) -> str:
+        '''
+        Write the avro data to a parquet file. The record batches
+        are streamed through a parquet writer and a row group is
+        flushed whenever `row_group_size` rows or `row_group_bytes`
+        bytes are buffered, so memory stays flat regardless of the
+        size of the input file.
+
+        :param batches: Avro data converted to arrow record batches
+        :type batches: iterable of pyarrow.RecordBatch
+
+        :param schema: Arrow schema of the record batches
+        :type schema: pyarrow.Schema
 
-        :param data: Avro formatted data
-        :type data: avro data
-        
         :param outfile: Output filepath. The avro data which is converted to 
                         parquet, will be stored at this location. If a non-existent 
                         folder name is given, the folder will be created and the
@@ -137,25 +679,123 @@ class AvroConvert:
         :returns: path of the output parquet file
         :rtype: str
         '''
+        if self.partition_by:
+            return self._to_partitioned_parquet(batches, schema, outfile)
+        # pyarrow.parquet is only imported by the parquet output
+        from pyarrow.parquet import ParquetWriter
         self._check_output_folder(outfile)
-        # TODO: support for partitioned storage
-        # table = Table.from_pandas(
-        #     DataFrame(list(chain.from_iterable(self.data))))
         logger.info(f'Writing {outfile} to parquet format')
-        try:
-            table = Table.from_pandas(
-                DataFrame(data))
-            write_table(table, outfile, flavor='spark')
-            return outfile
-        except Exception as e:
-            raise e
+        with self._output(outfile) as sink, \
+                ParquetWriter(sink, schema, flavor='spark', **self._parquet_options()) as writer:
+            buffered, buffered_rows, buffered_bytes = list(), 0, 0
+            for batch in batches:
+                buffered.append(batch)
+                buffered_rows += batch.num_rows
+                buffered_bytes += batch.nbytes
+                if self.row_group_size and buffered_rows >= self.row_group_size:
+                    table = Table.from_batches(buffered, schema=schema)
+                    while buffered_rows >= self.row_group_size:
+                        self._write_row_group(writer, table.slice(0, self.row_group_size))
+                        table = table.slice(self.row_group_size)
+                        buffered_rows -= self.row_group_size
+                    buffered = table.to_batches()
+                    buffered_bytes = table.nbytes
+                if self.row_group_bytes and buffered_bytes >= self.row_group_bytes:
+                    self._write_row_group(writer, Table.from_batches(buffered, schema=schema))
+                    buffered, buffered_rows, buffered_bytes = list(), 0, 0
+            if buffered_rows:
+                self._write_row_group(writer, Table.from_batches(buffered, schema=schema))
+        return outfile
+
+    def _to_partitioned_parquet(self, batches, schema, outfile: str) -> str:
+        '''
+        Write the avro data to a hive style partitioned parquet dataset
+        rooted at the output folder, with one folder per partition
+        column value, eg. `OUTFOLDER/country=IN/year=2021/`. The files
+        of every input file are named after the input file's path, so
+        that several input files (and parts of split files) can be
+        written to the same dataset, in parallel.
+
+        :param batches: Avro data converted to arrow record batches
+        :type batches: iterable of pyarrow.RecordBatch
+
+        :param schema: Arrow schema of the record batches
+        :type schema: pyarrow.Schema
+
+        :param outfile: Output filepath the input file would be written
+                        to without partitioning. Example:
+                        ./data/1970-01-01/FILE.parquet is written to
+                        files named data_1970-01-01_FILE-0.parquet, ...
+        :type outfile: str
+
+        :returns: path of the root folder of the dataset
+        :rtype: str
+        '''
+        for column in self.partition_by:
+            if column not in schema.names:
+                raise ValueError(f'Partition column {column} not found in the columns {schema.names}')
+        basename = Path(relpath(outfile, self.outfolder)).with_suffix('')
+        basename = '_'.join(part for part in basename.parts if part not in ('.', '..'))
+        logger.info(f'Writing {outfile} to parquet dataset {self.outfolder} '
+                    f'partitioned by {self.partition_by}')
+        row_group_options = dict()
+        if self.row_group_size:
+            row_group_options = dict(min_rows_per_group=self.row_group_size,
+                                     max_rows_per_group=self.row_group_size)
+        # pyarrow.dataset imports pandas, so it is only imported
+        # by the partitioned output
+        from pyarrow.dataset import ParquetFileFormat, write_dataset
+        base_dir, filesystem = self.outfolder, None
+        if is_remote(self.outfolder):
+            filesystem, base_dir = dataset_filesystem(self.outfolder, **self.storage_options)
+        # Timestamps are written as int96, as by the spark flavor of
+        # the parquet writer of unpartitioned outputs
+        file_options = ParquetFileFormat().make_write_options(use_deprecated_int96_timestamps=True,
+                                                              **self._parquet_options())
+        write_dataset(RecordBatchReader.from_batches(schema, batches), base_dir, filesystem=filesystem,
+                      format='parquet', file_options=file_options,
+                      partitioning=self.partition_by, partitioning_flavor='hive',
+                      basename_template=f'{basename}-{{i}}.parquet',
+                      existing_data_behavior='overwrite_or_ignore', **row_group_options)
+        return self.outfolder
+
+    def _parquet_options(self) -> dict:
+        '''
+        Options of the parquet writers: the codec and compression
+        level, dictionary encoding and data page size, when they are
+        given, so that arrow's defaults are used otherwise
 
-    def _to_json(self, data, outfile: str) -> str:
+        :rtype: dict
         '''
-        Write the avro data to a json file
+        options = dict(compression=self.compression, compression_level=self.compression_level,
+                       use_dictionary=self.dictionary, data_page_size=self.data_page_size)
+        return {option: value for option, value in options.items() if value is not None}
+
+    def _write_row_group(self, writer, table: Table) -> None:
+        '''
+        Write the buffered rows to the parquet writer
+        as a single row group
+
+        :param writer: Open parquet writer of the output file
+        :type writer: pyarrow.parquet.ParquetWriter
+
+        :param table: Buffered rows
+        :type table: pyarrow.Table
+        '''
+        writer.write_table(table, row_group_size=max(table.num_rows, 1))
+
+    def _to_json(self, batches, schema, outfile: str) -> str:
+        '''
+        Write the avro data to a json file. Maps are written as json
+        objects. Unions of several types other than null are written
+        as strings, as their arrow columns are (see
+        :class:`avroconvert.schema.SchemaConverter`)
         
-        :param data: Avro formatted data
-        :type data: avro data
+        :param batches: Avro data converted to arrow record batches
+        :type batches: iterable of pyarrow.RecordBatch
+
+        :param schema: Arrow schema of the record batches
+        :type schema: pyarrow.Schema
 
         :param outfile: Output filepath. The avro data which is converted to 
                         json, will be stored at this location. If a non-existent 
@@ -168,10 +808,56 @@ class AvroConvert:
         :rtype: str
         '''
         self._check_output_folder(outfile)
-        df = DataFrame(data)
+        df = Table.from_batches(batches, schema=schema).to_pandas()
+        # arrow returns maps as lists of (key, value) tuples
+        for field in schema:
+            if pa.types.is_map(field.type):
+                df[field.name] = df[field.name].map(lambda value: None if value is None else dict(value))
         # while len(self.data) > 0:
         # df = df.append(self.data.pop())
-        df.to_json(outfile, orient='records')
+        with self._output(outfile, compression=self.compression) as sink:
+            df.to_json(sink, orient='records')
+        return outfile
+
+    def _to_jsonl(self, batches, schema, outfile: str) -> str:
+        '''
+        Write the avro data to a newline delimited json file, with
+        one json object per record. Every record batch is encoded and
+        written as soon as it is decoded, through a write buffer, so
+        memory use does not depend on the size of the file and the
+        file can be read while it is being written. Bytes are written
+        as in avro's json encoding and dates and times in ISO 8601
+        format.
+
+        :param batches: Avro data converted to arrow record batches
+        :type batches: iterable of pyarrow.RecordBatch
+
+        :param schema: Arrow schema of the record batches
+        :type schema: pyarrow.Schema
+
+        :param outfile: Output filepath. The avro data which is
+                        converted to json lines, will be stored at this
+                        location. If a non-existent folder name is given,
+                        the folder will be created and the file will
+                        be written there.
+                        Example: ./data/1970-01-01/FILE.jsonl
+        :type outfile: str
+
+        :returns: path of the output file
+        :rtype: str
+        '''
+        logger.info(f'Output folder check {outfile}')
+        self._check_output_folder(outfile)
+        # arrow returns maps as lists of (key, value) tuples
+        map_columns = [field.name for field in schema if pa.types.is_map(field.type)]
+        with self._output(outfile, buffer_size=JSONL_BUFFER_SIZE, compression=self.compression) as f:
+            for batch in batches:
+                rows = batch.to_pylist()
+                for row in rows:
+                    for name in map_columns:
+                        if row[name] is not None:
+                            row[name] = dict(row[name])
+                f.write(_to_json_lines(rows))
         return outfile
 
     def _check_output_folder(self, folderpath: str) -> bool:
@@ -184,6 +870,9 @@ class AvroConvert:
         :returns: True
         :rtype: bool
         '''
+        # Object stores have no folders
+        if is_remote(folderpath):
+            return True
         # folderpath = dirname(folderpath)
         if dirname(folderpath):
             folderpath = dirname(folderpath)
@@ -192,7 +881,48 @@ class AvroConvert:
             Path(folderpath).mkdir(parents=True, exist_ok=True)
         return True
 
-    def _change_file_extn(self, filename: str) -> str:
+    @contextmanager
+    def _output(self, outfile: str, buffer_size: int = None, compression: str = None):
+        '''
+        Open an output file for writing. A local file is written
+        through a write buffer of `buffer_size` bytes, or given to the
+        writer by it's path if there is none. An s3:// or gs:// file is
+        uploaded while it is written (see :mod:`avroconvert.sinks`),
+        and the upload is aborted if the writer fails, so that no
+        partial output file is created. If a `compression` codec is
+        given, the data is compressed before it is written.
+
+        :param outfile: Output file path or url
+        :type outfile: str
+
+        :param buffer_size: Size of the write buffer of a local file
+        :type buffer_size: int
+
+        :param compression: Codec compressing the file, one of
+                            `TEXT_COMPRESSIONS`
+        :type compression: str
+
+        :returns: writable binary file, or the path of the local file
+        '''
+        if compression:
+            # The data is written in large compressed chunks, without a write
+            # buffer, and arrow must not detect a codec from the file extension
+            if is_remote(outfile):
+                sink = open_output(outfile, **self.storage_options)
+            else:
+                sink = pa.output_stream(outfile, compression=None)
+            with sink, CompressedWriter(sink, compression, self.compression_level) as compressed:
+                yield compressed
+        elif is_remote(outfile):
+            with open_output(outfile, **self.storage_options) as sink:
+                yield sink
+        elif buffer_size:
+            with pa.output_stream(outfile, compression=None, buffer_size=buffer_size) as sink:
+                yield sink
+        else:
+            yield outfile
+
+    def _change_file_extn(self, filename: str, part: int = None) -> str:
         '''
         Change the input file extension to given
         output format
@@ -201,11 +931,20 @@ class AvroConvert:
                          extension
         :type filename: str
 
+        :param part: Index of the part of a split input file. If
+                     given, it is added to the output file name,
+                     eg. FILE.part-00001.parquet
+        :type part: int
+
         :returns: name of the output file with output file
                   extension
         :rtype: str
         '''
         p = Path(filename)
-        new_filename = p.parent.joinpath(f'{p.stem}.{self.dst_format}')
+        stem = p.stem if part is None else f'{p.stem}.part-{part:05d}'
+        extension = self.dst_format
+        if self.compression and self.dst_format != 'parquet':
+            extension = f'{extension}.{TEXT_COMPRESSIONS[self.compression]}'
+        new_filename = p.parent.joinpath(f'{stem}.{extension}')
         new_filename = str(new_filename)
         return new_filename
\ No newline at end of file
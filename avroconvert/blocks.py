@@ -0,0 +1,176 @@
+"""Helpers to split an avro container file at its block boundaries."""
+import io
+from fastavro import schemaless_reader
+from fastavro.read import HEADER_SCHEMA
+from math import ceil
+from typing import List, NamedTuple, Tuple
+
+SYNC_SIZE = 16
+
+
+class AvroBlocks(NamedTuple):
+    '''
+    Layout of an avro container file
+
+    :param header_size: Size in bytes of the file header (magic,
+                        metadata and sync marker)
+    :type header_size: int
+
+    :param sync: Sync marker of the file, which follows every block
+    :type sync: bytes
+
+    :param blocks: (offset, size) of every block, where offset is the
+                   position of the block's record count and size
+                   includes the trailing sync marker
+    :type blocks: list of tuples
+    '''
+    header_size: int
+    sync: bytes
+    blocks: List[Tuple[int, int]]
+
+
+def _read_long(fo) -> int:
+    '''
+    Read a zig-zag encoded variable length long
+    '''
+    byte = fo.read(1)
+    if not byte:
+        raise EOFError
+    b = ord(byte)
+    n = b & 0x7F
+    shift = 7
+    while (b & 0x80) != 0:
+        b = ord(fo.read(1))
+        n |= (b & 0x7F) << shift
+        shift += 7
+    return (n >> 1) ^ -(n & 1)
+
+
+def scan_blocks(fo) -> AvroBlocks:
+    '''
+    Find the block boundaries of an avro container file. Only the
+    block headers are read; the (possibly compressed) block data is
+    skipped, so scanning costs a few bytes of I/O per block.
+
+    :param fo: seekable binary file object positioned at the start
+               of the avro file
+    :type fo: file object
+
+    :returns: header size, sync marker and block positions
+    :rtype: :class:`AvroBlocks`
+    '''
+    header = schemaless_reader(fo, HEADER_SCHEMA)
+    sync = header['sync']
+    header_size = fo.tell()
+    blocks = list()
+    while True:
+        offset = fo.tell()
+        try:
+            _read_long(fo)
+        except EOFError:
+            break
+        block_size = _read_long(fo)
+        fo.seek(block_size, 1)
+        if fo.read(SYNC_SIZE) != sync:
+            raise ValueError(f'Invalid sync marker after block at offset {offset}')
+        blocks.append((offset, fo.tell() - offset))
+    return AvroBlocks(header_size=header_size, sync=sync, blocks=blocks)
+
+
+def split_blocks(avro_blocks: AvroBlocks, num_parts: int) -> List[Tuple[int, int]]:
+    '''
+    Split the blocks of an avro file into at most `num_parts`
+    contiguous byte ranges of roughly equal size. Every range
+    starts and ends at a block boundary.
+
+    :param avro_blocks: block layout as returned by :func:`scan_blocks`
+    :type avro_blocks: :class:`AvroBlocks`
+
+    :param num_parts: Maximum number of ranges
+    :type num_parts: int
+
+    :returns: list of (start, end) byte offsets
+    :rtype: list of tuples
+    '''
+    blocks = avro_blocks.blocks
+    if not blocks:
+        return list()
+    data_start = blocks[0][0]
+    data_end = blocks[-1][0] + blocks[-1][1]
+    part_size = ceil((data_end - data_start) / max(num_parts, 1))
+    ranges = list()
+    range_start = data_start
+    for offset, size in blocks:
+        if offset + size - range_start >= part_size:
+            ranges.append((range_start, offset + size))
+            range_start = offset + size
+    if range_start < data_end:
+        ranges.append((range_start, data_end))
+    return ranges
+
+
+class BlockRangeReader(io.RawIOBase):
+    '''
+    A read-only file object over an avro file held in a buffer
+    (bytes or a memory map), which presents the file header
+    followed by a contiguous range of blocks as a complete avro
+    file. The data is not copied; reads are served straight from
+    the underlying buffer.
+
+    :param data: Buffer holding the whole avro file
+    :type data: bytes, mmap or any object supporting the buffer protocol
+
+    :param header_size: Size of the avro header, in bytes
+    :type header_size: int
+
+    :param start: Offset of the first block of the range
+    :type start: int
+
+    :param end: Offset right after the last block of the range
+    :type end: int
+    '''
+
+    def __init__(self, data, header_size: int, start: int, end: int):
+        self._view = memoryview(data)
+        self._segments = [self._view[:header_size], self._view[start:end]]
+        self._size = header_size + end - start
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self._size
+        self._position = min(max(offset, 0), self._size)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        written = 0
+        segment_start = 0
+        for segment in self._segments:
+            segment_end = segment_start + len(segment)
+            if self._position < segment_end and written < len(buffer):
+                begin = self._position - segment_start
+                count = min(len(segment) - begin, len(buffer) - written)
+                buffer[written:written + count] = segment[begin:begin + count]
+                written += count
+                self._position += count
+            segment_start = segment_end
+        return written
+
+    def close(self) -> None:
+        # Release the views, so that the underlying memory
+        # map can be closed once the range has been read
+        for segment in self._segments:
+            segment.release()
+        self._view.release()
+        super().close()
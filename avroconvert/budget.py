@@ -0,0 +1,60 @@
+"""Memory budget shared by the downloads and the conversions of a run."""
+from avroconvert import logger
+from threading import Condition
+
+
+class MemoryBudget:
+    '''
+    A number of bytes which the downloads and conversions of a run
+    may hold in memory at the same time. Each download or conversion
+    acquires it's (estimated) memory from the budget before it starts
+    and releases it when it is done, so new work waits while the
+    budget is used up.
+
+    Work which needs more than the whole budget is started once
+    nothing else holds any memory, so that it runs alone instead
+    of waiting forever.
+
+    :param max_bytes: Size of the budget in bytes
+    :type max_bytes: int
+    '''
+
+    def __init__(self, max_bytes: int):
+        '''
+        :param max_bytes: Size of the budget in bytes
+        :type max_bytes: int
+        '''
+        self.max_bytes = max_bytes
+        self.used = 0
+        self._condition = Condition()
+
+    def acquire(self, nbytes: int) -> int:
+        '''
+        Wait until `nbytes` bytes of the budget are available and
+        take them. This blocks, so it is meant to run on a thread
+        (eg. with `run_in_executor`).
+
+        :param nbytes: Number of bytes to take
+        :type nbytes: int
+
+        :returns: the number of bytes taken
+        :rtype: int
+        '''
+        with self._condition:
+            if nbytes > self.max_bytes:
+                logger.warning(f'{nbytes} bytes are needed, which is more than the memory budget '
+                               f'of {self.max_bytes} bytes; waiting to run alone')
+            self._condition.wait_for(lambda: not self.used or self.used + nbytes <= self.max_bytes)
+            self.used += nbytes
+        return nbytes
+
+    def release(self, nbytes: int) -> None:
+        '''
+        Give back bytes taken with `acquire`
+
+        :param nbytes: Number of bytes to give back
+        :type nbytes: int
+        '''
+        with self._condition:
+            self.used -= nbytes
+            self._condition.notify_all()
@@ -5,6 +5,7 @@ import sys
 import time
 
 from avroconvert import Execute
+from avroconvert.utils import parse_size
 
 def get_config_option(config: configparser.ConfigParser, section: str, option: str):
     try:
@@ -14,6 +15,99 @@ def get_config_option(config: configparser.ConfigParser, section: str, option: s
     except configparser.NoOptionError:
         return None
 
+def parse_bool(value: str) -> bool:
+    return str(value).strip().lower() in ('1', 'true', 'yes', 'on')
+
+def add_tuning_arguments(parser: argparse.ArgumentParser):
+    """Add the conversion tuning arguments shared by all the sources."""
+    parser.add_argument('--row-group-size', nargs='?', type=int,
+                        help='Maximum number of rows per parquet row group; \
+                            decoded rows are flushed to the output file \
+                            as soon as a row group is full')
+    parser.add_argument('--row-group-bytes', nargs='?', type=parse_size,
+                        help='Maximum in-memory size of a parquet row group, \
+                            eg. 64MB; defaults to 128MB')
+    parser.add_argument('--split-size', nargs='?', type=parse_size,
+                        help='Split avro files larger than this size, eg. 256MB, \
+                            at their block boundaries and convert the parts \
+                            in parallel into separate part files')
+    parser.add_argument('--workers', nargs='?', type=int,
+                        help='Number of worker processes converting the files; \
+                            defaults to the number of cpus available, as \
+                            limited by the cpu affinity and cgroup quota')
+    parser.add_argument('--io-workers', nargs='?', type=int,
+                        help='Number of files downloaded at the same time; \
+                            defaults to --download-concurrency, or 10')
+    parser.add_argument('--max-memory', nargs='?', type=parse_size,
+                        help='Memory budget, eg. 4GB; downloads and conversions \
+                            only start when the budget has room for their \
+                            estimated memory')
+    parser.add_argument('--report', nargs='?',
+                        help='Path of a json report of the run, with the time, \
+                            bytes and records of every stage and file')
+    parser.add_argument('--prometheus-file', nargs='?',
+                        help='Path of a file the run metrics are written to in \
+                            the prometheus text format, eg. for the node \
+                            exporter textfile collector')
+    parser.add_argument('--profile', nargs='?',
+                        help='Folder to write cProfile stats of the parent and \
+                            worker processes to, merged into a report of \
+                            the hot functions')
+    parser.add_argument('--columns', nargs='?',
+                        help='Comma separated list of the columns to convert, \
+                            eg. name,city; the other fields are skipped \
+                            while decoding')
+    parser.add_argument('--filter', nargs='?',
+                        help="Only convert the records matching this expression, \
+                            eg. \"country == 'IN' and year >= 2021\"")
+    parser.add_argument('--target-file-size', nargs='?', type=parse_size,
+                        help='Compact small avro files, eg. 512MB: files of \
+                            the same folder and schema are merged into \
+                            output files of about this size; not supported \
+                            by incremental runs')
+    parser.add_argument('--partition-by', nargs='?',
+                        help='Comma separated list of columns, eg. country,year; \
+                            the parquet output is written as a hive style \
+                            partitioned dataset rooted at the output folder')
+    parser.add_argument('--incremental', action='store_true', default=None,
+                        help='Only convert the files which are new or changed \
+                            since the last incremental run, as recorded in \
+                            the manifest')
+    parser.add_argument('--manifest', nargs='?',
+                        help='Path of the manifest of incremental runs; defaults \
+                            to .avroconvert-manifest.sqlite in the output folder')
+    parser.add_argument('--compression', nargs='?',
+                        help='Codec of the output files: none, snappy (the default), \
+                            gzip, brotli, lz4 or zstd for parquet; gzip, zstd \
+                            or lz4 for csv and json, which are not \
+                            compressed by default')
+    parser.add_argument('--compression-level', nargs='?', type=int,
+                        help='Compression level of the codec, eg. 1 (fastest) \
+                            to 22 (smallest) for zstd')
+    parser.add_argument('--dictionary', nargs='?', type=parse_bool, const=True,
+                        help='Dictionary encode the parquet columns, true or \
+                            false; defaults to true, as does a bare --dictionary')
+    parser.add_argument('--data-page-size', nargs='?', type=parse_size,
+                        help='Target size of the parquet data pages, eg. 1MB \
+                            (the default)')
+
+def get_tuning_options(args: argparse.Namespace, config: configparser.ConfigParser) -> dict:
+    """Read the conversion tuning options from the cli arguments or the config file."""
+    options = {'row_group_size': int, 'row_group_bytes': parse_size, 'split_size': parse_size,
+               'target_file_size': parse_size, 'partition_by': str, 'incremental': parse_bool, 'manifest': str,
+               'columns': str, 'filter': str, 'workers': int, 'io_workers': int,
+               'max_memory': parse_size, 'report': str, 'prometheus_file': str,
+               'profile': str, 'compression': str, 'compression_level': int, 'dictionary': parse_bool,
+               'data_page_size': parse_size}
+    tuning_options = dict()
+    for option, option_type in options.items():
+        value = getattr(args, option)
+        if value is None:
+            value = get_config_option(config, args.command, option)
+            value = option_type(value) if value else None
+        tuning_options[option] = value
+    return tuning_options
+
 def main():
     """Console script for avroconvert."""
     parser = argparse.ArgumentParser()
@@ -34,11 +128,22 @@ def main():
                             All other files will be omitted')
     gs_parser.add_argument('-o', '--outfolder', nargs='?', 
                         help='Output folder; all the output files will be \
-                            stored at this folder location')
+                            stored at this folder location. It can be an \
+                            s3:// or gs:// url')
     gs_parser.add_argument('-f', '--format', nargs='?', 
-                        choices=['parquet', 'csv', 'json'],
+                        choices=['parquet', 'csv', 'json', 'jsonl'],
                         help='Output format; avro files will be converted to this format')
+    gs_parser.add_argument('--download-concurrency', nargs='?', type=int,
+                           help='Maximum number of reads in flight, shared by all \
+                               the files the run downloads at the same time \
+                               (including the parallel ranged reads of \
+                               large files); defaults to 10')
+    gs_parser.add_argument('--retries', nargs='?', type=int,
+                           help='Maximum number of retries of a failed download, \
+                               or ranged read of a large file, with exponential \
+                               backoff; defaults to 5')
     gs_parser.add_argument('--config', nargs=1,  help='configuration file path')
+    add_tuning_arguments(gs_parser)
 
     s3_parser = subparsers.add_parser(
         's3', help='read files from amazon s3 storage')
@@ -63,11 +168,25 @@ def main():
                             All other files will be omitted')
     s3_parser.add_argument('-o', '--outfolder', nargs='?', 
                         help='Output folder; all the output files will be \
-                            stored at this folder location')
+                            stored at this folder location. It can be an \
+                            s3:// or gs:// url')
     s3_parser.add_argument('-f', '--format', nargs='?', 
-                        choices=['parquet', 'csv', 'json'],
+                        choices=['parquet', 'csv', 'json', 'jsonl'],
                         help='Output format; avro files will be converted to this format')
+    s3_parser.add_argument('--download-concurrency', nargs='?', type=int,
+                           help='Maximum number of GETs in flight, shared by all \
+                               the files the run downloads at the same time \
+                               (including the parallel ranged GETs of \
+                               large files); defaults to 10')
+    s3_parser.add_argument('--retries', nargs='?', type=int,
+                           help='Maximum number of retries of a failed download, \
+                               or ranged GET of a large file, with exponential \
+                               backoff; defaults to 5')
+    s3_parser.add_argument('--endpoint-url', nargs='?',
+                           help='URL of an s3 compatible endpoint to read \
+                               the files from instead of amazon s3')
     s3_parser.add_argument('--config', nargs=1,  help='configuration file path')
+    add_tuning_arguments(s3_parser)
 
     fs_parser = subparsers.add_parser(
         'fs', help='read files from local file system')
@@ -81,12 +200,14 @@ def main():
                             All other files will be omitted')
     fs_parser.add_argument('-o', '--outfolder', nargs='?', 
                         help='Output folder; all the output files will be \
-                            stored at this folder location')
+                            stored at this folder location. It can be an \
+                            s3:// or gs:// url')
     fs_parser.add_argument('-f', '--format', nargs='?', 
-                        choices=['parquet', 'csv', 'json'],
+                        choices=['parquet', 'csv', 'json', 'jsonl'],
                         help='Output format; avro files will be converted to this format')
 
     fs_parser.add_argument('--config', nargs=1,  help='configuration file path')
+    add_tuning_arguments(fs_parser)
 
     args = parser.parse_args()
 
@@ -103,32 +224,42 @@ def main():
     if args.outfolder: outfolder = args.outfolder
     
     if not dst_format:
-        print('You must supply output format from parquet, csv or json\n', file=sys.stderr)
+        print('You must supply output format from parquet, csv, json or jsonl\n', file=sys.stderr)
     if not prefix:
         prefix = ''
     if not outfolder:
         print('You must supply output directory', file=sys.stderr)
+    if args.command in ('gs', 's3', 'fs'):
+        tuning_options = get_tuning_options(args, config)
         
     if args.command == 'gs':
         auth_file = args.auth_file if args.auth_file else get_config_option(config, args.command, 'auth_file')
+        download_concurrency = args.download_concurrency if args.download_concurrency else get_config_option(config, args.command, 'download_concurrency')
+        retries = args.retries if args.retries is not None else get_config_option(config, args.command, 'retries')
         if args.bucket: bucket = args.bucket
         executor = Execute(source='gs', bucket=bucket, dst_format=dst_format,
                            prefix=prefix, auth_file=auth_file,
-                           outfolder=outfolder)
+                           download_concurrency=download_concurrency, retries=retries,
+                           outfolder=outfolder, **tuning_options)
     elif args.command == 's3':
         access_key = args.access_key if args.access_key else get_config_option(config, args.command, 'access_key')
         secret_key = args.secret_key if args.secret_key else get_config_option(config, args.command, 'secret_key')
         session_token = args.session_token if args.session_token else get_config_option(config, args.command, 'session_token')
+        download_concurrency = args.download_concurrency if args.download_concurrency else get_config_option(config, args.command, 'download_concurrency')
+        endpoint_url = args.endpoint_url if args.endpoint_url else get_config_option(config, args.command, 'endpoint_url')
+        retries = args.retries if args.retries is not None else get_config_option(config, args.command, 'retries')
         if args.bucket: bucket = args.bucket
        
         executor = Execute(source='s3', bucket=bucket, dst_format=dst_format,
                            prefix=prefix, access_key=access_key,
                            secret_key=secret_key, session_token=session_token,
-                           outfolder=outfolder)
+                           download_concurrency=download_concurrency,
+                           endpoint_url=endpoint_url, retries=retries,
+                           outfolder=outfolder, **tuning_options)
     elif args.command == 'fs':
         input_dir = args.input_dir if args.input_dir else get_config_option(config, args.command, 'input_dir')
         executor = Execute(source='fs', bucket=input_dir, dst_format=dst_format,
-                           prefix=prefix, outfolder=outfolder)
+                           prefix=prefix, outfolder=outfolder, **tuning_options)
     else:
         print('You must supply a source from gs, s3 or fs\n', file=sys.stderr)
         parser.print_help()
@@ -1,11 +1,43 @@
+import asyncio
 import avroconvert as avc
-from multiprocessing import cpu_count
+from avroconvert import logger
+from avroconvert.avroconvert import DEFAULT_ROW_GROUP_BYTES, check_compression
+from avroconvert.budget import MemoryBudget
+from avroconvert.filters import RecordFilter
+from avroconvert.manifest import MANIFEST_FILE, Manifest
+from avroconvert.metrics import RunMetrics
+from avroconvert.profiling import Profiler, clear_profiles, merge_profiles, start_worker_profile
+from avroconvert.sinks import is_remote, split_url, upload_memory
+from avroconvert.sources.aio import AsyncSource
+from avroconvert.sources.filesystem.reader import FileSystem
+from avroconvert.utils import available_cpus, parse_size
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import partial
+from json import dumps
+from math import ceil
+from os import remove as remove_file
+from os.path import dirname, exists, join
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from threading import Lock
+from typing import NamedTuple
 import concurrent
 
+# Estimated ratio of the memory used to convert avro data (decoded
+# records and arrow buffers) to the size of the avro data
+DECODE_EXPANSION = 4
+
 
 class Execute:
 
-    def __init__(self, source: str, bucket: str, dst_format: str, outfolder: str, prefix: str = '', **kwargs):
+    def __init__(self, source: str, bucket: str, dst_format: str, outfolder: str, prefix: str = '',
+                 row_group_size: int = None, row_group_bytes: int = None, split_size: int = None,
+                 partition_by=None, target_file_size: int = None, incremental: bool = False,
+                 manifest: str = None, columns=None, filter: str = None, workers: int = None,
+                 io_workers: int = None, max_memory: int = None, report: str = None,
+                 prometheus_file: str = None, profile: str = None, compression: str = None,
+                 compression_level: int = None, dictionary: bool = None, data_page_size=None, **kwargs):
         '''
         A wrapper class to run the avro convert operation. This class
         calls the reader methods (gcs, s3 or local) and avro converter
@@ -28,12 +60,16 @@ class Execute:
                           different sources will be converted to the
                           format specified by this parameter. It's
                           value should be one of these: 
-                          cs, parquet or json, defaults to parquet
+                          csv, parquet, json or jsonl (newline
+                          delimited json), defaults to parquet
         :type dst_format: str
 
         :param outfolder: Output folder. This is where the files
                          converted from avro to csv, parquet or json
-                         will be stored
+                         will be stored. It can be an s3:// or gs://
+                         url, eg. `s3://bucket/folder`, in which case
+                         the output files are uploaded while they are
+                         written
         :type outfolder: str
 
         :param prefix: File prefix. If given, files whose names start with
@@ -41,6 +77,132 @@ class Execute:
                       files will be omitted
         :type prefix: str
 
+        :param row_group_size: Maximum number of rows per row group of
+                               the parquet output files
+        :type row_group_size: int
+
+        :param row_group_bytes: Maximum size in bytes (or a human readable
+                                size such as `128MB`) of a row group of
+                                the parquet output files
+        :type row_group_bytes: int or str
+
+        :param split_size: Files larger than this size in bytes (or a
+                           human readable size such as `256MB`) are split
+                           at their avro block boundaries into parts of
+                           about this size, which are converted in
+                           parallel and written to separate part files.
+                           Files are not split if it is not given
+        :type split_size: int or str
+
+        :param partition_by: Columns to partition the output by, as a
+                             list or a comma separated string. The output
+                             is then a hive style partitioned parquet
+                             dataset rooted at `outfolder`, eg.
+                             `outfolder/country=IN/year=2021/FILE-0.parquet`.
+                             Only supported for the parquet format
+        :type partition_by: list or str
+
+        :param target_file_size: Compact small input files: files of the
+                                 same folder and avro schema are grouped
+                                 until their total size reaches this size
+                                 in bytes (or a human readable size such
+                                 as `512MB`), and every group is converted
+                                 into a single output file, named after
+                                 the group's first file by name, eg.
+                                 `FILE-compacted.parquet`. Files are not
+                                 compacted if it is not given. It cannot
+                                 be given for incremental runs
+        :type target_file_size: int or str
+
+        :param incremental: If True, files which were converted by a
+                            previous incremental run and have not changed
+                            since (same size and ETag, generation or
+                            modification time) are neither downloaded nor
+                            converted again. Converted files are recorded
+                            in a manifest
+        :type incremental: bool
+
+        :param manifest: Path of the manifest of incremental runs,
+                         defaults to `.avroconvert-manifest.sqlite` in
+                         the output folder
+        :type manifest: str
+
+        :param columns: Columns (top level avro fields) to convert, as a
+                        list or a comma separated string, eg. `name,city`.
+                        The other fields are skipped while decoding. All
+                        the fields are converted if it is not given
+        :type columns: list or str
+
+        :param filter: Expression selecting the records to convert, eg.
+                       `country == 'IN' and year >= 2021`; the other
+                       records are dropped as soon as they are decoded
+                       (see :class:`avroconvert.filters.RecordFilter`)
+        :type filter: str
+
+        :param workers: Number of worker processes converting the files.
+                        Decoding is cpu bound, so it defaults to the
+                        number of cpus available to the process, as
+                        limited by it's cpu affinity and the cpu quota
+                        of it's cgroup (eg. a container's cpu limit)
+        :type workers: int
+
+        :param io_workers: Number of files downloaded at the same time,
+                           defaults to `download_concurrency`, or 10.
+                           Downloads wait on the network rather than on
+                           the cpus, so they are sized separately from
+                           the worker processes
+        :type io_workers: int
+
+        :param max_memory: Memory budget of the run, in bytes (or a human
+                           readable size such as `4GB`). A download or
+                           conversion only starts when the budget has room
+                           for it's estimated memory: the parallel parts
+                           of a download, and `DECODE_EXPANSION` times the
+                           avro bytes a conversion buffers (at most a
+                           parquet row group). Not bounded if not given
+        :type max_memory: int or str
+
+        :param report: Path of the json run report, written at the end of
+                       the run (even a failed one) with the time, bytes
+                       and records of every stage (listing, download,
+                       decode and write), in total and per file, and the
+                       errors of the files which failed. The metrics are
+                       also kept in `metrics` after the run
+        :type report: str
+
+        :param prometheus_file: Path of a file the totals of the run are
+                                written to in the prometheus text format,
+                                eg. for the textfile collector of the
+                                node exporter
+        :type prometheus_file: str
+
+        :param profile: Folder to write cProfile stats to. The parent
+                        process (listing and downloads) and every worker
+                        process write their own pstats file, which are
+                        merged into `merged.pstats` and a report of the
+                        hot functions, `profile.txt`
+        :type profile: str
+
+        :param compression: Codec of the output files. Parquet files are
+                            compressed with none, snappy (the default),
+                            gzip, brotli, lz4 or zstd. Csv and json files
+                            are compressed with gzip, zstd or lz4
+                            while they are written, eg. to FILE.csv.zst,
+                            and are not compressed by default
+        :type compression: str
+
+        :param compression_level: Compression level of the codec, eg. 1
+                                  (fastest) to 22 (smallest) for zstd
+        :type compression_level: int
+
+        :param dictionary: Dictionary encode the parquet columns,
+                           defaults to True
+        :type dictionary: bool
+
+        :param data_page_size: Target size of the parquet data pages,
+                               eg. 1MB (the default)
+        :type data_page_size: int or str
+
         :key auth_file: Pass this parameter only when the source is `gs`.
                        It specifies the location of service account json
                        file to access google cloud storage. If google
@@ -63,9 +225,26 @@ class Execute:
 
         :key session_token: Pass this parameter only when the source is `s3`. 
                            It specifies AWS session token.
+
+        :key download_concurrency: Pass this parameter only when the source
+                                   is `s3` or `gs`. Maximum number of reads
+                                   in flight (including the ranged reads of
+                                   large files), shared by all the files the
+                                   run downloads at the same time, defaults
+                                   to 10
+
+        :key retries: Pass this parameter only when the source is `s3`
+                      or `gs`. Maximum number of retries, with exponential
+                      backoff, of a download (or of a ranged read of a
+                      large file) which failed with a transient error,
+                      defaults to 5
+
+        :key endpoint_url: Pass this parameter only when the source is `s3`.
+                           URL of an s3 compatible endpoint, eg. a local
+                           test server, to use instead of amazon s3
         '''
         _src = ['s3', 'gs', 'fs']
-        _dst_format = ['parquet', 'csv', 'json']
+        _dst_format = ['parquet', 'csv', 'json', 'jsonl']
         source = source.lower()
         if not dst_format:
             raise AttributeError(f'Output format not specified, should be one of {_dst_format}')
@@ -81,12 +260,62 @@ class Execute:
         if not bucket:
             raise Exception(
                 f'Please specify a bucket')
+        if isinstance(partition_by, str):
+            partition_by = [column.strip() for column in partition_by.split(',') if column.strip()]
+        if isinstance(columns, str):
+            columns = [column.strip() for column in columns.split(',') if column.strip()]
+        if filter:
+            # Fail on an invalid expression before any file is read
+            RecordFilter(filter)
+        compression = check_compression(dst_format, compression, compression_level)
+        if compression in (None, 'none'):
+            compression_level = None
+        if (dictionary is not None or data_page_size) and dst_format != 'parquet':
+            raise Exception(
+                f'Dictionary encoding and data page size are only supported for the parquet format, not {dst_format}')
+        if partition_by and dst_format != 'parquet':
+            raise Exception(
+                f'Partitioned output is only supported for the parquet format, not {dst_format}')
+        if incremental and target_file_size:
+            # A compacted output holds the records of a whole group, so
+            # converting only the changed files of a group again would
+            # drop the records of the others, or write them twice
+            raise ValueError('Incremental runs cannot compact files, please give either '
+                             'incremental or target_file_size')
+        if is_remote(outfolder):
+            # Fail on an invalid url before any file is read
+            split_url(outfolder)
+            if incremental and not manifest:
+                raise ValueError(f'The manifest of incremental runs cannot be written to {outfolder}, '
+                                 f'please give a local manifest path')
         self.source = source
         self.bucket = bucket
         self.prefix = prefix
         self.dst_format = dst_format
         self.outfolder = outfolder
         self.params = kwargs
+        self.split_size = parse_size(split_size) if split_size else None
+        self.target_file_size = parse_size(target_file_size) if target_file_size else None
+        self.incremental = incremental
+        self.manifest = manifest
+        self.workers = int(workers) if workers else None
+        self.io_workers = int(io_workers) if io_workers else None
+        self.max_memory = parse_size(max_memory) if max_memory else None
+        self.report = report
+        self.prometheus_file = prometheus_file
+        self.profile = profile
+        self.metrics = None
+        convert_options = {'row_group_size': row_group_size,
+                           'row_group_bytes': parse_size(row_group_bytes) if row_group_bytes else None,
+                           'partition_by': partition_by or None,
+                           'columns': columns or None,
+                           'filter': filter or None,
+                           'compression': compression,
+                           'compression_level': compression_level,
+                           'dictionary': dictionary,
+                           'data_page_size': parse_size(data_page_size) if data_page_size else None}
+        self.convert_options = {option: value for option, value in convert_options.items()
+                                if value is not None}
 
     def _resolve(self):
         '''
@@ -105,14 +334,552 @@ class Execute:
         '''
         Executor method for the AvroConverter class. This method
         parallelizes the execution for all the file read->convert->write operations.
+
+        Files are listed and downloaded asynchronously (see
+        :class:`avroconvert.sources.AsyncSource`) while the worker
+        processes convert the files already downloaded, so network
+        latency overlaps with decoding. Downloaded files go through a
+        queue of at most `workers` files; when the queue is full no
+        new download starts, which bounds the number of local copies
+        waiting for a worker. The tasks sent to the workers only describe
+        the file to convert (see :class:`ConvertTask`); the workers memory
+        map the local copies, so no file data goes through the pool. At
+        most `workers` tasks are waiting in the pool at any time.
+        Files larger than `split_size` are split into block ranges so that
+        a single large file is converted by several workers. If a
+        `max_memory` budget is given, downloads and tasks only start
+        when the budget has room for their estimated memory.
+
+        The readers retry failed downloads (see `retries`). A file
+        which still fails to download, or fails to convert, does not
+        stop the run: the other files are converted, and the run raises
+        an exception listing the failed files at the end. For
+        incremental runs, the next run only converts the failed
+        files again.
+
+        The run has an event loop of it's own. When it is called from
+        a running event loop, eg. in a jupyter notebook or an async
+        application, it's loop runs on a thread of it's own, and the
+        calling thread waits for it.
+
+        :returns: True if files were converted, None if no file
+                  was found (or, for incremental runs, no file changed)
+        :rtype: bool
+        '''
+        self.metrics = RunMetrics(source=self.source, bucket=self.bucket, dst_format=self.dst_format)
+        self.profiler = None
+        if self.profile:
+            clear_profiles(self.profile)
+            self.profiler = Profiler(self.profile, 'parent')
+            self.profiler.start()
+        try:
+            return self._run_loop()
+        finally:
+            self.metrics.finish()
+            self._write_metrics()
+            if self.profiler is not None:
+                self.profiler.dump()
+                merge_profiles(self.profile)
+
+    def _run_loop(self) -> bool:
+        '''
+        Run `_run` in a new event loop, on a thread of it's own
+        if the calling thread already runs an event loop
+        '''
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self._run())
+        initializer = self.profiler.start if self.profiler is not None else None
+        with ThreadPoolExecutor(max_workers=1, initializer=initializer) as pool:
+            return pool.submit(asyncio.run, self._run()).result()
+
+    def _write_metrics(self) -> None:
+        '''
+        Log the totals of the run, and write the run report and
+        the prometheus metrics file, if they were asked for
+        '''
+        report = self.metrics.report()
+        logger.info(f'Converted {report["records"]} records of {report["files"]} files '
+                    f'in {report["seconds"]:.2f}s; ' + ', '.join(
+                        f'{stage} {totals["seconds"]:.2f}s' for stage, totals in report['stages'].items()))
+        if report['failed_files']:
+            logger.error(f'{len(report["failed_files"])} files failed: {", ".join(report["failed_files"])}')
+        if self.report:
+            self.metrics.write_report(self.report)
+        if self.prometheus_file:
+            self.metrics.write_prometheus(self.prometheus_file)
+
+    async def _run(self) -> bool:
+        reader = self._resolve()
+        num_process = self.workers or available_cpus()
+        converter_params = dict(dst_format=self.dst_format, outfolder=self.outfolder,
+                                **self.convert_options)
+        if self._storage_options():
+            converter_params['storage_options'] = self._storage_options()
+        avro_object = avc.AvroConvert(**converter_params)
+        initargs = (self.source, self.bucket, self.prefix, self.params, converter_params, self.profile)
+        manifest = Manifest(self.manifest or join(self.outfolder, MANIFEST_FILE), source=self.source,
+                            bucket=self.bucket, dst_format=self.dst_format) if self.incremental else None
+        budget = MemoryBudget(self.max_memory) if self.max_memory else None
+        with manifest or nullcontext(), \
+                TemporaryDirectory(prefix='avroconvert-') as spool_dir, \
+                concurrent.futures.ProcessPoolExecutor(max_workers=num_process,
+                                                       initializer=_init_worker,
+                                                       initargs=initargs) as executor:
+            source = AsyncSource(reader, spool_dir=spool_dir if self.source != 'fs' else None,
+                                 concurrency=self.io_workers or self.params.get('download_concurrency'),
+                                 budget=budget, metrics=self.metrics, profiler=self.profiler)
+            loop = asyncio.get_running_loop()
+            if self.profiler is not None:
+                loop.set_default_executor(ThreadPoolExecutor(initializer=self.profiler.start))
+            queue = asyncio.Queue(maxsize=num_process)
+            producer = asyncio.create_task(self._fetch(source, queue, manifest))
+            in_flight = set()
+            num_files = 0
+            groups = dict()
+
+            async def submit(files):
+                nonlocal in_flight
+                if len(files) == 1:
+                    tasks = await loop.run_in_executor(
+                        None, self._tasks, *files[0], avro_object, num_process)
+                else:
+                    tasks = [self._compact_task(files)]
+                futures = list()
+                for task in tasks:
+                    if len(in_flight) >= num_process:
+                        _, in_flight = await loop.run_in_executor(None, partial(
+                            concurrent.futures.wait, in_flight,
+                            return_when=concurrent.futures.FIRST_COMPLETED))
+                    if budget is not None:
+                        task_memory = await loop.run_in_executor(
+                            None, budget.acquire, self._task_memory(task))
+                    worker_function = _compact_files if isinstance(task, CompactTask) else _convert_file
+                    futures.append(executor.submit(worker_function, task))
+                    in_flight.add(futures[-1])
+                    futures[-1].add_done_callback(partial(_task_done, self.metrics, task))
+                    if budget is not None:
+                        futures[-1].add_done_callback(
+                            lambda future, task_memory=task_memory: budget.release(task_memory))
+                for handle, path in files:
+                    _when_done(futures, partial(_file_done, handle, path, manifest))
+
+            try:
+                while True:
+                    fetched = await queue.get()
+                    if fetched is None:
+                        break
+                    if isinstance(fetched, Exception):
+                        raise fetched
+                    num_files += 1
+                    if self.target_file_size:
+                        ready = await loop.run_in_executor(
+                            None, self._group, groups, *fetched, avro_object)
+                    else:
+                        ready = [[fetched]]
+                    for files in ready:
+                        await submit(files)
+                for files in groups.values():
+                    await submit(files)
+            finally:
+                # Stop the downloads before the spool folder is removed
+                producer.cancel()
+                await asyncio.gather(producer, return_exceptions=True)
+        # The pool is shut down, so the errors of all the tasks are recorded
+        self._raise_failures(source.failed)
+        return True if num_files else None
+
+    def _raise_failures(self, failed_downloads: dict) -> None:
+        '''
+        Raise an exception listing the files which failed to
+        download or to convert, if there are any
+
+        :param failed_downloads: Error of every file which failed to download
+        :type failed_downloads: dict
+        '''
+        failed_conversions = [name for name in self.metrics.report()['failed_files']
+                              if name not in failed_downloads]
+        messages = list()
+        if failed_downloads:
+            messages.append(f'Download of {len(failed_downloads)} files failed: '
+                            f'{", ".join(sorted(failed_downloads))}')
+        if failed_conversions:
+            messages.append(f'Conversion of {len(failed_conversions)} files failed: '
+                            f'{", ".join(failed_conversions)}')
+        if messages:
+            raise Exception('; '.join(messages)) from next(iter(failed_downloads.values()), None)
+
+    @staticmethod
+    async def _fetch(source, queue, manifest=None):
+        '''
+        List and download the files of the source into the queue,
+        followed by None once all files are downloaded. An error
+        is passed on through the queue, to be raised by the consumer.
+        Files recorded as converted in the manifest (if one is given)
+        are skipped before they are downloaded.
+        '''
+        try:
+            handles = source.list_files()
+            if manifest is not None:
+                handles = _unconverted(handles, manifest)
+            fetched_files = source.fetch(handles)
+            try:
+                async for fetched in fetched_files:
+                    await queue.put(fetched)
+            finally:
+                await fetched_files.aclose()
+        except Exception as e:
+            await queue.put(e)
+            return
+        await queue.put(None)
+
+    def _tasks(self, handle, path: str, avro_object, num_process: int) -> list:
+        '''
+        Build the conversion tasks for a file. Files larger than
+        `split_size` are split into up to `num_process` parts, one task
+        per part; all other files are a single task. To split a file,
+        it's block boundaries are scanned from a memory map of the
+        local file (or of it's local copy).
+
+        :param handle: Handle of the file to convert
+        :type handle: :class:`avroconvert.sources.FileHandle`
+
+        :param path: Path of the local copy of the file, None
+                     for local files
+        :type path: str
+
+        :param avro_object: Converter used to split the file
+        :type avro_object: :class:`avroconvert.AvroConvert`
+
+        :param num_process: Number of worker processes
+        :type num_process: int
+
+        :returns: list of tasks, to be submitted to the process pool
+        :rtype: list of :class:`ConvertTask`
+        '''
+        task = ConvertTask(source=self.source, bucket=self.bucket,
+                           name=handle.name, size=handle.size, path=path)
+        if not self.split_size or handle.size <= self.split_size:
+            return [task]
+
+        num_parts = min(ceil(handle.size / self.split_size), num_process)
+        with FileSystem.map_file(path or handle.name) as data:
+            block_ranges = avro_object.block_ranges(data, num_parts)
+        if len(block_ranges) < 2:
+            return [task]
+        logger.info(f'Splitting file {handle.name} into {len(block_ranges)} parts')
+        return [task._replace(block_range=block_range, part=part)
+                for part, block_range in enumerate(block_ranges)]
+
+    def _storage_options(self) -> dict:
+        '''
+        Options of the uploads to an s3:// or gs:// output folder. The
+        credentials of the source are used when the output folder is in
+        the same object store, otherwise the clients find their
+        credentials in the environment.
+
+        :rtype: dict
+        '''
+        if not is_remote(self.outfolder):
+            return dict()
+        scheme = split_url(self.outfolder)[0]
+        names = {'s3': ('access_key', 'secret_key', 'session_token', 'endpoint_url', 'retries'),
+                 'gs': ('auth_file', 'retries')}
+        if scheme != self.source:
+            return dict()
+        return {name: self.params[name] for name in names[scheme] if self.params.get(name) is not None}
+
+    def _task_memory(self, task) -> int:
+        '''
+        Estimate the memory a worker needs to convert a task. Records
+        are streamed to the writer, so a worker holds the decoded avro
+        bytes of at most one parquet row group (or of the whole task,
+        if it is smaller), times `DECODE_EXPANSION`, plus the parts
+        of the upload of an s3:// or gs:// output file. The json
+        writer renders the whole task at once, so it holds all of it's
+        decoded bytes.
+
+        :param task: Task to convert
+        :type task: :class:`ConvertTask` or :class:`CompactTask`
+
+        :returns: number of bytes
+        :rtype: int
+        '''
+        task_bytes = _task_bytes(task)
+        if self.dst_format != 'json':
+            task_bytes = min(task_bytes, self.convert_options.get('row_group_bytes', DEFAULT_ROW_GROUP_BYTES))
+        memory = task_bytes * DECODE_EXPANSION
+        if is_remote(self.outfolder):
+            storage_options = self._storage_options()
+            memory += upload_memory(part_size=storage_options.get('part_size'),
+                                    concurrency=storage_options.get('concurrency'))
+        return memory
+
+    def _group(self, groups: dict, handle, path: str, avro_object) -> list:
+        '''
+        Add a file to the compaction group of it's folder and avro
+        schema. Files are only compacted with files of the same folder
+        and schema, so that they can be written to the same output file.
+
+        :param groups: Compaction groups being filled, by folder and schema
+        :type groups: dict
+
+        :param handle: Handle of the file
+        :type handle: :class:`avroconvert.sources.FileHandle`
+
+        :param path: Path of the local copy of the file, None
+                     for local files
+        :type path: str
+
+        :param avro_object: Converter used to read the file's schema
+        :type avro_object: :class:`avroconvert.AvroConvert`
+
+        :returns: the groups which reached `target_file_size` and have to
+                  be converted; each group is a list of (handle, path).
+                  Files of at least `target_file_size` (and empty files)
+                  are converted on their own, as a group of one file
+        :rtype: list
+        '''
+        if handle.size >= self.target_file_size:
+            return [[(handle, path)]]
+        with FileSystem.map_file(path or handle.name) as data:
+            avro_schema = avro_object.read_schema(data) if data else None
+        if avro_schema is None:
+            return [[(handle, path)]]
+        key = (dirname(handle.name), dumps(avro_schema, sort_keys=True))
+        group = groups.setdefault(key, list())
+        group.append((handle, path))
+        if sum(group_handle.size for group_handle, _ in group) < self.target_file_size:
+            return []
+        del groups[key]
+        return [group]
+
+    def _compact_task(self, files: list):
+        '''
+        Build the task converting a group of files into one output
+        file. The files are converted in the order of their names, and
+        the output file is named after the first one, eg.
+        `FILE-compacted.parquet`, so it does not depend on the order
+        the files were downloaded in.
+
+        :param files: Files of the group, as (handle, path) tuples
+        :type files: list
+
+        :rtype: :class:`CompactTask`
         '''
-        raw_content = self._resolve().get_data()
-        if not raw_content:
-            return 
-        num_process = cpu_count()*2
-        avro_object = avc.AvroConvert(
-            dst_format=self.dst_format, outfolder=self.outfolder)
-        with concurrent.futures.ProcessPoolExecutor(max_workers=int(num_process)) as executor:
-            results = [executor.submit(
-                avro_object.convert_avro, **{'filename': filename, 'data': avrodata}) for filename, avrodata in raw_content.items()]
-        return True
+        files = sorted(files, key=lambda file: file[0].name)
+        first_name = files[0][0].name
+        name = join(dirname(first_name), f'{Path(first_name).stem}-compacted.avro')
+        logger.info(f'Compacting {len(files)} files into {name}')
+        return CompactTask(name=name, inputs=tuple(
+            ConvertTask(source=self.source, bucket=self.bucket, name=handle.name,
+                        size=handle.size, path=path) for handle, path in files))
+
+
+class ConvertTask(NamedTuple):
+    '''
+    Description of a file (or a part of a file) to convert. Tasks
+    are sent to the worker processes instead of the file's data.
+
+    :param source: Name of the source file system, gs, s3 or fs
+    :type source: str
+
+    :param bucket: Name of the bucket (or input folder) of the file
+    :type bucket: str
+
+    :param name: Name of the file (with it's source path)
+    :type name: str
+
+    :param size: Size of the file in bytes
+    :type size: int
+
+    :param path: Path of a local copy of the file, which is memory
+                 mapped instead of reading the file from the source
+    :type path: str
+
+    :param block_range: (header_size, start, end) of the avro blocks
+                        to convert, None to convert the whole file
+    :type block_range: tuple
+
+    :param part: Index of the part of a split file
+    :type part: int
+    '''
+    source: str
+    bucket: str
+    name: str
+    size: int
+    path: str = None
+    block_range: tuple = None
+    part: int = None
+
+
+class CompactTask(NamedTuple):
+    '''
+    Description of a group of files to convert into one output file
+
+    :param name: Name the output file is named after, with the
+                 folder of the input files
+    :type name: str
+
+    :param inputs: Files to convert, in order
+    :type inputs: tuple of :class:`ConvertTask`
+    '''
+    name: str
+    inputs: tuple
+
+
+# Reader and converter of the worker process, built once
+# per process and reused for every task
+_worker = dict()
+
+
+def _init_worker(source: str, bucket: str, prefix: str, reader_params: dict, converter_params: dict,
+                 profile_dir: str = None):
+    '''
+    Initializer of the worker processes. Builds the converter once
+    per process. The source reader (and with it the storage client)
+    is only built by the first task which needs it, see `_reader`;
+    files downloaded by the parent process are read from their local
+    copies without a reader. If a `profile_dir` is given, the worker
+    is profiled until it exits.
+    '''
+    if profile_dir:
+        start_worker_profile(profile_dir)
+    reader_function = getattr(avc, f'{source}_reader')
+    _worker['reader'] = None
+    _worker['reader_factory'] = partial(reader_function, bucket=bucket, prefix=prefix, **reader_params)
+    _worker['converter'] = avc.AvroConvert(**converter_params)
+
+
+def _reader():
+    '''
+    Source reader of the worker process, built on first use
+    '''
+    if _worker['reader'] is None:
+        _worker['reader'] = _worker['reader_factory']()
+    return _worker['reader']
+
+
+def _open_file(task: ConvertTask):
+    '''
+    Open the file of a task: it's local copy if the task has one,
+    or the file read by the worker's reader otherwise (local files
+    are memory mapped)
+
+    :returns: context manager yielding the file's data
+    '''
+    if task.path:
+        return FileSystem.map_file(task.path)
+    return _reader().open_file(task.name, size=task.size)
+
+
+def _task_bytes(task) -> int:
+    '''
+    Number of avro bytes a task converts
+    '''
+    if isinstance(task, CompactTask):
+        return sum(input_task.size for input_task in task.inputs)
+    if task.block_range:
+        _, start, end = task.block_range
+        return end - start
+    return task.size
+
+
+def _convert_file(task: ConvertTask) -> dict:
+    '''
+    Worker function converting one task. The file is mapped from
+    it's local copy if the task has one, or read by the worker's
+    reader otherwise (local files are memory mapped).
+
+    :param task: File to convert
+    :type task: :class:`ConvertTask`
+
+    :returns: metrics of the task: the file `name` and `size`, the
+              avro `bytes` converted, and the stats of `convert_avro`
+    :rtype: dict
+    '''
+    stats = dict(name=task.name, size=task.size, bytes=_task_bytes(task))
+    with _open_file(task) as data:
+        _worker['converter'].convert_avro(filename=task.name, data=data, block_range=task.block_range,
+                                          part=task.part, stats=stats)
+    return stats
+
+
+def _compact_files(task: CompactTask) -> dict:
+    '''
+    Worker function converting a group of files into one output file.
+    The files are opened one after the other, as the converter reaches
+    them.
+
+    :param task: Files to convert
+    :type task: :class:`CompactTask`
+
+    :returns: metrics of the task, as for `_convert_file`
+    :rtype: dict
+    '''
+    def inputs():
+        for input_task in task.inputs:
+            with _open_file(input_task) as data:
+                yield input_task.name, data
+    stats = dict(name=task.name, size=_task_bytes(task), bytes=_task_bytes(task))
+    _worker['converter'].compact_avro(filename=task.name, inputs=inputs(), stats=stats)
+    return stats
+
+
+def _task_done(metrics: RunMetrics, task, future) -> None:
+    '''
+    Record the metrics of a finished task, or it's error
+    '''
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        metrics.record_error(task.name, error)
+    else:
+        metrics.record_task(future.result())
+
+
+async def _unconverted(handles, manifest):
+    '''
+    Skip the files which are recorded as converted in the manifest
+    '''
+    num_skipped = 0
+    async for handle in handles:
+        if manifest.is_converted(handle):
+            logger.debug(f'Skipping file {handle.name}, it has not changed since it was converted')
+            num_skipped += 1
+            continue
+        yield handle
+    logger.info(f'Skipped {num_skipped} files which have not changed since they were converted')
+
+
+def _file_done(handle, path: str, manifest, futures: list):
+    '''
+    Clean up once all the tasks of a file are done: delete the
+    file's spooled local copy, if any, and record the file in the
+    manifest (of incremental runs) if all the tasks succeeded.
+    '''
+    if path and exists(path):
+        remove_file(path)
+    if manifest is not None and \
+            all(not future.cancelled() and future.exception() is None for future in futures):
+        manifest.record(handle)
+
+
+def _when_done(futures: list, callback):
+    '''
+    Call `callback` with the futures once all of them are done
+    '''
+    pending = set(futures)
+    lock = Lock()
+
+    def done(future):
+        with lock:
+            pending.discard(future)
+            if pending:
+                return
+        callback(futures)
+
+    for future in futures:
+        future.add_done_callback(done)
@@ -0,0 +1,120 @@
+"""Record filters, parsed from the --filter expressions of the cli."""
+import ast
+import operator
+
+_COMPARISONS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Is: operator.is_,
+    ast.IsNot: operator.is_not,
+    ast.In: lambda value, values: value in values,
+    ast.NotIn: lambda value, values: value not in values,
+}
+
+
+class RecordFilter:
+    '''
+    A predicate over the records decoded from avro files, written
+    as a python style boolean expression over the record's fields,
+    eg. `country == 'IN' and year >= 2021`.
+
+    The expression is parsed once and compiled to plain functions;
+    it is never evaluated as python code. It supports comparisons
+    (`==`, `!=`, `<`, `<=`, `>`, `>=`, `in`, `not in`, `is None`,
+    `is not None`), `and`, `or`, `not`, parentheses, literals
+    (strings, numbers, True, False, None and lists of them) and
+    field names, with `.` for the fields of nested records, eg.
+    `address.city == 'Mumbai'`. A field which is null (or a missing
+    nested field) never compares less or greater than a value.
+
+    :param expression: The filter expression
+    :type expression: str
+    '''
+
+    def __init__(self, expression: str):
+        '''
+        :param expression: The filter expression
+        :type expression: str
+        '''
+        self.expression = expression
+        #: Top level fields the expression reads
+        self.fields = list()
+        try:
+            tree = ast.parse(expression.strip(), mode='eval')
+        except SyntaxError as e:
+            raise ValueError(f'Invalid filter {expression}: {e.msg}')
+        self._predicate = self._compile(tree.body)
+
+    def __call__(self, record: dict) -> bool:
+        return bool(self._predicate(record))
+
+    def _compile(self, node):
+        '''
+        Compile an expression node to a function of the record
+        '''
+        if isinstance(node, ast.BoolOp):
+            operands = [self._compile(value) for value in node.values]
+            if isinstance(node.op, ast.And):
+                return lambda record: all(operand(record) for operand in operands)
+            return lambda record: any(operand(record) for operand in operands)
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            operand = self._compile(node.operand)
+            return lambda record: not operand(record)
+        if isinstance(node, ast.Compare):
+            return self._compile_compare(node)
+        if isinstance(node, (ast.Name, ast.Attribute)):
+            return self._compile_field(node)
+        value = self._literal(node)
+        return lambda record: value
+
+    def _compile_compare(self, node: ast.Compare):
+        operands = [self._compile(node.left)] + [self._compile(value) for value in node.comparators]
+        comparisons = list()
+        for op, left, right in zip(node.ops, operands, operands[1:]):
+            if type(op) not in _COMPARISONS:
+                raise ValueError(f'Invalid filter {self.expression}: unsupported comparison')
+            comparisons.append((_COMPARISONS[type(op)], left, right))
+
+        def compare(record):
+            for function, left, right in comparisons:
+                try:
+                    if not function(left(record), right(record)):
+                        return False
+                except TypeError:
+                    # eg. None < 1
+                    return False
+            return True
+        return compare
+
+    def _compile_field(self, node):
+        path = list()
+        while isinstance(node, ast.Attribute):
+            path.insert(0, node.attr)
+            node = node.value
+        if not isinstance(node, ast.Name):
+            raise ValueError(f'Invalid filter {self.expression}: unsupported field {ast.dump(node)}')
+        if node.id not in self.fields:
+            self.fields.append(node.id)
+        path.insert(0, node.id)
+
+        def field(record):
+            for name in path:
+                if record is None:
+                    return None
+                record = record.get(name)
+            return record
+        return field
+
+    def _literal(self, node):
+        try:
+            value = ast.literal_eval(node)
+        except ValueError:
+            raise ValueError(f'Invalid filter {self.expression}: unsupported expression '
+                             f'{ast.get_source_segment(self.expression.strip(), node)}')
+        if isinstance(value, (list, set)):
+            return tuple(value)
+        return value
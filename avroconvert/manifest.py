@@ -0,0 +1,107 @@
+"""Manifest of the converted files, used by incremental runs."""
+import sqlite3
+from datetime import datetime, timezone
+from pathlib import Path
+from threading import Lock
+
+MANIFEST_FILE = '.avroconvert-manifest.sqlite'
+
+
+class Manifest:
+    '''
+    A sqlite database recording which input files were converted,
+    and which version of them. A file is only converted again by an
+    incremental run if it is new, or if it's size or version (ETag,
+    generation or modification time) changed since it was converted.
+
+    Files are recorded per source, bucket and output format, so that
+    converting the same files to another format is not skipped. The
+    recorded files are loaded once, when the manifest is opened.
+
+    :param path: Path of the manifest database file
+    :type path: str
+
+    :param source: Name of the source file system, gs, s3 or fs
+    :type source: str
+
+    :param bucket: Name of the bucket (or input folder)
+    :type bucket: str
+
+    :param dst_format: Output format of the conversion
+    :type dst_format: str
+    '''
+
+    def __init__(self, path: str, source: str, bucket: str, dst_format: str):
+        '''
+        :param path: Path of the manifest database file
+        :type path: str
+
+        :param source: Name of the source file system, gs, s3 or fs
+        :type source: str
+
+        :param bucket: Name of the bucket (or input folder)
+        :type bucket: str
+
+        :param dst_format: Output format of the conversion
+        :type dst_format: str
+        '''
+        self.path = path
+        self._key = (source, bucket, dst_format)
+        self._lock = Lock()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        # Files are recorded from the threads of the process pool
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                'CREATE TABLE IF NOT EXISTS files (source TEXT, bucket TEXT, dst_format TEXT, '
+                'name TEXT, size INTEGER, version TEXT, converted_at TEXT, '
+                'PRIMARY KEY (source, bucket, dst_format, name))')
+        rows = self._connection.execute(
+            'SELECT name, size, version FROM files WHERE source = ? AND bucket = ? AND dst_format = ?',
+            self._key)
+        self._files = {name: (size, version) for name, size, version in rows}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def is_converted(self, handle) -> bool:
+        '''
+        Check if a file was converted, and has not changed since then.
+        Files whose source does not report a version are never
+        considered converted.
+
+        :param handle: Handle of the file, as listed by the source
+        :type handle: :class:`avroconvert.sources.FileHandle`
+
+        :rtype: bool
+        '''
+        if handle.version is None:
+            return False
+        return self._files.get(handle.name) == (handle.size, str(handle.version))
+
+    def record(self, handle) -> None:
+        '''
+        Record a file as converted. The record is committed at once,
+        so an interrupted run keeps the files it had converted.
+
+        :param handle: Handle of the converted file
+        :type handle: :class:`avroconvert.sources.FileHandle`
+        '''
+        if handle.version is None:
+            return
+        version = str(handle.version)
+        converted_at = datetime.now(timezone.utc).isoformat()
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                     (*self._key, handle.name, handle.size, version, converted_at))
+            self._files[handle.name] = (handle.size, version)
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,225 @@
+"""Per stage metrics of a run, and the run report built from them."""
+from datetime import datetime, timezone
+from json import dump
+from os import replace
+from pathlib import Path
+from threading import Lock
+from time import perf_counter
+
+STAGES = ('list', 'download', 'decode', 'write')
+
+
+def _label_value(value) -> str:
+    '''
+    Escape a prometheus label value
+    '''
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class RunMetrics:
+    '''
+    Timings, bytes, record counts and errors of a run, per stage and
+    per file. The stages are listing the files, downloading them to
+    the spool folder, decoding the avro records (in the workers) and
+    writing the output files (in the workers). Decoding and writing
+    are interleaved since the records are streamed to the writers, so
+    the write time of a task is it's time not spent decoding.
+
+    Metrics are recorded from the threads of the async source and
+    from the done callbacks of the process pool.
+
+    :param source: Name of the source file system, gs, s3 or fs
+    :type source: str
+
+    :param bucket: Name of the bucket (or input folder)
+    :type bucket: str
+
+    :param dst_format: Output format of the conversion
+    :type dst_format: str
+    '''
+
+    def __init__(self, source: str = None, bucket: str = None, dst_format: str = None):
+        '''
+        :param source: Name of the source file system, gs, s3 or fs
+        :type source: str
+
+        :param bucket: Name of the bucket (or input folder)
+        :type bucket: str
+
+        :param dst_format: Output format of the conversion
+        :type dst_format: str
+        '''
+        self.source = source
+        self.bucket = bucket
+        self.dst_format = dst_format
+        self.started_at = datetime.now(timezone.utc)
+        self.seconds = None
+        self.stages = {stage: {'seconds': 0.0, 'bytes': 0, 'files': 0, 'records': 0} for stage in STAGES}
+        self.files = dict()
+        self._start = perf_counter()
+        self._lock = Lock()
+
+    def _file(self, name: str) -> dict:
+        return self.files.setdefault(name, {'size': None, 'download_seconds': 0.0, 'records': 0,
+                                            'decode_seconds': 0.0, 'write_seconds': 0.0,
+                                            'tasks': 0, 'errors': []})
+
+    def record_listing(self, seconds: float, files: int = 0) -> None:
+        '''
+        Record time spent listing the source
+
+        :param seconds: Time spent waiting for the listing
+        :type seconds: float
+
+        :param files: Number of files listed
+        :type files: int
+        '''
+        with self._lock:
+            self.stages['list']['seconds'] += seconds
+            self.stages['list']['files'] += files
+
+    def record_download(self, name: str, nbytes: int, seconds: float) -> None:
+        '''
+        Record the download of a file to the spool folder
+
+        :param name: Name of the file
+        :type name: str
+
+        :param nbytes: Number of bytes downloaded
+        :type nbytes: int
+
+        :param seconds: Duration of the download
+        :type seconds: float
+        '''
+        with self._lock:
+            stage = self.stages['download']
+            stage['seconds'] += seconds
+            stage['bytes'] += nbytes
+            stage['files'] += 1
+            file_metrics = self._file(name)
+            file_metrics['size'] = nbytes
+            file_metrics['download_seconds'] += seconds
+
+    def record_task(self, task_metrics: dict) -> None:
+        '''
+        Record a conversion task, from the metrics returned by the
+        worker: the task's file `name`, the avro `bytes` it read,
+        the number of `records` and the `decode_seconds` and
+        `write_seconds` of the task
+
+        :param task_metrics: Metrics of the task
+        :type task_metrics: dict
+        '''
+        with self._lock:
+            for stage in ('decode', 'write'):
+                self.stages[stage]['seconds'] += task_metrics.get(f'{stage}_seconds', 0.0)
+                self.stages[stage]['bytes'] += task_metrics.get('bytes', 0)
+                self.stages[stage]['records'] += task_metrics.get('records', 0)
+            file_metrics = self._file(task_metrics['name'])
+            if file_metrics['size'] is None:
+                file_metrics['size'] = task_metrics.get('size')
+            file_metrics['tasks'] += 1
+            for key in ('records', 'decode_seconds', 'write_seconds'):
+                file_metrics[key] += task_metrics.get(key, 0)
+
+    def record_error(self, name: str, error: BaseException) -> None:
+        '''
+        Record an error which failed the conversion (or the
+        download) of a file
+
+        :param name: Name of the file
+        :type name: str
+
+        :param error: The error
+        :type error: Exception
+        '''
+        with self._lock:
+            self._file(name)['errors'].append(f'{type(error).__name__}: {error}')
+
+    def finish(self) -> None:
+        '''
+        Stop the clock of the run
+        '''
+        self.seconds = perf_counter() - self._start
+        for stage in ('decode', 'write'):
+            self.stages[stage]['files'] = sum(1 for file_metrics in self.files.values()
+                                              if file_metrics['tasks'])
+
+    def report(self) -> dict:
+        '''
+        Build the run report: the totals and throughput of every
+        stage, and the metrics of every file
+
+        :rtype: dict
+        '''
+        with self._lock:
+            seconds = self.seconds if self.seconds is not None else perf_counter() - self._start
+            stages = dict()
+            for stage, totals in self.stages.items():
+                stages[stage] = dict(totals)
+                if totals['seconds'] and totals['bytes']:
+                    stages[stage]['mb_per_s'] = round(totals['bytes'] / totals['seconds'] / 1024 ** 2, 3)
+                if totals['seconds'] and totals['records']:
+                    stages[stage]['records_per_s'] = round(totals['records'] / totals['seconds'], 1)
+            failed = sorted(name for name, file_metrics in self.files.items() if file_metrics['errors'])
+            return {
+                'source': self.source, 'bucket': self.bucket, 'dst_format': self.dst_format,
+                'started_at': self.started_at.isoformat(), 'seconds': round(seconds, 6),
+                'files': len(self.files), 'records': self.stages['decode']['records'],
+                'failed_files': failed, 'stages': stages,
+                'per_file': {name: dict(file_metrics, errors=list(file_metrics['errors']))
+                             for name, file_metrics in self.files.items()},
+            }
+
+    def write_report(self, path: str) -> None:
+        '''
+        Write the run report as a json file
+
+        :param path: Path of the report file
+        :type path: str
+        '''
+        report = self.report()
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w') as f:
+            dump(report, f, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        '''
+        Write the totals of the run in the prometheus text format, for
+        the textfile collector of the node exporter. The file is written
+        next to it's final path and renamed, so that the collector never
+        reads a partial file.
+
+        :param path: Path of the metrics file, ending with `.prom`
+        :type path: str
+        '''
+        report = self.report()
+        labels = ','.join(f'{name}="{_label_value(value)}"' for name, value in (
+            ('source', self.source), ('bucket', self.bucket), ('dst_format', self.dst_format)))
+        lines = [
+            '# HELP avroconvert_run_seconds Duration of the last run',
+            '# TYPE avroconvert_run_seconds gauge',
+            f'avroconvert_run_seconds{{{labels}}} {report["seconds"]}',
+            '# HELP avroconvert_run_timestamp_seconds Start time of the last run',
+            '# TYPE avroconvert_run_timestamp_seconds gauge',
+            f'avroconvert_run_timestamp_seconds{{{labels}}} {self.started_at.timestamp()}',
+            '# HELP avroconvert_files Files converted by the last run',
+            '# TYPE avroconvert_files gauge',
+            f'avroconvert_files{{{labels}}} {report["files"]}',
+            '# HELP avroconvert_failed_files Files whose conversion failed in the last run',
+            '# TYPE avroconvert_failed_files gauge',
+            f'avroconvert_failed_files{{{labels}}} {len(report["failed_files"])}',
+            '# HELP avroconvert_records Records converted by the last run',
+            '# TYPE avroconvert_records gauge',
+            f'avroconvert_records{{{labels}}} {report["records"]}',
+        ]
+        for metric, key, description in (('stage_seconds', 'seconds', 'Time spent in each stage'),
+                                          ('stage_bytes', 'bytes', 'Bytes processed by each stage')):
+            lines.append(f'# HELP avroconvert_{metric} {description} of the last run')
+            lines.append(f'# TYPE avroconvert_{metric} gauge')
+            lines.extend(f'avroconvert_{metric}{{{labels},stage="{stage}"}} {totals[key]}'
+                         for stage, totals in report['stages'].items())
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(f'{path}.tmp', 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        replace(f'{path}.tmp', path)
@@ -0,0 +1,190 @@
+"""cProfile of the parent and worker processes of a run, merged into one report."""
+import cProfile
+import pstats
+import re
+import sys
+from avroconvert import logger
+from collections import defaultdict
+from io import StringIO
+from multiprocessing.util import Finalize
+from os import getpid
+from os.path import join
+from pathlib import Path
+
+# Since python 3.12 cProfile is built on sys.monitoring, so a single
+# profile covers all the threads of the process
+_PROFILES_ALL_THREADS = sys.version_info >= (3, 12)
+PARENT_FILE = 'parent.pstats'
+MERGED_FILE = 'merged.pstats'
+REPORT_FILE = 'profile.txt'
+_PACKAGE_PATTERN = re.compile(r"(?:site-packages|dist-packages)[\\/]([A-Za-z_][\w]*)")
+_BUILTIN_PATTERN = re.compile(r"(?:method|function) '?([A-Za-z_][\w]*)\.|of '([A-Za-z_][\w]*)\.")
+
+
+class Profiler:
+    '''
+    cProfile of the threads of a process. A profile is started in
+    every thread which calls `start`, eg. as the initializer of a
+    thread pool, and the profiles of all the threads are written
+    to a single pstats file by `dump`.
+
+    :param profile_dir: Folder the pstats file is written to
+    :type profile_dir: str
+
+    :param name: Name of the pstats file, without extension
+    :type name: str
+    '''
+
+    def __init__(self, profile_dir: str, name: str):
+        '''
+        :param profile_dir: Folder the pstats file is written to
+        :type profile_dir: str
+
+        :param name: Name of the pstats file, without extension
+        :type name: str
+        '''
+        self.path = join(profile_dir, f'{name}.pstats')
+        self._profiles = list()
+
+    def start(self) -> None:
+        '''
+        Start profiling the calling thread
+        '''
+        if self._profiles and _PROFILES_ALL_THREADS:
+            return
+        profile = cProfile.Profile()
+        profile.enable()
+        self._profiles.append(profile)
+
+    def dump(self) -> str:
+        '''
+        Stop profiling the calling thread and write the profiles of
+        all the threads. Profiles of other threads are only complete
+        once those threads are done, eg. their pool is shut down.
+
+        :returns: path of the pstats file, None if nothing was profiled
+        :rtype: str
+        '''
+        if not self._profiles:
+            return None
+        for profile in self._profiles:
+            profile.disable()
+        Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        pstats.Stats(*self._profiles).dump_stats(self.path)
+        self._profiles = list()
+        return self.path
+
+
+def clear_profiles(profile_dir: str) -> None:
+    '''
+    Create the profile folder, or remove the pstats files a
+    previous run left in it, so they are not merged again
+
+    :param profile_dir: Folder of the pstats files
+    :type profile_dir: str
+    '''
+    Path(profile_dir).mkdir(parents=True, exist_ok=True)
+    for path in Path(profile_dir).glob('*.pstats'):
+        path.unlink()
+
+
+def start_worker_profile(profile_dir: str) -> Profiler:
+    '''
+    Profile a worker process until it exits. The profile is written
+    by the exit handlers of the process, when the pool shuts down.
+
+    :param profile_dir: Folder the pstats file is written to
+    :type profile_dir: str
+
+    :rtype: :class:`Profiler`
+    '''
+    profiler = Profiler(profile_dir, f'worker-{getpid()}')
+    profiler.start()
+    Finalize(None, profiler.dump, exitpriority=10)
+    return profiler
+
+
+def _package(function: tuple) -> str:
+    '''
+    Package a profiled function belongs to, eg. fastavro or pyarrow
+    '''
+    filename, _, name = function
+    if filename == '~':
+        match = _BUILTIN_PATTERN.search(name)
+        return next(filter(None, match.groups())) if match else 'builtins'
+    match = _PACKAGE_PATTERN.search(filename)
+    if match:
+        return match.group(1)
+    parts = Path(filename).parts
+    if 'avroconvert' in parts:
+        return 'avroconvert'
+    if filename.startswith('<') or 'lib' in parts:
+        return 'stdlib'
+    return Path(filename).stem
+
+
+def _package_times(stats: pstats.Stats) -> list:
+    '''
+    Own time of the profiled functions summed per package
+
+    :returns: list of (package, seconds) tuples, slowest first
+    :rtype: list
+    '''
+    packages = defaultdict(float)
+    for function, (_, _, own_time, _, _) in stats.stats.items():
+        packages[_package(function)] += own_time
+    return sorted(packages.items(), key=lambda item: -item[1])
+
+
+def merge_profiles(profile_dir: str, top: int = 30) -> str:
+    '''
+    Merge the pstats files of the parent and worker processes into
+    `merged.pstats`, and write a text report of the hot functions to
+    `profile.txt`: the time spent in each package (fastavro, pyarrow,
+    pandas, ...), then the `top` functions by own time and by
+    cumulative time.
+
+    :param profile_dir: Folder of the pstats files
+    :type profile_dir: str
+
+    :param top: Number of functions listed
+    :type top: int
+
+    :returns: path of the report, None if there is no pstats file
+    :rtype: str
+    '''
+    paths = sorted(str(path) for path in Path(profile_dir).glob('*.pstats') if path.name != MERGED_FILE)
+    if not paths:
+        return None
+    stats = pstats.Stats(*paths, stream=StringIO())
+    stats.dump_stats(join(profile_dir, MERGED_FILE))
+
+    lines = [f'Merged profile of {len(paths)} processes: {", ".join(Path(path).name for path in paths)}',
+             'Time spent in C extensions which are not profiled, such as the cython decoder of fastavro, '
+             'is counted in the builtin calling them, eg. list.extend. Time waiting on locks, queues '
+             'and select (_thread, _queue, select) is idle time.']
+    parent = [path for path in paths if Path(path).name == PARENT_FILE]
+    workers = [path for path in paths if Path(path).name != PARENT_FILE]
+    summary = dict()
+    for role, description, role_paths in (('parent', 'parent process (listing and downloads)', parent),
+                                          ('workers', 'worker processes (conversions)', workers)):
+        if not role_paths:
+            continue
+        packages = _package_times(pstats.Stats(*role_paths, stream=StringIO()))
+        total = sum(seconds for _, seconds in packages) or 1.0
+        summary[role] = ', '.join(f'{package} {100 * seconds / total:.1f}%' for package, seconds in packages[:3])
+        lines.extend(['', f'Own time per package of the {description}:'])
+        lines.extend(f'{seconds:>12.3f}s {100 * seconds / total:>6.1f}%  {package}'
+                     for package, seconds in packages[:top])
+
+    for sort_key, title in (('tottime', 'own time'), ('cumulative', 'cumulative time')):
+        stats.stream = StringIO()
+        stats.sort_stats(sort_key).print_stats(top)
+        lines.extend(['', f'Top {top} functions by {title}:', stats.stream.getvalue()])
+
+    report_path = join(profile_dir, REPORT_FILE)
+    with open(report_path, 'w') as f:
+        f.write('\n'.join(lines))
+    logger.info(f'Profile of {len(paths)} processes written to {report_path}; own time per package: ' +
+                '; '.join(f'{role} {packages}' for role, packages in summary.items()))
+    return report_path
@@ -0,0 +1,347 @@
+"""Avro to arrow schema mapping and record batch conversion."""
+from json import dumps
+import pyarrow as pa
+
+PRIMITIVE_TYPES = {
+    'null': pa.null(),
+    'boolean': pa.bool_(),
+    'int': pa.int32(),
+    'long': pa.int64(),
+    'float': pa.float32(),
+    'double': pa.float64(),
+    'bytes': pa.binary(),
+    'string': pa.string(),
+}
+
+LOGICAL_TYPES = {
+    'date': pa.date32(),
+    'time-millis': pa.time32('ms'),
+    'time-micros': pa.time64('us'),
+    'timestamp-millis': pa.timestamp('ms', tz='UTC'),
+    'timestamp-micros': pa.timestamp('us', tz='UTC'),
+    'local-timestamp-millis': pa.timestamp('ms'),
+    'local-timestamp-micros': pa.timestamp('us'),
+    'uuid': pa.string(),
+}
+
+DEFAULT_BATCH_SIZE = 10000
+
+
+def _to_string(value):
+    '''
+    Converter for values which have no native arrow
+    representation (unions of several types). Strings
+    are kept as is, everything else is json encoded.
+    '''
+    if value is None or isinstance(value, str):
+        return value
+    return dumps(value, default=str)
+
+
+def _uuid_to_string(value):
+    '''
+    fastavro decodes `uuid` strings to :class:`uuid.UUID`
+    objects; they are stored in their canonical string form.
+    '''
+    if value is None:
+        return None
+    return str(value)
+
+
+def _named_types(schema, named_types: dict) -> dict:
+    '''
+    Collect the definitions of the named types (records, enums and
+    fixed) of a parsed avro schema, by full name
+    '''
+    if isinstance(schema, list):
+        for branch in schema:
+            _named_types(branch, named_types)
+    elif isinstance(schema, dict):
+        if 'name' in schema:
+            named_types.setdefault(schema['name'], schema)
+        for field in schema.get('fields', ()):
+            _named_types(field['type'], named_types)
+        for key in ('type', 'items', 'values'):
+            if isinstance(schema.get(key), (dict, list)):
+                _named_types(schema[key], named_types)
+    return named_types
+
+
+def _inline_named_types(schema, named_types: dict, defined: set):
+    '''
+    Copy a part of a schema, replacing the first reference to every
+    named type which is not defined yet by the type's definition, and
+    the later definitions of a type by references to it
+    '''
+    if isinstance(schema, str):
+        if schema in named_types and schema not in defined:
+            return _inline_named_types(named_types[schema], named_types, defined)
+        return schema
+    if isinstance(schema, list):
+        return [_inline_named_types(branch, named_types, defined) for branch in schema]
+    if 'name' in schema:
+        if schema['name'] in defined:
+            return schema['name']
+        defined.add(schema['name'])
+    schema = dict(schema)
+    if 'fields' in schema:
+        schema['fields'] = [dict(field, type=_inline_named_types(field['type'], named_types, defined))
+                            for field in schema['fields']]
+    for key in ('type', 'items', 'values'):
+        if key in schema:
+            schema[key] = _inline_named_types(schema[key], named_types, defined)
+    return schema
+
+
+def project_schema(avro_schema: dict, columns: list) -> dict:
+    '''
+    Build a reader schema selecting some of the fields of an avro
+    writer schema. fastavro skips the fields which are not in the
+    reader schema while decoding, without building their values.
+
+    Named types which the selected fields use, but which are
+    defined by fields that are not selected, are defined again
+    in the reader schema, so it is a complete schema by itself.
+
+    :param avro_schema: Parsed avro schema of records, as returned
+                        by fastavro's `writer_schema`
+    :type avro_schema: dict
+
+    :param columns: Names of the (top level) fields to select, in
+                    the order of the output columns
+    :type columns: list
+
+    :returns: the reader schema
+    :rtype: dict
+    '''
+    if not (isinstance(avro_schema, dict) and avro_schema.get('type') == 'record'):
+        raise ValueError('Columns can only be selected from avro files of records')
+    fields = {field['name']: field for field in avro_schema['fields']}
+    unknown = [column for column in columns if column not in fields]
+    if unknown:
+        raise ValueError(f'Unknown columns {", ".join(unknown)}, the avro schema '
+                         f'{avro_schema["name"]} has the fields {", ".join(fields)}')
+    named_types = _named_types(avro_schema, dict())
+    defined = {avro_schema['name']}
+    return dict(avro_schema, fields=[
+        dict(fields[column], type=_inline_named_types(fields[column]['type'], named_types, defined))
+        for column in dict.fromkeys(columns)])
+
+
+class SchemaConverter:
+    '''
+    A class used to map an avro writer schema to an arrow
+    schema and to convert the records decoded by fastavro to
+    arrow record batches of that schema.
+
+    The mapping is done once per schema; records are then
+    appended to the batches without any schema inference, so
+    every batch of a file has exactly the same arrow schema.
+
+    :param avro_schema: Parsed avro schema, as returned by
+                        fastavro's `writer_schema`
+    :type avro_schema: dict
+    '''
+
+    def __init__(self, avro_schema: dict):
+        '''
+        :param avro_schema: Parsed avro schema, as returned by
+                            fastavro's `writer_schema`
+        :type avro_schema: dict
+        '''
+        self.avro_schema = avro_schema
+        self._named_types = dict()
+        # Files whose top level schema is not a record are converted
+        # to a table with a single column named `value`
+        self.wrap_records = not (isinstance(avro_schema, dict)
+                                 and avro_schema.get('type') == 'record')
+        if self.wrap_records:
+            avro_schema = {'type': 'record', 'name': 'value',
+                           'fields': [{'name': 'value', 'type': avro_schema}]}
+        struct_type, self.converter = self._map_type(avro_schema)
+        self.arrow_schema = pa.schema(list(struct_type))
+        self._struct_type = struct_type
+
+    def to_batches(self, blocks, batch_size: int = DEFAULT_BATCH_SIZE, record_filter=None):
+        '''
+        Convert decoded avro records to arrow record batches. Records
+        are consumed block by block, so only `batch_size` records
+        (plus the rest of the current block) are held in memory at
+        any time.
+
+        :param blocks: iterable of avro blocks (as yielded by fastavro's
+                       `block_reader`), each an iterable of records
+        :type blocks: iterable
+
+        :param batch_size: Number of records per record batch
+        :type batch_size: int
+
+        :param record_filter: Predicate of the records to convert; the
+                              other records are dropped before they are
+                              converted to arrow
+        :type record_filter: callable
+
+        :returns: generator of arrow record batches
+        :rtype: generator of :class:`pyarrow.RecordBatch`
+        '''
+        records = list()
+        for block in blocks:
+            records.extend(filter(record_filter, block) if record_filter else block)
+            while len(records) >= batch_size:
+                yield self.to_batch(records[:batch_size])
+                del records[:batch_size]
+        if records:
+            yield self.to_batch(records)
+
+    def to_batch(self, records: list) -> pa.RecordBatch:
+        '''
+        Convert a list of decoded avro records to one arrow
+        record batch
+
+        :param records: list of records as decoded by fastavro
+        :type records: list
+
+        :returns: record batch with the converter's arrow schema
+        :rtype: pyarrow.RecordBatch
+        '''
+        if self.wrap_records:
+            records = [{'value': record} for record in records]
+        if self.converter:
+            records = [self.converter(record) for record in records]
+        struct_array = pa.array(records, type=self._struct_type)
+        return pa.RecordBatch.from_struct_array(struct_array)
+
+    def _map_type(self, schema):
+        '''
+        Map an avro type to an arrow type.
+
+        :param schema: avro type; a primitive or named type name,
+                       a union (list) or a complex type (dict)
+        :type schema: str, list or dict
+
+        :returns: tuple of the arrow type and a converter function
+                  which has to be applied to the decoded values before
+                  they are appended to an arrow array (None if the
+                  values can be appended as they are)
+        :rtype: tuple
+        '''
+        if isinstance(schema, str):
+            if schema in PRIMITIVE_TYPES:
+                return PRIMITIVE_TYPES[schema], None
+            if schema not in self._named_types:
+                raise TypeError(f'Unknown avro type {schema}')
+            if self._named_types[schema] is None:
+                # A record referenced while it is mapped is recursive
+                # (eg. a linked list) and arrow types have no cycles,
+                # so the nested values are stored as a json string
+                return pa.string(), _to_string
+            return self._named_types[schema]
+        if isinstance(schema, list):
+            return self._map_union(schema)
+
+        avro_type = schema['type']
+        logical_type = schema.get('logicalType')
+        if logical_type in LOGICAL_TYPES and isinstance(avro_type, str):
+            return LOGICAL_TYPES[logical_type], _uuid_to_string if logical_type == 'uuid' else None
+
+        if logical_type == 'decimal' and self._map_decimal(schema) is not None:
+            # A named fixed decimal is registered like any fixed type,
+            # as later fields may reference it by name
+            mapped = self._map_decimal(schema), None
+        elif avro_type == 'record':
+            self._named_types[schema['name']] = None
+            fields, converters = list(), dict()
+            for field in schema['fields']:
+                field_type, field_converter = self._map_type(field['type'])
+                fields.append(pa.field(field['name'], field_type,
+                                       nullable=self._is_nullable(field['type'])))
+                if field_converter:
+                    converters[field['name']] = field_converter
+            mapped = pa.struct(fields), self._record_converter(converters)
+        elif avro_type == 'enum':
+            mapped = pa.string(), None
+        elif avro_type == 'fixed':
+            mapped = pa.binary(schema['size']), None
+        elif avro_type == 'array':
+            item_type, item_converter = self._map_type(schema['items'])
+            mapped = pa.list_(item_type), self._array_converter(item_converter)
+        elif avro_type == 'map':
+            value_type, value_converter = self._map_type(schema['values'])
+            mapped = pa.map_(pa.string(), value_type), self._map_converter(value_converter)
+        else:
+            # A primitive type written in it's long form,
+            # eg. {"type": "string"}, or an unknown logical type
+            return self._map_type(avro_type)
+
+        if 'name' in schema:
+            self._named_types[schema['name']] = mapped
+        return mapped
+
+    def _map_union(self, schema: list):
+        '''
+        Unions with `null` and a single other branch are mapped to
+        a nullable field of that branch's type. Any other union has
+        no lossless arrow (and parquet) representation, so it is
+        stored as a string column.
+        '''
+        branches = [branch for branch in schema if branch != 'null']
+        if len(branches) == 1:
+            return self._map_type(branches[0])
+        if not branches:
+            return pa.null(), None
+        for branch in branches:
+            # Register named types declared inside the union
+            if isinstance(branch, dict) and 'name' in branch:
+                self._map_type(branch)
+        return pa.string(), _to_string
+
+    def _map_decimal(self, schema: dict):
+        precision = schema.get('precision')
+        scale = schema.get('scale', 0)
+        if precision is None:
+            return None
+        if precision <= 38:
+            return pa.decimal128(precision, scale)
+        return pa.decimal256(precision, scale)
+
+    @staticmethod
+    def _is_nullable(schema) -> bool:
+        if isinstance(schema, list):
+            return 'null' in schema
+        return schema == 'null'
+
+    @staticmethod
+    def _record_converter(converters: dict):
+        if not converters:
+            return None
+
+        def convert(record):
+            if record is None:
+                return None
+            record = dict(record)
+            for name, converter in converters.items():
+                record[name] = converter(record.get(name))
+            return record
+        return convert
+
+    @staticmethod
+    def _array_converter(converter):
+        if converter is None:
+            return None
+
+        def convert(values):
+            if values is None:
+                return None
+            return [converter(value) for value in values]
+        return convert
+
+    @staticmethod
+    def _map_converter(converter):
+        if converter is None:
+            return None
+
+        def convert(values):
+            if values is None:
+                return None
+            return {key: converter(value) for key, value in values.items()}
+        return convert
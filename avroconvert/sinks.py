@@ -0,0 +1,515 @@
+"""Output sinks: streaming multipart uploads of the output files to s3 and gcs, and compressed streams."""
+import uuid
+from avroconvert import logger
+from avroconvert.sources.retry import DEFAULT_RETRIES, with_retries
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from io import RawIOBase
+from os import getenv
+from pyarrow import Codec, PythonFile
+from pyarrow.fs import FileInfo, FileSystemHandler, FileType, PyFileSystem
+
+DEFAULT_UPLOAD_PART_SIZE = 16 * 1024 * 1024
+DEFAULT_UPLOAD_CONCURRENCY = 4
+# All the parts of an s3 multipart upload but the last are at least 5MB
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+# Maximum number of objects gcs composes into one
+GCS_COMPOSE_LIMIT = 32
+SCHEMES = ('s3', 'gs')
+DEFAULT_COMPRESSION_CHUNK_SIZE = 4 * 1024 * 1024
+# Codecs whose compressed streams can be concatenated
+CONCATENABLE_COMPRESSIONS = ('gzip', 'zstd', 'lz4')
+
+
+def is_remote(path) -> bool:
+    '''
+    Check if a path is the url of an object store, s3:// or gs://
+
+    :rtype: bool
+    '''
+    return isinstance(path, str) and path.split('://', 1)[0] in SCHEMES and '://' in path
+
+
+def split_url(url: str) -> tuple:
+    '''
+    Split an object store url into it's scheme, bucket and key,
+    eg. `s3://bucket/data/file.parquet` into `('s3', 'bucket', 'data/file.parquet')`
+
+    :rtype: tuple
+    '''
+    scheme, _, path = url.partition('://')
+    bucket, _, key = path.partition('/')
+    if scheme not in SCHEMES or not bucket:
+        raise ValueError(f'Invalid output url {url}, it should look like s3://bucket/folder or gs://bucket/folder')
+    return scheme, bucket, key
+
+
+class MultipartWriter(RawIOBase):
+    '''
+    A writable binary file uploading it's data to an object store
+    as it is written. Data is buffered into parts of `part_size`
+    bytes, and every full part is uploaded on a thread while the
+    next one fills, with up to `concurrency` parts uploading at the
+    same time. Memory is bounded by `concurrency + 1` parts, whatever
+    the size of the file.
+
+    The object is only created when the writer is closed, once all
+    it's parts are uploaded. A writer used as a context manager
+    aborts the upload instead if the block raises, so that a failed
+    conversion does not leave a partial output file. Files smaller
+    than a part are uploaded with a single request.
+
+    Subclasses implement the requests of their object store.
+
+    :param url: Url of the object to write
+    :type url: str
+
+    :param part_size: Size of the parts in bytes, defaults to 16MB
+    :type part_size: int
+
+    :param concurrency: Maximum number of parts uploading at the
+                        same time, defaults to 4
+    :type concurrency: int
+
+    :param retries: Maximum number of retries of a failed request,
+                    defaults to 5
+    :type retries: int
+    '''
+    min_part_size = 1
+
+    def __init__(self, url: str, part_size: int = None, concurrency: int = None, retries: int = None):
+        '''
+        :param url: Url of the object to write
+        :type url: str
+
+        :param part_size: Size of the parts in bytes, defaults to 16MB
+        :type part_size: int
+
+        :param concurrency: Maximum number of parts uploading at the
+                            same time, defaults to 4
+        :type concurrency: int
+
+        :param retries: Maximum number of retries of a failed request,
+                        defaults to 5
+        :type retries: int
+        '''
+        super().__init__()
+        self._pool = None
+        self._buffer = bytearray()
+        self._position = 0
+        self._parts = list()
+        self._uploading = deque()
+        self.url = url
+        _, self.bucket, self.key = split_url(url)
+        self.part_size = max(int(part_size or DEFAULT_UPLOAD_PART_SIZE), self.min_part_size)
+        self.concurrency = int(concurrency or DEFAULT_UPLOAD_CONCURRENCY)
+        self.retries = int(retries if retries is not None else DEFAULT_RETRIES)
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def __del__(self):
+        # Never create the object from a file which was not closed
+        if not self.closed:
+            self.abort()
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError(f'Write to closed upload {self.url}')
+        size = memoryview(data).nbytes
+        self._buffer += data
+        self._position += size
+        while len(self._buffer) >= self.part_size:
+            self._upload(bytes(self._buffer[:self.part_size]))
+            del self._buffer[:self.part_size]
+        return size
+
+    def _upload(self, data: bytes) -> None:
+        '''
+        Upload a part on the thread pool, once less than
+        `concurrency` parts are uploading
+        '''
+        if self._pool is None:
+            self._start()
+            self._pool = ThreadPoolExecutor(max_workers=self.concurrency)
+        while len(self._uploading) >= self.concurrency:
+            # Raises the error of a failed part
+            self._uploading.popleft().result()
+        number = len(self._parts) + 1
+        part = self._pool.submit(with_retries, self._upload_part, number, data, retries=self.retries,
+                                 description=f'Upload of part {number} of {self.url}')
+        self._parts.append(part)
+        self._uploading.append(part)
+
+    def close(self) -> None:
+        '''
+        Upload the rest of the data and create the object
+        '''
+        if self.closed:
+            return
+        try:
+            if self._pool is None:
+                with_retries(self._put, bytes(self._buffer), retries=self.retries,
+                             description=f'Upload of {self.url}')
+            else:
+                if self._buffer:
+                    self._upload(bytes(self._buffer))
+                parts = [part.result() for part in self._parts]
+                with_retries(self._complete, parts, retries=self.retries,
+                             description=f'Completion of the upload of {self.url}')
+                self._pool.shutdown()
+        except BaseException:
+            self.abort()
+            raise
+        self._buffer = bytearray()
+        super().close()
+
+    def abort(self) -> None:
+        '''
+        Stop the upload, without creating the object
+        '''
+        if self.closed:
+            return
+        self._buffer = bytearray()
+        if self._pool is not None:
+            for part in self._uploading:
+                part.cancel()
+            self._pool.shutdown(wait=True)
+            try:
+                self._abort()
+            except Exception:
+                logger.exception(f'Failed to clean up the aborted upload of {self.url}')
+        super().close()
+
+    def _start(self) -> None:
+        '''
+        Start a multipart upload, before the first part
+        '''
+        raise NotImplementedError
+
+    def _upload_part(self, number: int, data: bytes):
+        '''
+        Upload the part `number` (starting at 1) of a multipart upload
+
+        :returns: what `_complete` needs to know of the part
+        '''
+        raise NotImplementedError
+
+    def _complete(self, parts: list) -> None:
+        '''
+        Create the object from the uploaded parts
+        '''
+        raise NotImplementedError
+
+    def _abort(self) -> None:
+        '''
+        Delete the uploaded parts of an aborted multipart upload
+        '''
+        raise NotImplementedError
+
+    def _put(self, data: bytes) -> None:
+        '''
+        Upload a file smaller than a part with a single request
+        '''
+        raise NotImplementedError
+
+
+class S3Writer(MultipartWriter):
+    '''
+    Streaming upload to s3, with a multipart upload
+
+    :param url: Url of the object to write, s3://bucket/key
+    :type url: str
+
+    :param client: Low level s3 client
+    :type client: botocore S3 client
+    '''
+    min_part_size = S3_MIN_PART_SIZE
+
+    def __init__(self, url: str, client, **kwargs):
+        super().__init__(url, **kwargs)
+        self.client = client
+        self.upload_id = None
+
+    def _start(self) -> None:
+        response = with_retries(self.client.create_multipart_upload, Bucket=self.bucket, Key=self.key,
+                                retries=self.retries, description=f'Start of the upload of {self.url}')
+        self.upload_id = response['UploadId']
+
+    def _upload_part(self, number: int, data: bytes) -> dict:
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=number, Body=data)
+        return {'PartNumber': number, 'ETag': response['ETag']}
+
+    def _complete(self, parts: list) -> None:
+        self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                              MultipartUpload={'Parts': parts})
+
+    def _abort(self) -> None:
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+    def _put(self, data: bytes) -> None:
+        self.client.put_object(Bucket=self.bucket, Key=self.key, Body=data)
+
+
+class GCSWriter(MultipartWriter):
+    '''
+    Streaming upload to google cloud storage. Gcs has no multipart
+    upload which takes parts in parallel, so every part is uploaded
+    as a temporary object, and the parts are composed into the
+    object once they are all uploaded (a parallel composite upload).
+    Gcs composes at most 32 objects at a time, so the parts are
+    composed 31 at a time onto the object.
+
+    :param url: Url of the object to write, gs://bucket/key
+    :type url: str
+
+    :param client: Bucket of the object
+    :type client: google storage bucket
+    '''
+
+    def __init__(self, url: str, client, **kwargs):
+        super().__init__(url, **kwargs)
+        self.client = client
+        # Parts of concurrent uploads of the same key do not collide
+        self._part_prefix = f'{self.key}.avroconvert-upload-{uuid.uuid4().hex}'
+
+    def _start(self) -> None:
+        pass
+
+    def _upload_part(self, number: int, data: bytes):
+        blob = self.client.blob(f'{self._part_prefix}/{number:05d}')
+        blob.upload_from_string(data)
+        return blob
+
+    def _complete(self, parts: list) -> None:
+        blob = self.client.blob(self.key)
+        blob.compose(parts[:GCS_COMPOSE_LIMIT])
+        for start in range(GCS_COMPOSE_LIMIT, len(parts), GCS_COMPOSE_LIMIT - 1):
+            blob.compose([blob] + parts[start:start + GCS_COMPOSE_LIMIT - 1])
+        self._delete_parts(parts)
+
+    def _abort(self) -> None:
+        self._delete_parts([part.result() for part in self._parts
+                            if part.done() and not part.cancelled() and part.exception() is None])
+
+    def _delete_parts(self, parts: list) -> None:
+        for part in parts:
+            try:
+                part.delete()
+            except Exception:
+                logger.warning(f'Failed to delete the temporary part {part.name} of {self.url}')
+
+    def _put(self, data: bytes) -> None:
+        self.client.blob(self.key).upload_from_string(data)
+
+
+@lru_cache(maxsize=None)
+def _s3_client(endpoint_url: str = None, access_key: str = None, secret_key: str = None,
+               session_token: str = None):
+    '''
+    S3 client of the uploads, shared by all the uploads of the process
+    '''
+    import boto3
+    from botocore.config import Config
+    config = Config(max_pool_connections=DEFAULT_UPLOAD_CONCURRENCY * 4)
+    return boto3.client('s3', endpoint_url=endpoint_url, config=config,
+                        aws_access_key_id=getenv('AWS_ACCESS_KEY_ID') or access_key,
+                        aws_secret_access_key=getenv('AWS_SECRET_ACCESS_KEY') or secret_key,
+                        aws_session_token=getenv('AWS_SESSION_TOKEN') or session_token)
+
+
+@lru_cache(maxsize=None)
+def _gcs_bucket(bucket: str, auth_file: str = None):
+    '''
+    Gcs bucket of the uploads, shared by all the uploads of the process
+    '''
+    from google.cloud import storage
+    auth_file = getenv('GOOGLE_APPLICATION_CREDENTIALS', auth_file)
+    client = storage.Client.from_service_account_json(auth_file) if auth_file else storage.Client()
+    return client.bucket(bucket)
+
+
+def open_output(url: str, access_key: str = None, secret_key: str = None, session_token: str = None,
+                endpoint_url: str = None, auth_file: str = None, **kwargs) -> MultipartWriter:
+    '''
+    Open a streaming upload to an s3:// or gs:// url. The storage
+    clients are built on first use, with the same credentials as
+    the source readers: the keys (or environment variables) of aws,
+    or the service account file of google cloud.
+
+    :param url: Url of the object to write
+    :type url: str
+
+    :key part_size: Size of the uploaded parts
+    :key concurrency: Maximum number of parts uploading at the same time
+    :key retries: Maximum number of retries of a failed request
+
+    :returns: writable binary file, to use as a context manager
+    :rtype: :class:`MultipartWriter`
+    '''
+    scheme, bucket, _ = split_url(url)
+    if scheme == 's3':
+        return S3Writer(url, _s3_client(endpoint_url, access_key, secret_key, session_token), **kwargs)
+    return GCSWriter(url, _gcs_bucket(bucket, auth_file), **kwargs)
+
+
+class CompressedWriter(RawIOBase):
+    '''
+    A writable binary file compressing it's data into another file.
+    Data is buffered into chunks of `chunk_size` bytes and every
+    chunk is compressed as an independent gzip member, zstd or lz4
+    frame, which decompressors read back as a single stream. Unlike
+    arrow's compressed streams, this lets the compression level of
+    the codec be set. Brotli decoders do not read concatenated
+    streams, so brotli is not supported. Closing the writer
+    compresses the last chunk, but does not close the underlying file.
+
+    :param sink: Writable binary file the compressed data is written to
+    :type sink: file-like object
+
+    :param compression: Codec, one of gzip, zstd or lz4
+    :type compression: str
+
+    :param compression_level: Compression level of the codec,
+                              defaults to the codec's default level
+    :type compression_level: int
+
+    :param chunk_size: Size of the compressed chunks in bytes,
+                       defaults to 4MB
+    :type chunk_size: int
+    '''
+
+    def __init__(self, sink, compression: str, compression_level: int = None,
+                 chunk_size: int = DEFAULT_COMPRESSION_CHUNK_SIZE):
+        '''
+        :param sink: Writable binary file the compressed data is written to
+        :type sink: file-like object
+
+        :param compression: Codec, one of gzip, zstd or lz4
+        :type compression: str
+
+        :param compression_level: Compression level of the codec,
+                                  defaults to the codec's default level
+        :type compression_level: int
+
+        :param chunk_size: Size of the compressed chunks in bytes,
+                           defaults to 4MB
+        :type chunk_size: int
+        '''
+        if compression not in CONCATENABLE_COMPRESSIONS:
+            raise ValueError(f'Invalid compression {compression}, it should be one of {CONCATENABLE_COMPRESSIONS}')
+        super().__init__()
+        self.sink = sink
+        self.chunk_size = chunk_size
+        self._codec = Codec(compression, compression_level=compression_level)
+        self._buffer = bytearray()
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        if self.closed:
+            raise ValueError('Write to closed compressed file')
+        size = memoryview(data).nbytes
+        self._buffer += data
+        self._position += size
+        while len(self._buffer) >= self.chunk_size:
+            self._compress(bytes(self._buffer[:self.chunk_size]))
+            del self._buffer[:self.chunk_size]
+        return size
+
+    def _compress(self, data: bytes) -> None:
+        self.sink.write(self._codec.compress(data, asbytes=True))
+
+    def close(self) -> None:
+        '''
+        Compress the rest of the data. An empty file is still
+        written as a compressed empty chunk, so that it is valid
+        '''
+        if self.closed:
+            return
+        if self._buffer or not self._position:
+            self._compress(bytes(self._buffer))
+        self._buffer = bytearray()
+        super().close()
+
+
+class _UploadFileSystemHandler(FileSystemHandler):
+    '''
+    Write only arrow file system whose output streams are streaming
+    uploads, so that arrow's dataset writer writes partitioned
+    datasets to s3 and gcs. Object stores have no folders, so
+    creating one does nothing.
+    '''
+
+    def __init__(self, scheme: str, bucket: str, storage_options: dict):
+        self.scheme = scheme
+        self.bucket = bucket
+        self.storage_options = storage_options
+
+    def get_type_name(self) -> str:
+        return f'avroconvert-{self.scheme}-upload'
+
+    def normalize_path(self, path: str) -> str:
+        return path
+
+    def get_file_info(self, paths: list) -> list:
+        return [FileInfo(path, FileType.NotFound) for path in paths]
+
+    def get_file_info_selector(self, selector) -> list:
+        return list()
+
+    def create_dir(self, path: str, recursive: bool) -> None:
+        pass
+
+    def open_output_stream(self, path: str, metadata):
+        return PythonFile(open_output(f'{self.scheme}://{self.bucket}/{path}', **self.storage_options), mode='w')
+
+    def _not_supported(self, *args):
+        raise NotImplementedError(f'{self.get_type_name()} file system only writes files')
+
+    delete_dir = delete_dir_contents = delete_root_dir_contents = delete_file = _not_supported
+    move = copy_file = open_input_stream = open_input_file = open_append_stream = _not_supported
+
+
+def dataset_filesystem(url: str, **storage_options) -> tuple:
+    '''
+    Arrow file system and base folder to write a dataset to an
+    s3:// or gs:// url, eg. with `pyarrow.dataset.write_dataset`
+
+    :param url: Url of the root folder of the dataset
+    :type url: str
+
+    :returns: tuple of the file system and the path of the
+              root folder in the bucket
+    :rtype: tuple
+    '''
+    scheme, bucket, key = split_url(url)
+    return PyFileSystem(_UploadFileSystemHandler(scheme, bucket, storage_options)), key.rstrip('/')
+
+
+def upload_memory(part_size: int = None, concurrency: int = None) -> int:
+    '''
+    Memory held by a streaming upload: the parts uploading and
+    the part being filled
+
+    :returns: number of bytes
+    :rtype: int
+    '''
+    return int(part_size or DEFAULT_UPLOAD_PART_SIZE) * (int(concurrency or DEFAULT_UPLOAD_CONCURRENCY) + 1)
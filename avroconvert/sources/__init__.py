@@ -1,3 +1,26 @@
-from avroconvert.sources.gcs.reader import GCS as gs_reader
-from avroconvert.sources.s3.reader import S3 as s3_reader
-from avroconvert.sources.filesystem.reader import FileSystem as fs_reader
\ No newline at end of file
+from importlib import import_module
+from avroconvert.sources.handle import FileHandle
+
+# Readers are only imported on first use, so that the clients of
+# the other sources (google cloud storage, boto3) are not imported
+_LAZY_ATTRIBUTES = {
+    'gs_reader': ('avroconvert.sources.gcs.reader', 'GCS'),
+    's3_reader': ('avroconvert.sources.s3.reader', 'S3'),
+    'fs_reader': ('avroconvert.sources.filesystem.reader', 'FileSystem'),
+    'AsyncSource': ('avroconvert.sources.aio', 'AsyncSource'),
+}
+
+__all__ = ['FileHandle', *_LAZY_ATTRIBUTES]
+
+
+def __getattr__(name: str):
+    if name not in _LAZY_ATTRIBUTES:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+    module, attribute = _LAZY_ATTRIBUTES[name]
+    value = getattr(import_module(module), attribute)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES))
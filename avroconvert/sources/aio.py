@@ -0,0 +1,183 @@
+"""Asynchronous interface over the blocking source readers."""
+import asyncio
+from avroconvert import logger
+from avroconvert.sources.ranges import DEFAULT_DOWNLOAD_CONCURRENCY, DEFAULT_PART_SIZE
+from concurrent.futures import ThreadPoolExecutor
+from os import remove as remove_file
+from tempfile import NamedTemporaryFile
+from time import perf_counter
+
+
+class AsyncSource:
+    '''
+    Asynchronous wrapper of a source reader (gcs, s3 or local file
+    system). Listing and downloads run on threads, so the storage
+    requests of many files overlap with each other and with the
+    caller's own work, such as handing files to a process pool.
+
+    :param reader: Source reader, which lists the files and
+                   downloads them into local files
+    :type reader: gs_reader, s3_reader or fs_reader
+
+    :param spool_dir: Folder the files are downloaded to. If it
+                      is None, files are not downloaded; this is
+                      meant for local files, which are read in place
+    :type spool_dir: str
+
+    :param concurrency: Maximum number of files downloaded at the
+                        same time, defaults to 10
+    :type concurrency: int
+
+    :param budget: Memory budget the downloads take their buffers from
+    :type budget: :class:`avroconvert.budget.MemoryBudget`
+
+    :param metrics: Metrics the listing and download times are added to
+    :type metrics: :class:`avroconvert.metrics.RunMetrics`
+
+    :param profiler: Profiler started in the download threads
+    :type profiler: :class:`avroconvert.profiling.Profiler`
+    '''
+
+    def __init__(self, reader, spool_dir: str = None, concurrency: int = None, budget=None,
+                 metrics=None, profiler=None):
+        '''
+        :param reader: Source reader, which lists the files and
+                       downloads them into local files
+        :type reader: gs_reader, s3_reader or fs_reader
+
+        :param spool_dir: Folder the files are downloaded to. If it
+                          is None, files are not downloaded
+        :type spool_dir: str
+
+        :param concurrency: Maximum number of files downloaded at the
+                            same time, defaults to 10
+        :type concurrency: int
+
+        :param budget: Memory budget the downloads take their buffers
+                       from. A download only starts once the budget has
+                       room for it's buffers, see `download_memory`
+        :type budget: :class:`avroconvert.budget.MemoryBudget`
+
+        :param metrics: Metrics the listing and download times
+                        are added to
+        :type metrics: :class:`avroconvert.metrics.RunMetrics`
+
+        :param profiler: Profiler started in the download threads
+        :type profiler: :class:`avroconvert.profiling.Profiler`
+        '''
+        self.reader = reader
+        self.spool_dir = spool_dir
+        self.concurrency = int(concurrency or DEFAULT_DOWNLOAD_CONCURRENCY)
+        self.budget = budget
+        self.metrics = metrics
+        self.profiler = profiler
+        #: Errors of the downloads which failed, by file name
+        self.failed = dict()
+
+    async def list_files(self):
+        '''
+        List the files of the source. Listing pages are requested
+        on a thread, and every file is yielded as soon as it's page
+        has arrived.
+
+        :returns: async generator of file handles
+        :rtype: async generator of :class:`avroconvert.sources.FileHandle`
+        '''
+        loop = asyncio.get_running_loop()
+        handles = iter(self.reader.list_files())
+        while True:
+            started = perf_counter()
+            handle = await loop.run_in_executor(None, next, handles, None)
+            if self.metrics is not None:
+                self.metrics.record_listing(perf_counter() - started, files=int(handle is not None))
+            if handle is None:
+                return
+            yield handle
+
+    async def fetch(self, handles):
+        '''
+        Download files to the spool folder. Up to `concurrency`
+        files are downloaded at the same time, and each file is
+        yielded as soon as it's download completes, so files are
+        not necessarily yielded in the order they were listed.
+        A file whose download fails (once the reader gave up
+        retrying it) is not yielded; it's error is kept in `failed`
+        and the other files are still downloaded.
+
+        No new download is started while the caller has not taken
+        the files already downloaded, so a caller which stops
+        iterating (eg. because it's own queue is full) also stops
+        the downloads.
+
+        :param handles: files to download, eg. from `list_files`
+        :type handles: async iterable of :class:`avroconvert.sources.FileHandle`
+
+        :returns: async generator of (handle, path) tuples, where path
+                  is the local copy of the file (None if files are not
+                  downloaded)
+        :rtype: async generator of tuples
+        '''
+        loop = asyncio.get_running_loop()
+        pending = set()
+        initializer = self.profiler.start if self.profiler is not None else None
+        with ThreadPoolExecutor(max_workers=self.concurrency, initializer=initializer) as pool:
+            async for handle in handles:
+                while len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    for fetched in (download.result() for download in done):
+                        if fetched is not None:
+                            yield fetched
+                if self.budget is not None and self.spool_dir is not None:
+                    await loop.run_in_executor(None, self.budget.acquire, self.download_memory(handle))
+                pending.add(loop.run_in_executor(pool, self._download, handle))
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for fetched in (download.result() for download in done):
+                    if fetched is not None:
+                        yield fetched
+
+    def download_memory(self, handle) -> int:
+        '''
+        Estimate the memory a download holds: the parts of the file
+        which the reader downloads in parallel, as the rest of the
+        file is written to the spool folder
+
+        :param handle: Handle of the file
+        :type handle: :class:`avroconvert.sources.FileHandle`
+
+        :returns: number of bytes
+        :rtype: int
+        '''
+        part_size = getattr(self.reader, 'part_size', DEFAULT_PART_SIZE)
+        download_concurrency = getattr(self.reader, 'download_concurrency', DEFAULT_DOWNLOAD_CONCURRENCY)
+        return min(handle.size or 0, part_size * download_concurrency)
+
+    def _download(self, handle) -> tuple:
+        '''
+        Download one file into a new file of the spool folder
+
+        :returns: tuple of the handle and the path of the local copy,
+                  None if the download failed
+        :rtype: tuple
+        '''
+        if self.spool_dir is None:
+            return handle, None
+        started = perf_counter()
+        try:
+            with NamedTemporaryFile(dir=self.spool_dir, suffix='.avro', delete=False) as spool_file:
+                try:
+                    self.reader.download(handle.name, spool_file, size=handle.size, version=handle.version)
+                    if self.metrics is not None:
+                        self.metrics.record_download(handle.name, spool_file.tell(), perf_counter() - started)
+                except Exception as e:
+                    if self.metrics is not None:
+                        self.metrics.record_error(handle.name, e)
+                    logger.exception(f'[FAILED] Download of file {handle.name} failed')
+                    spool_file.close()
+                    remove_file(spool_file.name)
+                    self.failed[handle.name] = e
+                    return None
+        finally:
+            if self.budget is not None:
+                self.budget.release(self.download_memory(handle))
+        return handle, spool_file.name
@@ -1,5 +1,9 @@
-from os import path, walk
+from contextlib import contextmanager
+from functools import partial
+from mmap import mmap, ACCESS_READ
+from os import fstat, path, stat, walk
 from avroconvert import logger
+from avroconvert.sources.handle import FileHandle
 
 
 class FileSystem:
@@ -25,6 +29,32 @@ class FileSystem:
         if not self.folder:
             raise AttributeError(f'Please pass the input folder name')
 
+    def list_files(self):
+        '''
+        Lazily lists all avro files in the local folder (filtering by
+        prefix if one is provided). Files are not read while listing;
+        each yielded handle reads its file only when it's opener is
+        called.
+
+        :returns: generator of file handles, one per avro file
+        :rtype: generator of :class:`avroconvert.sources.FileHandle`
+        '''
+        supported_types = ['avro']
+        if self.datatype not in supported_types:
+            raise TypeError(
+                f'Given datatype {self.datatype} not supported yet')
+        for path1, currentDirectory, files in walk(self.folder):
+            for ea_file in files:
+                if self.prefix and not ea_file.startswith(self.prefix):
+                    continue
+                filename = path.join(path1, ea_file)
+                if not filename.endswith('.avro'):
+                    continue
+                stat_result = stat(filename)
+                yield FileHandle(name=filename, size=stat_result.st_size,
+                                 opener=partial(self.read_files, filename=filename),
+                                 version=str(stat_result.st_mtime_ns))
+
     def get_data(self):
         '''
         Lists all files in the local folder (filtering by prefix if one is provided), 
@@ -34,18 +64,7 @@ class FileSystem:
                   file read (in bytes) from local folders.
         :rtype: list
         '''
-        supported_types = ['avro']
-        if self.datatype not in supported_types:
-            raise TypeError(
-                f'Given datatype {self.datatype} not supported yet')
-        if self.prefix:
-            filelist = [path.join(path1, ea_file) for path1, currentDirectory, files in walk(self.folder)
-                        for ea_file in files if ea_file.startswith(self.prefix)]
-        else:
-            filelist = [path.join(path1, ea_file) for path1, currentDirectory, files in walk(self.folder)
-                        for ea_file in files]
-
-        records = {filename: self.read_files(filename=filename) for filename in filelist if filename.endswith('.avro')}
+        records = {handle.name: handle.opener() for handle in self.list_files()}
         return records
 
     def read_files(self, filename: str):
@@ -63,3 +82,45 @@ class FileSystem:
         with open(filename, 'rb') as f:
             data = f.read()
         return data
+
+    def open_file(self, filename: str, size: int = None):
+        '''
+        Open a file for conversion. Local files are memory
+        mapped rather than read, see `map_file`.
+
+        :param filename: Name of the file to open
+        :type filename: str
+
+        :param size: Size of the file in bytes; not used
+                     for local files
+        :type size: int
+
+        :returns: context manager yielding the file's data
+        :rtype: mmap.mmap
+        '''
+        return self.map_file(filename)
+
+    @staticmethod
+    @contextmanager
+    def map_file(filename: str):
+        '''
+        Memory map a file from local filesystem (read only). Nothing
+        is copied into the process; pages are read lazily from the
+        page cache, which is shared by every process mapping the
+        same file. The mapping is closed when the context exits.
+
+        :param filename: Name of the file to map
+        :type filename: str
+
+        :returns: context manager yielding the memory mapped file
+                  (or empty bytes for an empty file, which cannot
+                  be mapped)
+        :rtype: mmap.mmap
+        '''
+        logger.info(f'Mapping file {filename} from filesystem')
+        with open(filename, 'rb') as f:
+            if fstat(f.fileno()).st_size == 0:
+                yield b''
+                return
+            with mmap(f.fileno(), 0, access=ACCESS_READ) as data:
+                yield data
@@ -1,6 +1,13 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from google.cloud import storage
 from os import getenv, path
 from avroconvert import logger
+from avroconvert.sources.handle import FileHandle
+from avroconvert.sources.ranges import DEFAULT_DOWNLOAD_CONCURRENCY, DEFAULT_PART_SIZE, SharedReads, \
+    read_ranges
+from avroconvert.sources.retry import DEFAULT_RETRIES, with_retries
 
 
 class GCS:
@@ -28,9 +35,24 @@ class GCS:
         the file prefix can be `test`. All the files with this
         prefix will be read
     :type prefix: str
+
+    :param download_concurrency: Maximum number of reads in flight, shared
+                                 by all the files downloaded at the same
+                                 time, defaults to 10
+    :type download_concurrency: int
+
+    :param part_size: Blobs larger than this size in bytes are
+                      downloaded with ranged reads of this size, run
+                      in parallel; defaults to 8MB
+    :type part_size: int
+
+    :param retries: Maximum number of retries of a read which failed
+                    with a transient error, defaults to 5
+    :type retries: int
     '''
 
-    def __init__(self, auth_file: str = None, bucket: str = None, datatype: str = 'avro', prefix: str = None):
+    def __init__(self, auth_file: str = None, bucket: str = None, datatype: str = 'avro', prefix: str = None,
+                 download_concurrency: int = None, part_size: int = None, retries: int = None):
         '''
         :param auth_file: path to the google cloud service account json file
         :type auth_file: str
@@ -51,7 +73,28 @@ class GCS:
             the file prefix can be `test`. All the files with this
             prefix will be read
         :type prefix: str
+
+        :param download_concurrency: Maximum number of reads in flight, shared
+                                     by all the files downloaded at the same
+                                     time, defaults to 10
+        :type download_concurrency: int
+
+        :param part_size: Blobs larger than this size in bytes are
+                          downloaded with ranged reads of this size, run
+                          in parallel; defaults to 8MB
+        :type part_size: int
+
+        :param retries: Maximum number of retries of a read which failed
+                        with a transient error (a connection error, an
+                        interrupted response, throttling or a server
+                        error), with exponential backoff; defaults to 5.
+                        Large blobs are retried per ranged read.
+        :type retries: int
         '''
+        self.download_concurrency = int(download_concurrency or DEFAULT_DOWNLOAD_CONCURRENCY)
+        self.part_size = int(part_size or DEFAULT_PART_SIZE)
+        self.retries = int(retries if retries is not None else DEFAULT_RETRIES)
+        self.reads = SharedReads(self.download_concurrency)
         self.client = self._auth(auth_file=auth_file, bucket=bucket)
         self.bucket = bucket
         logger.debug(f'Bucket name as received is {self.bucket}')
@@ -92,12 +135,32 @@ class GCS:
 
         return gcs_client.get_bucket(getenv('BUCKET', bucket))
 
+    def list_files(self):
+        '''
+        Lazily lists all the avro files in google storage bucket
+        starting with a prefix (if prefix is passed). Blobs are
+        yielded as each listing page arrives and no file is read
+        while listing. The handles keep the listed blobs, so that
+        reading a file does not need another metadata request.
+
+        :returns: generator of file handles, one per avro file
+        :rtype: generator of :class:`avroconvert.sources.FileHandle`
+        '''
+        for blob in self._filter():
+            if not blob.name.endswith('.avro'):
+                continue
+            yield FileHandle(name=blob.name, size=blob.size,
+                             opener=partial(self._read_files, filename=blob.name,
+                                            size=blob.size, blob=blob),
+                             version=str(blob.generation))
+
     def _extract_raw_data(self) -> list:
         '''
         It lists all the files in google storage bucket
         starting with a prefix (if prefix is passed). It
         then calls another method called `read_files` to
-        read each file
+        read each file. Up to `download_concurrency` files
+        are downloaded at the same time
 
         :returns: dictionary of bytes where each key of the dict is
                   the file name of the input file and it's value is 
@@ -105,51 +168,129 @@ class GCS:
         :rtype: dict
         '''
         logger.info('Listing files in GCS')
-        gcs_files = self._filter()
-        if not gcs_files:
+        handles = list(self.list_files())
+        if not handles:
             logger.info(f'No files with prefix {self.prefix} found in GCS')
             return None
-
-        data = {gcs_file: self._read_files(filename=gcs_file)
-                for gcs_file in gcs_files if gcs_file.endswith('.avro')}
-        return data
+        with ThreadPoolExecutor(max_workers=self.download_concurrency) as pool:
+            files_data = pool.map(lambda handle: handle.opener(), handles)
+            return {handle.name: data for handle, data in zip(handles, files_data)}
 
     def _filter(self):
         '''
         Helper function to avoid reading empty folders
         from google storage buckets
-        '''
-        files = list()
 
+        :returns: generator of the listed blobs, without the
+                  folder placeholder objects
+        :rtype: generator of google storage blobs
+        '''
         for blob in self.client.list_blobs(prefix=self.prefix):
             try:
                 filename = blob.name
                 if filename.split('/')[1] == '' \
                         and path.dirname(filename) == filename.split('/')[0]:
                     continue
-                else:
-                    files.append(filename)
             except IndexError as e:
-                files.append(filename)
-                continue
-        return files
+                pass
+            yield blob
 
-    def _read_files(self, filename: str) -> bytes:
+    def _read_files(self, filename: str, size: int = None, blob=None) -> bytes:
         '''
         Read file from google cloud bucket and convert it
-        into bytes
+        into bytes. Files larger than `part_size` are read
+        with parallel ranged reads of `part_size` bytes each
 
         :param filename: Name of the file to read from google 
                          cloud bucket
         :type filename: str
 
+        :param size: Size of the file in bytes, if known
+        :type size: int
+
+        :param blob: Blob of the file, as listed. If it is not
+                     given, a blob is created from the file name
+                     without fetching it's metadata
+        :type blob: google storage blob
+
         :returns: avro file from google, converted to bytes
         :rtype: bytes
         '''
         logger.info(f'Reading file {filename} from GCS in bytes')
-        gcs_blob = self.client.get_blob(filename)
-        raw_data = gcs_blob.download_as_string()
-        return raw_data
+        gcs_blob = blob if blob is not None else self.client.blob(filename)
+        if not size or size <= self.part_size:
+            return self.reads.read(with_retries, gcs_blob.download_as_bytes, retries=self.retries,
+                                   description=f'Read of file {filename}')
+        return b''.join(read_ranges(partial(self._read_range, gcs_blob), size,
+                                    self.part_size, self.download_concurrency, self.retries, filename, self.reads))
+
+    @staticmethod
+    def _read_range(blob, start: int, end: int) -> bytes:
+        '''
+        Read the bytes `start` to `end` (inclusive) of a blob. The
+        blob's checksum covers the whole file, so it is not verified
+        '''
+        return blob.download_as_bytes(start=start, end=end, checksum=None)
+
+    @contextmanager
+    def open_file(self, filename: str, size: int = None):
+        '''
+        Open a file for conversion. The file is read from
+        google cloud bucket into memory and it's bytes are yielded.
+
+        :param filename: Name of the file to open
+        :type filename: str
+
+        :param size: Size of the file in bytes, if known. Large
+                     files are read with parallel ranged reads
+        :type size: int
+
+        :returns: context manager yielding the file's data
+        :rtype: bytes
+        '''
+        yield self._read_files(filename=filename, size=size)
+
+    def download(self, filename: str, fileobj, size: int = None, version: str = None) -> None:
+        '''
+        Download a file from google cloud bucket into a binary file object,
+        without holding the whole file in memory. Files larger than
+        `part_size` are downloaded with parallel ranged reads, of which
+        at most `download_concurrency` are held in memory, in total across
+        the files downloaded at the same time. A read which
+        fails is retried on it's own, so the parts already downloaded
+        are kept; a smaller file is downloaded again from it's start.
+        Every read is pinned to the listed generation (`version`) of
+        the file, so a file overwritten during the download fails
+        instead of mixing two generations.
+
+        :param filename: Name of the file to download
+        :type filename: str
+
+        :param fileobj: Writable binary file object
+        :type fileobj: file object
+
+        :param size: Size of the file in bytes, if known
+        :type size: int
+
+        :param version: Generation of the file, as listed
+        :type version: str
+        '''
+        logger.info(f'Downloading file {filename} from GCS')
+        gcs_blob = self.client.blob(filename, generation=int(version) if version else None)
+        if not size or size <= self.part_size:
+            start = fileobj.tell()
+
+            def download_to_file():
+                # Drop what an interrupted attempt wrote
+                fileobj.seek(start)
+                fileobj.truncate()
+                gcs_blob.download_to_file(fileobj)
+            self.reads.read(with_retries, download_to_file, retries=self.retries,
+                            description=f'Download of file {filename}')
+            return
+        for part in read_ranges(partial(self._read_range, gcs_blob), size,
+                                self.part_size, self.download_concurrency, self.retries, filename, self.reads):
+            fileobj.write(part)
 
     def get_data(self) -> list:
         '''
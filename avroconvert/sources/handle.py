@@ -0,0 +1,31 @@
+from typing import Callable, NamedTuple
+
+
+class FileHandle(NamedTuple):
+    '''
+    A lightweight reference to a file listed by one of the
+    source readers. Listing a file does not read it; the data
+    is only fetched when `opener` is called.
+
+    :param name: Name of the file (with it's source path)
+    :type name: str
+
+    :param size: Size of the file in bytes, as reported by the
+                 source at listing time
+    :type size: int
+
+    :param opener: Callable which reads the file and returns its
+                   content as bytes
+    :type opener: callable
+
+    :param version: Version of the file's content, which changes
+                    whenever the file is rewritten: the ETag for s3,
+                    the generation for google cloud storage and the
+                    modification time for local files. None if the
+                    source does not report one
+    :type version: str
+    '''
+    name: str
+    size: int
+    opener: Callable[[], bytes]
+    version: str = None
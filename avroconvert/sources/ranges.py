@@ -0,0 +1,117 @@
+"""Parallel ranged reads shared by the cloud storage sources."""
+from collections import deque
+from avroconvert.sources.retry import DEFAULT_RETRIES, with_retries
+from concurrent.futures import ThreadPoolExecutor, wait
+from threading import BoundedSemaphore
+
+DEFAULT_DOWNLOAD_CONCURRENCY = 10
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+class SharedReads:
+    '''
+    A bound of the reads of a source which are in flight, shared by
+    all the files read at the same time. A reader holds one, so that
+    downloading several files at once runs at most `concurrency`
+    reads (and holds at most `concurrency` parts) in total, instead
+    of `concurrency` per file, and never needs more connections than
+    the pool of it's client holds.
+
+    :param concurrency: Maximum number of reads in flight
+    :type concurrency: int
+    '''
+
+    def __init__(self, concurrency: int = DEFAULT_DOWNLOAD_CONCURRENCY):
+        self.concurrency = concurrency
+        self.slots = BoundedSemaphore(concurrency)
+        self.pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='avroconvert-read')
+
+    def read(self, function, *args, **kwargs):
+        '''
+        Run a whole file read once a slot is free, holding the slot
+        until the read returns
+        '''
+        with self.slots:
+            return function(*args, **kwargs)
+
+
+def read_ranges(read_range, size: int, part_size: int = DEFAULT_PART_SIZE,
+                concurrency: int = DEFAULT_DOWNLOAD_CONCURRENCY, retries: int = DEFAULT_RETRIES,
+                name: str = 'file', shared: SharedReads = None):
+    '''
+    Read a file in parts of `part_size` bytes, with up to `concurrency`
+    ranged reads running in parallel. Parts are yielded in order, and
+    at most `concurrency` parts are held in memory at any time.
+    Given the `shared` reads of the source, the ranged reads run on
+    it's pool and each part holds one of it's slots until the part
+    was consumed, so the files read at the same time share the bound.
+
+    A part whose read fails with a transient error is read again, up
+    to `retries` times with exponential backoff (see
+    :func:`avroconvert.sources.retry.with_retries`), so an interrupted
+    download resumes from the part which failed instead of reading
+    the whole file again.
+
+    :param read_range: function reading the bytes `start` to `end`
+                       (inclusive) of the file
+    :type read_range: callable
+
+    :param size: Size of the file in bytes
+    :type size: int
+
+    :param part_size: Size of each ranged read, in bytes
+    :type part_size: int
+
+    :param concurrency: Maximum number of ranged reads in flight
+    :type concurrency: int
+
+    :param retries: Maximum number of retries of each part
+    :type retries: int
+
+    :param name: Name of the file, for the logs
+    :type name: str
+
+    :param shared: Reads in flight shared with the other files
+    :type shared: SharedReads
+
+    :returns: generator of the parts of the file, in order
+    :rtype: generator of bytes
+    '''
+    if shared is None:
+        shared = SharedReads(concurrency)
+        with shared.pool:
+            yield from read_ranges(read_range, size, part_size, concurrency, retries, name, shared)
+        return
+    pending = deque()
+
+    def take():
+        # The part keeps it's slot until it was consumed
+        future = pending.popleft()
+        try:
+            yield future.result()
+        finally:
+            shared.slots.release()
+    try:
+        for start in range(0, size, part_size):
+            # Wait for a slot only while holding none, otherwise
+            # consume the pending parts first: files waiting for each
+            # other's slots would never release theirs
+            while len(pending) >= concurrency or not shared.slots.acquire(blocking=not pending):
+                yield from take()
+            end = min(start + part_size, size) - 1
+            try:
+                pending.append(shared.pool.submit(with_retries, read_range, start, end, retries=retries,
+                                                  description=f'Read of bytes {start}-{end} of {name}'))
+            except BaseException:
+                shared.slots.release()
+                raise
+        while pending:
+            yield from take()
+    finally:
+        # Running reads still hold their connection, so their slots
+        # are released once they returned
+        for future in pending:
+            future.cancel()
+        wait(pending)
+        for _ in pending:
+            shared.slots.release()
@@ -0,0 +1,83 @@
+"""Retries with exponential backoff for the requests of the cloud storage sources."""
+import random
+import time
+from avroconvert import logger
+
+DEFAULT_RETRIES = 5
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+
+# Transient errors of the storage clients, by class name, so that
+# boto3, botocore, requests and google-api-core are not imported
+_TRANSIENT_ERRORS = {
+    'ConnectionError', 'ConnectTimeout', 'ConnectTimeoutError', 'ReadTimeout', 'ReadTimeoutError',
+    'ConnectionClosedError', 'EndpointConnectionError', 'IncompleteReadError', 'ResponseStreamingError',
+    'ChunkedEncodingError', 'ProtocolError', 'IncompleteRead', 'Timeout',
+    'TooManyRequests', 'InternalServerError', 'BadGateway', 'ServiceUnavailable', 'GatewayTimeout',
+}
+_TRANSIENT_ERROR_CODES = {
+    'Throttling', 'ThrottlingException', 'SlowDown', 'RequestTimeout', 'RequestTimeTooSkewed',
+    'InternalError', 'ServiceUnavailable', 'RequestLimitExceeded', 'TooManyRequestsException',
+}
+
+
+def is_transient(error: BaseException) -> bool:
+    '''
+    Check if an error of a storage request is worth retrying:
+    connection errors and timeouts, interrupted responses, and
+    throttling or server errors (http status 429 or 5xx)
+
+    :param error: The error raised by the request
+    :type error: Exception
+
+    :rtype: bool
+    '''
+    if isinstance(error, (ConnectionError, TimeoutError)):
+        return True
+    if any(cls.__name__ in _TRANSIENT_ERRORS for cls in type(error).__mro__):
+        return True
+    # botocore's ClientError
+    response = getattr(error, 'response', None)
+    if isinstance(response, dict):
+        status = response.get('ResponseMetadata', {}).get('HTTPStatusCode')
+        if response.get('Error', {}).get('Code') in _TRANSIENT_ERROR_CODES:
+            return True
+    else:
+        # google-api-core's GoogleAPICallError
+        status = getattr(error, 'code', None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def with_retries(function, *args, retries: int = DEFAULT_RETRIES, backoff: float = DEFAULT_BACKOFF,
+                 description: str = None, **kwargs):
+    '''
+    Call a function, and call it again when it raises a transient
+    error (see `is_transient`), up to `retries` more times. The n-th
+    retry waits a random time of up to `backoff * 2 ** n` seconds
+    (at most 30s), so that many downloads failing together do not
+    retry together.
+
+    :param function: Function to call
+    :type function: callable
+
+    :param retries: Maximum number of retries
+    :type retries: int
+
+    :param backoff: Base wait before a retry, in seconds
+    :type backoff: float
+
+    :param description: What the function does, for the logs
+    :type description: str
+
+    :returns: the value returned by the function
+    '''
+    for attempt in range(retries + 1):
+        try:
+            return function(*args, **kwargs)
+        except Exception as e:
+            if attempt >= retries or not is_transient(e):
+                raise
+            wait = random.uniform(0, min(backoff * 2 ** attempt, MAX_BACKOFF))
+            logger.warning(f'{description or getattr(function, "__name__", "Request")} failed with '
+                           f'{type(e).__name__}: {e}; retry {attempt + 1} of {retries} in {wait:.1f}s')
+            time.sleep(wait)
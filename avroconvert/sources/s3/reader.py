@@ -1,6 +1,14 @@
 import boto3 as bt
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from os import getenv
 from avroconvert import logger
+from avroconvert.sources.handle import FileHandle
+from avroconvert.sources.ranges import DEFAULT_DOWNLOAD_CONCURRENCY, DEFAULT_PART_SIZE, SharedReads, \
+    read_ranges
+from avroconvert.sources.retry import DEFAULT_RETRIES, with_retries
 
 
 class S3:
@@ -31,10 +39,31 @@ class S3:
                 the file prefix can be `test`. All the files with this
                 prefix will be read
     :type prefix: str
+
+    :param download_concurrency: Maximum number of GETs in flight, shared
+                                 by all the files downloaded at the same
+                                 time (and number of pooled connections
+                                 of the s3 client), defaults to 10
+    :type download_concurrency: int
+
+    :param part_size: Objects larger than this size in bytes are
+                      downloaded with ranged GETs of this size, run
+                      in parallel; defaults to 8MB
+    :type part_size: int
+
+    :param endpoint_url: URL of an s3 compatible endpoint to use
+                         instead of amazon s3
+    :type endpoint_url: str
+
+    :param retries: Maximum number of retries of a GET which failed
+                    with a transient error, defaults to 5
+    :type retries: int
     '''
 
     def __init__(self, access_key: str = None, secret_key: str = None,
-                 session_token: str = None, bucket: str = None, prefix: str = '', datatype: str = 'avro'):
+                 session_token: str = None, bucket: str = None, prefix: str = '', datatype: str = 'avro',
+                 download_concurrency: int = None, part_size: int = None, endpoint_url: str = None,
+                 retries: int = None):
         '''
 
         :param access_key: AWS access key id
@@ -60,7 +89,34 @@ class S3:
                     the file prefix can be `test`. All the files with this
                     prefix will be read
         :type prefix: str
+
+        :param download_concurrency: Maximum number of GETs in flight, shared
+                                     by all the files downloaded at the same
+                                     time (and number of pooled connections
+                                     of the s3 client), defaults to 10
+        :type download_concurrency: int
+
+        :param part_size: Objects larger than this size in bytes are
+                          downloaded with ranged GETs of this size, run
+                          in parallel; defaults to 8MB
+        :type part_size: int
+
+        :param endpoint_url: URL of an s3 compatible endpoint to use
+                             instead of amazon s3
+        :type endpoint_url: str
+
+        :param retries: Maximum number of retries of a GET which failed
+                        with a transient error (a connection error, an
+                        interrupted response, throttling or a server
+                        error), with exponential backoff; defaults to 5.
+                        Large objects are retried per ranged GET.
+        :type retries: int
         '''
+        self.download_concurrency = int(download_concurrency or DEFAULT_DOWNLOAD_CONCURRENCY)
+        self.part_size = int(part_size or DEFAULT_PART_SIZE)
+        self.retries = int(retries if retries is not None else DEFAULT_RETRIES)
+        self.reads = SharedReads(self.download_concurrency)
+        self.endpoint_url = endpoint_url
         self.client = self._auth(access_key, secret_key, session_token, bucket)
         self.bucket = bucket
         logger.debug(f'Bucket name as received is {self.bucket}')
@@ -84,7 +140,9 @@ class S3:
                        where the avro file is read from
         :type bucket: str
 
-        :returns: amazon s3 bucket client object
+        :returns: amazon s3 bucket client object. All the downloads
+                  share the low level client of this object, whose
+                  connection pool holds `download_concurrency` connections
         '''
         if not getenv('BUCKET', bucket):
             raise AttributeError('Please pass the S3 bucket name')
@@ -94,16 +152,36 @@ class S3:
                               'aws_session_token': getenv('AWS_SESSION_TOKEN') or session_token
                               })
 
-        s3_client = bt.resource('s3', **client_params)
+        config = Config(max_pool_connections=self.download_concurrency)
+        s3_client = bt.resource('s3', endpoint_url=self.endpoint_url, config=config, **client_params)
 
         return s3_client.Bucket(getenv('BUCKET', bucket))
 
+    def list_files(self):
+        '''
+        Lazily lists all the avro files in s3 bucket starting
+        with a prefix (if prefix is passed). S3 listing is
+        paginated, so files are yielded as each page arrives
+        and no file is read while listing.
+
+        :returns: generator of file handles, one per avro file
+        :rtype: generator of :class:`avroconvert.sources.FileHandle`
+        '''
+        for s3_object in self.client.objects.filter(Prefix=self.prefix):
+            if not s3_object.key.endswith('.avro'):
+                continue
+            yield FileHandle(name=s3_object.key, size=s3_object.size,
+                             opener=partial(self._read_files, filename=s3_object.key,
+                                            size=s3_object.size, version=s3_object.e_tag),
+                             version=s3_object.e_tag)
+
     def _extract_raw_data(self) -> dict:
         '''
         It lists all the files in s3 bucket
         starting with a prefix (if prefix is passed). It
         then calls another method called `read_files` to
-        read each file
+        read each file. Up to `download_concurrency` files
+        are downloaded at the same time
 
         :returns: dictionary of bytes where each key of the dict is
                   the file name of the input file and it's value is 
@@ -111,26 +189,106 @@ class S3:
         :rtype: dict
         '''
         logger.info('Listing files in S3')
-        s3_files = [y.key for y in self.client.objects.filter(
-            Prefix=self.prefix)]
-        if not s3_files:
+        handles = list(self.list_files())
+        if not handles:
             logger.info(f'No files with prefix {self.prefix} found in S3')
             return None
-        data = {s3_file: self._read_files(filename=s3_file)
-                for s3_file in s3_files if s3_file.endswith('.avro')}
-        return data
+        with ThreadPoolExecutor(max_workers=self.download_concurrency) as pool:
+            files_data = pool.map(lambda handle: handle.opener(), handles)
+            return {handle.name: data for handle, data in zip(handles, files_data)}
 
-    def _read_files(self, filename: str) -> bytes:
+    def _read_files(self, filename: str, size: int = None, version: str = None) -> bytes:
         '''
-        Read file from s3 and convert it into bytes
+        Read file from s3 and convert it into bytes. Files
+        larger than `part_size` are read with parallel ranged
+        GETs of `part_size` bytes each
+
+        :param filename: Name of the file to read
+        :type filename: str
+
+        :param size: Size of the file in bytes, if known
+        :type size: int
+
+        :param version: ETag of the file, as listed. If it is given,
+                        every GET fails if the file was overwritten
+        :type version: str
+
         :returns: avro file from s3, converted to bytes
         :rtype: bytes
         '''
         logger.info(f'Reading file {filename} from S3 in bytes')
-        data_s3_object = self.client.meta\
-            .client.get_object(Bucket=self.bucket, Key=filename)
-        raw_data = data_s3_object['Body'].read()
-        return raw_data
+        if not size or size <= self.part_size:
+            return self.reads.read(with_retries, self._get_object, filename, version=version,
+                                   retries=self.retries, description=f'Read of file {filename}')
+        return b''.join(read_ranges(partial(self._get_object, filename, version=version), size,
+                                    self.part_size, self.download_concurrency, self.retries, filename, self.reads))
+
+    def _get_object(self, filename: str, start: int = None, end: int = None, version: str = None) -> bytes:
+        '''
+        Read a file, or the bytes `start` to `end` (inclusive) of it.
+        If the ETag `version` is given, the GET fails with a
+        PreconditionFailed error when the file has another ETag, so
+        that parts of two versions of a file are never joined
+        '''
+        params = dict(Bucket=self.bucket, Key=filename)
+        if version is not None:
+            params['IfMatch'] = version
+        if start is not None:
+            params['Range'] = f'bytes={start}-{end}'
+        data_s3_object = self.client.meta.client.get_object(**params)
+        return data_s3_object['Body'].read()
+
+    @contextmanager
+    def open_file(self, filename: str, size: int = None):
+        '''
+        Open a file for conversion. The file is read from
+        s3 into memory and it's bytes are yielded.
+
+        :param filename: Name of the file to open
+        :type filename: str
+
+        :param size: Size of the file in bytes, if known. Large
+                     files are read with parallel ranged GETs
+        :type size: int
+
+        :returns: context manager yielding the file's data
+        :rtype: bytes
+        '''
+        yield self._read_files(filename=filename, size=size)
+
+    def download(self, filename: str, fileobj, size: int = None, version: str = None) -> None:
+        '''
+        Download a file from s3 into a binary file object,
+        without holding the whole file in memory. Files larger
+        than `part_size` are downloaded with parallel ranged GETs,
+        of which at most `download_concurrency` are held in memory,
+        in total across the files downloaded at the same time.
+        A GET which fails is retried on it's own, so the parts
+        already downloaded are kept. Every GET is pinned to the
+        listed `version` of the file, so a file overwritten during
+        the download fails instead of mixing two versions.
+
+        :param filename: Name of the file to download
+        :type filename: str
+
+        :param fileobj: Writable binary file object
+        :type fileobj: file object
+
+        :param size: Size of the file in bytes, if known. Files
+                     of unknown size are read with a single GET
+        :type size: int
+
+        :param version: ETag of the file, as listed
+        :type version: str
+        '''
+        logger.info(f'Downloading file {filename} from S3')
+        if not size:
+            fileobj.write(self.reads.read(with_retries, self._get_object, filename, version=version,
+                                          retries=self.retries, description=f'Download of file {filename}'))
+            return
+        for part in read_ranges(partial(self._get_object, filename, version=version), size,
+                                self.part_size, self.download_concurrency, self.retries, filename, self.reads):
+            fileobj.write(part)
 
     def get_data(self) -> dict:
         '''
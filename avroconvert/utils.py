@@ -0,0 +1,77 @@
+"""Helper functions shared by the cli and the converter."""
+import os
+import re
+from math import ceil
+from multiprocessing import cpu_count
+
+_SIZE_UNITS = {'': 1, 'b': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3, 't': 1024 ** 4}
+_SIZE_PATTERN = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?\s*$', re.IGNORECASE)
+
+
+def parse_size(size) -> int:
+    '''
+    Convert a human readable size to a number of bytes.
+    Units are binary, so `1KB` and `1KiB` are both 1024 bytes.
+
+    :param size: size as an integer number of bytes or a string
+                 such as `512`, `64KB`, `128MB`, `1.5GiB`
+    :type size: int or str
+
+    :returns: size in bytes
+    :rtype: int
+    '''
+    if isinstance(size, int):
+        return size
+    match = _SIZE_PATTERN.match(str(size))
+    if not match:
+        raise ValueError(f'Invalid size {size}')
+    value, unit = match.groups()
+    return int(float(value) * _SIZE_UNITS[unit.lower()])
+
+
+def _cgroup_cpu_quota(cgroup_root: str):
+    '''
+    Read the cpu quota of the cgroup, from `cpu.max` (cgroup v2) or
+    `cpu.cfs_quota_us` and `cpu.cfs_period_us` (cgroup v1)
+
+    :returns: number of cpus the quota allows, as a float, or None if
+              there is no quota
+    :rtype: float
+    '''
+    try:
+        with open(os.path.join(cgroup_root, 'cpu.max')) as f:
+            quota, period = f.read().split()[:2]
+    except (OSError, ValueError):
+        try:
+            with open(os.path.join(cgroup_root, 'cpu', 'cpu.cfs_quota_us')) as f:
+                quota = f.read().strip()
+            with open(os.path.join(cgroup_root, 'cpu', 'cpu.cfs_period_us')) as f:
+                period = f.read().strip()
+        except OSError:
+            return None
+    if quota in ('max', '-1') or int(period) <= 0:
+        return None
+    return int(quota) / int(period)
+
+
+def available_cpus(cgroup_root: str = '/sys/fs/cgroup') -> int:
+    '''
+    Number of cpus this process can use: the cpus it is allowed to
+    run on (its affinity), limited by the cpu quota of its cgroup,
+    eg. the cpu limit of a container
+
+    :param cgroup_root: Mount point of the cgroup file system
+    :type cgroup_root: str
+
+    :returns: number of cpus, at least 1
+    :rtype: int
+    '''
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        # sched_getaffinity is not available on all platforms
+        cpus = cpu_count()
+    quota = _cgroup_cpu_quota(cgroup_root)
+    if quota is not None:
+        cpus = min(cpus, ceil(quota))
+    return max(cpus, 1)
@@ -0,0 +1,52 @@
+"""Fixtures shared by the benchmarks."""
+from avroconvert import logger
+import logging
+import pytest
+
+try:
+    import resource
+except ImportError:
+    # Not available on windows
+    resource = None
+
+
+@pytest.fixture(autouse=True)
+def quiet_logger():
+    level = logger.level
+    logger.setLevel(logging.WARNING)
+    yield
+    logger.setLevel(level)
+
+
+def peak_rss() -> int:
+    '''
+    Peak resident memory of the benchmark process so far, in bytes
+    (None where it is not available). This is the peak of the whole
+    process, so run a single benchmark (`-k`) to measure it alone.
+    '''
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+@pytest.fixture
+def throughput(benchmark):
+    '''
+    Record the throughput of a benchmark, from the mean time of it's
+    rounds, in the extra info of the benchmark report (shown by
+    `--benchmark-json`): records/s, MB/s of avro data and peak RSS
+    '''
+    measured = dict()
+
+    def record(num_records: int = None, num_bytes: int = None):
+        measured.update(num_records=num_records, num_bytes=num_bytes)
+
+    yield record
+    if benchmark.stats is None:
+        return
+    mean = benchmark.stats.stats.mean
+    if measured.get('num_records'):
+        benchmark.extra_info['records_per_s'] = round(measured['num_records'] / mean)
+    if measured.get('num_bytes'):
+        benchmark.extra_info['mb_per_s'] = round(measured['num_bytes'] / mean / 1024 ** 2, 2)
+    benchmark.extra_info['peak_rss_mb'] = round((peak_rss() or 0) / 1024 ** 2, 1)
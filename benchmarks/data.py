@@ -0,0 +1,105 @@
+"""Synthetic avro files for the benchmarks."""
+from datetime import datetime, timezone
+from fastavro import parse_schema, writer
+from io import BytesIO
+import random
+
+
+def _codec_available(codec: str) -> bool:
+    '''
+    fastavro registers every codec, but some of them need an
+    optional library (eg. cramjam for snappy) to be used
+    '''
+    try:
+        writer(BytesIO(), parse_schema('long'), [1], codec=codec)
+    except ValueError:
+        return False
+    return True
+
+
+#: Codecs fastavro can write in this environment
+CODECS = [codec for codec in ('null', 'deflate', 'snappy', 'zstandard') if _codec_available(codec)]
+
+
+def make_schema(width: int = 10, nested: bool = False) -> dict:
+    '''
+    Build a record schema of `width` fields, cycling through longs,
+    doubles, strings and nullable strings. Nested schemas also have an
+    array, a map and a nested record (with a timestamp) every 10 fields.
+
+    :param width: Number of fields of the record
+    :type width: int
+
+    :param nested: Add complex fields
+    :type nested: bool
+
+    :rtype: dict
+    '''
+    flat_types = ['long', 'double', 'string', ['null', 'string']]
+    fields = list()
+    for index in range(width):
+        field_type = flat_types[index % len(flat_types)]
+        if nested and index % 10 == 9:
+            field_type = [
+                {'type': 'array', 'items': 'long'},
+                {'type': 'map', 'values': 'string'},
+                {'type': 'record', 'name': f'inner{index}', 'fields': [
+                    {'name': 'id', 'type': 'long'},
+                    {'name': 'created', 'type': {'type': 'long', 'logicalType': 'timestamp-millis'}}]},
+            ][(index // 10) % 3]
+        fields.append({'name': f'field{index}', 'type': field_type})
+    return {'type': 'record', 'name': f'bench{width}', 'fields': fields}
+
+
+def _value(field_type, rng: random.Random):
+    if field_type == 'long':
+        return rng.randrange(1 << 40)
+    if field_type == 'double':
+        return rng.random()
+    if field_type == 'string':
+        return f'value-{rng.randrange(1 << 20)}'
+    if isinstance(field_type, list):
+        return None if rng.random() < 0.2 else _value('string', rng)
+    if field_type['type'] == 'array':
+        return [rng.randrange(1000) for _ in range(rng.randrange(5))]
+    if field_type['type'] == 'map':
+        return {f'key{key}': _value('string', rng) for key in range(rng.randrange(4))}
+    return {'id': rng.randrange(1 << 40), 'created': datetime.fromtimestamp(
+        rng.randrange(1 << 31), tz=timezone.utc)}
+
+
+def make_records(schema: dict, num_records: int, seed: int = 0) -> list:
+    '''
+    Generate random records of a schema built by `make_schema`
+
+    :rtype: list
+    '''
+    rng = random.Random(seed)
+    return [{field['name']: _value(field['type'], rng) for field in schema['fields']}
+            for _ in range(num_records)]
+
+
+def make_avro(width: int = 10, nested: bool = False, codec: str = 'null',
+              num_records: int = 10000) -> bytes:
+    '''
+    Generate an avro file of random records
+
+    :param width: Number of fields of the records
+    :type width: int
+
+    :param nested: Add complex fields, see `make_schema`
+    :type nested: bool
+
+    :param codec: Compression codec of the blocks
+    :type codec: str
+
+    :param num_records: Number of records
+    :type num_records: int
+
+    :returns: the avro file
+    :rtype: bytes
+    '''
+    schema = make_schema(width, nested)
+    avro_file = BytesIO()
+    writer(avro_file, parse_schema(schema), make_records(schema, num_records), codec=codec)
+    return avro_file.getvalue()
@@ -0,0 +1,118 @@
+"""Local stand-ins of the cloud storage services used by the benchmarks."""
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from urllib.parse import parse_qs, unquote, urlparse
+import json
+
+try:
+    import moto.server
+except ImportError:
+    moto = None
+
+
+class FakeGCSServer:
+    '''
+    A minimal in-process server of the google cloud storage json api:
+    listing objects and (ranged) media downloads of one bucket, which
+    is all the gcs reader uses. Objects are held in memory.
+
+    :param bucket: Name of the bucket
+    :type bucket: str
+
+    :param objects: Data of the objects, by name
+    :type objects: dict
+    '''
+
+    def __init__(self, bucket: str, objects: dict):
+        self.bucket = bucket
+        self.objects = objects
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                parts = [unquote(part) for part in url.path.split('/')]
+                if url.path.startswith('/download/'):
+                    # /download/storage/v1/b/BUCKET/o/NAME?alt=media
+                    return self._media(server.objects.get('/'.join(parts[7:])))
+                if parts[-1] == 'o':
+                    # /storage/v1/b/BUCKET/o?prefix=PREFIX
+                    prefix = parse_qs(url.query).get('prefix', [''])[0]
+                    items = [{'kind': 'storage#object', 'bucket': server.bucket, 'name': name,
+                              'size': str(len(data)), 'generation': '1'}
+                             for name, data in sorted(server.objects.items()) if name.startswith(prefix)]
+                    return self._send(200, json.dumps({'kind': 'storage#objects', 'items': items}).encode(),
+                                      'application/json')
+                if parts[-2] == 'b':
+                    return self._send(200, json.dumps({'kind': 'storage#bucket', 'name': parts[-1]}).encode(),
+                                      'application/json')
+                self._send(404, b'{}', 'application/json')
+
+            def _media(self, data):
+                if data is None:
+                    return self._send(404, b'{}', 'application/json')
+                byte_range = self.headers.get('Range')
+                if not byte_range:
+                    return self._send(200, data)
+                start, end = byte_range[len('bytes='):].split('-')
+                start, end = int(start), min(int(end or len(data) - 1), len(data) - 1)
+                self._send(206, data[start:end + 1], headers={
+                    'Content-Range': f'bytes {start}-{end}/{len(data)}'})
+
+            def _send(self, status, body, content_type='application/octet-stream', headers=None):
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._thread = Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self._server.server_address
+        return f'http://{host}:{port}'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def gcs_bucket(server: FakeGCSServer):
+    '''
+    Client bucket of a :class:`FakeGCSServer`, with anonymous credentials
+    '''
+    from google.auth.credentials import AnonymousCredentials
+    from google.cloud import storage
+    client = storage.Client(project='benchmarks', credentials=AnonymousCredentials(),
+                            client_options={'api_endpoint': server.endpoint})
+    return client.bucket(server.bucket)
+
+
+@contextmanager
+def moto_server():
+    '''
+    Run a moto s3 server in a thread
+
+    :returns: context manager yielding the endpoint url of the server
+    '''
+    server = moto.server.ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    try:
+        host, port = server.get_host_and_port()
+        yield f'http://{host}:{port}'
+    finally:
+        server.stop()
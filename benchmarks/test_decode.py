@@ -0,0 +1,59 @@
+"""Decoding avro files into arrow record batches."""
+import pytest
+from avroconvert import AvroConvert
+from benchmarks.data import CODECS, make_avro
+from functools import lru_cache
+
+pytest.importorskip('pytest_benchmark')
+
+NUM_RECORDS = 20000
+
+make_avro = lru_cache(maxsize=None)(make_avro)
+
+
+def decode(data: bytes, tmp_path, **options) -> int:
+    '''
+    Convert a file with a writer which only consumes the batches,
+    so only the decoding is measured
+
+    :returns: number of records decoded
+    '''
+    converter = AvroConvert(outfolder=str(tmp_path), **options)
+    num_records = [0]
+
+    def consume(batches, schema, outfile):
+        for batch in batches:
+            num_records[0] += batch.num_rows
+    converter._to_parquet = consume
+    converter.convert_avro(filename='bench.avro', data=data)
+    return num_records[0]
+
+
+@pytest.mark.parametrize('nested', [False, True], ids=['flat', 'nested'])
+@pytest.mark.parametrize('width', [10, 100])
+def test_decode_schema(benchmark, throughput, tmp_path, width, nested):
+    num_records = NUM_RECORDS if width == 10 else NUM_RECORDS // 10
+    data = make_avro(width=width, nested=nested, num_records=num_records)
+    throughput(num_records=num_records, num_bytes=len(data))
+    assert benchmark(decode, data, tmp_path) == num_records
+
+
+@pytest.mark.parametrize('codec', CODECS)
+def test_decode_codec(benchmark, throughput, tmp_path, codec):
+    data = make_avro(codec=codec, num_records=NUM_RECORDS)
+    throughput(num_records=NUM_RECORDS, num_bytes=len(data))
+    assert benchmark(decode, data, tmp_path) == NUM_RECORDS
+
+
+@pytest.mark.parametrize('num_records', [1000, 100000])
+def test_decode_file_size(benchmark, throughput, tmp_path, num_records):
+    data = make_avro(num_records=num_records)
+    throughput(num_records=num_records, num_bytes=len(data))
+    assert benchmark(decode, data, tmp_path) == num_records
+
+
+def test_decode_columns(benchmark, throughput, tmp_path):
+    num_records = NUM_RECORDS // 10
+    data = make_avro(width=100, num_records=num_records)
+    throughput(num_records=num_records, num_bytes=len(data))
+    assert benchmark(decode, data, tmp_path, columns=['field0', 'field1', 'field2']) == num_records
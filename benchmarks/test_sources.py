@@ -0,0 +1,73 @@
+"""Reading avro files from each source, against local stand-ins."""
+import pytest
+from avroconvert.sources.filesystem.reader import FileSystem
+from avroconvert.sources.gcs.reader import GCS
+from avroconvert.sources.s3.reader import S3
+from benchmarks.stand_ins import FakeGCSServer, gcs_bucket, moto, moto_server
+from io import BytesIO
+from os import environ
+from unittest import mock
+
+pytest.importorskip('pytest_benchmark')
+
+NUM_FILES = 8
+FILE_SIZE = 4 * 1024 * 1024
+PART_SIZE = 1024 * 1024
+
+
+@pytest.fixture(scope='module')
+def files():
+    return {f'data/file{index}.avro': bytes([index]) * FILE_SIZE for index in range(NUM_FILES)}
+
+
+def download_all(reader) -> int:
+    '''
+    Download every listed file into memory, the way the spool
+    folder is filled
+
+    :returns: number of bytes downloaded
+    '''
+    num_bytes = 0
+    for handle in reader.list_files():
+        fileobj = BytesIO()
+        reader.download(handle.name, fileobj, size=handle.size)
+        num_bytes += len(fileobj.getvalue())
+    return num_bytes
+
+
+def test_filesystem(benchmark, throughput, tmp_path, files):
+    for name, data in files.items():
+        (tmp_path / name).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / name).write_bytes(data)
+    reader = FileSystem(bucket=str(tmp_path / 'data'))
+
+    def read_all():
+        num_bytes = 0
+        for handle in reader.list_files():
+            with reader.open_file(handle.name, size=handle.size) as data:
+                num_bytes += len(data[:])
+        return num_bytes
+
+    throughput(num_bytes=NUM_FILES * FILE_SIZE)
+    assert benchmark(read_all) == NUM_FILES * FILE_SIZE
+
+
+@pytest.mark.skipif(moto is None, reason='moto is not installed')
+def test_s3(benchmark, throughput, files):
+    credentials = dict(access_key='testing', secret_key='testing', session_token='testing')
+    with moto_server() as endpoint_url, mock.patch.dict(environ, {'AWS_DEFAULT_REGION': 'us-east-1'}):
+        reader = S3(bucket='bench', prefix='data/', endpoint_url=endpoint_url, part_size=PART_SIZE,
+                    **credentials)
+        reader.client.create()
+        for name, data in files.items():
+            reader.client.put_object(Key=name, Body=data)
+        throughput(num_bytes=NUM_FILES * FILE_SIZE)
+        assert benchmark(download_all, reader) == NUM_FILES * FILE_SIZE
+
+
+def test_gcs(benchmark, throughput, files):
+    with FakeGCSServer('bench', files) as server:
+        with mock.patch.object(GCS, '_auth', return_value=gcs_bucket(server)):
+            reader = GCS(bucket='bench', prefix='data/', part_size=PART_SIZE)
+        throughput(num_bytes=NUM_FILES * FILE_SIZE)
+        assert benchmark(download_all, reader) == NUM_FILES * FILE_SIZE
@@ -0,0 +1,21 @@
+"""Converting avro files to each output format."""
+import pytest
+from avroconvert import AvroConvert
+from benchmarks.data import make_avro
+from functools import lru_cache
+
+pytest.importorskip('pytest_benchmark')
+
+NUM_RECORDS = 20000
+
+make_avro = lru_cache(maxsize=None)(make_avro)
+
+
+@pytest.mark.parametrize('nested', [False, True], ids=['flat', 'nested'])
+@pytest.mark.parametrize('dst_format', ['parquet', 'csv', 'json', 'jsonl'])
+def test_convert(benchmark, throughput, tmp_path, dst_format, nested):
+    data = make_avro(width=20, nested=nested, num_records=NUM_RECORDS)
+    converter = AvroConvert(outfolder=str(tmp_path), dst_format=dst_format)
+    throughput(num_records=NUM_RECORDS, num_bytes=len(data))
+    benchmark(converter.convert_avro, filename='bench.avro', data=data)
+    assert (tmp_path / f'bench.{dst_format}').stat().st_size > 0
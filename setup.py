@@ -14,7 +14,7 @@ requirements = [
     'boto3==1.15.15',
     'fastavro==1.0.0.post1',
     'pandas==1.2.0',
-    'pyarrow==4.0.1',
+    'pyarrow==7.0.0',
     'google-api-core==1.22.4',
     'google-api-python-client==1.12.8',
     'google-auth==1.22.1',
@@ -23,12 +23,10 @@ requirements = [
     'google-cloud-bigquery==2.0.0',
     'google-cloud-bigquery-storage==2.0.0',
     'google-cloud-core==1.4.2',
-    'google-cloud-storage==1.31.2',
+    'google-cloud-storage==1.32.0',
     'google-crc32c==1.0.0',
     'google-resumable-media==1.1.0',
     'googleapis-common-protos==1.52.0',
-    'pandas==1.2.0',
-    'pyarrow==4.0.1',
     'pydata-google-auth==1.1.0',
     'python-snappy==0.6.0'
 ]
@@ -38,15 +36,13 @@ test_requirements = [ ]
 setup(
     author="Shrinivas Vijay Deshmukh",
     author_email='shrinivas.deshmukh11@gmail.com',
-    python_requires='>=3.6',
+    python_requires='>=3.8',
     classifiers=[
         'Development Status :: 2 - Pre-Alpha',
         'Intended Audience :: Developers',
         'License :: OSI Approved :: MIT License',
         'Natural Language :: English',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.6',
-        'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
     ],
     description="Utility to convert avro files to csv, json and parquet formats",
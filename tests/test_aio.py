@@ -0,0 +1,127 @@
+from unittest import TestCase
+from avroconvert.budget import MemoryBudget
+from avroconvert.sources import AsyncSource, FileHandle
+from os import listdir
+from os.path import dirname
+from tempfile import TemporaryDirectory
+from threading import Lock
+import asyncio
+import time
+
+
+class StubStore:
+    '''
+    In memory object store with the interface of the source readers
+    '''
+
+    def __init__(self, files: dict, delay: float = 0.01, fail: str = None):
+        self.files = files
+        self.delay = delay
+        self.fail = fail
+        self.lock = Lock()
+        self.downloading = 0
+        self.max_downloading = 0
+        self.downloaded = list()
+
+    def list_files(self):
+        for name, data in self.files.items():
+            yield FileHandle(name=name, size=len(data), opener=lambda data=data: data)
+
+    def download(self, filename, fileobj, size=None, version=None):
+        with self.lock:
+            self.downloading += 1
+            self.max_downloading = max(self.max_downloading, self.downloading)
+        time.sleep(self.delay)
+        with self.lock:
+            self.downloading -= 1
+            self.downloaded.append(filename)
+        if filename == self.fail:
+            raise ConnectionError(f'Download of {filename} failed')
+        fileobj.write(self.files[filename])
+
+
+class TestAsyncSource(TestCase):
+
+    def setUp(self):
+        self.files = {f'data/file{i}.avro': f'data {i}'.encode() for i in range(20)}
+
+    def test_list_files(self):
+        async def list_files():
+            return [handle.name async for handle in AsyncSource(StubStore(self.files)).list_files()]
+        self.assertEqual(list(self.files), asyncio.run(list_files()))
+
+    def test_fetch(self):
+        store = StubStore(self.files)
+
+        async def fetch(spool_dir):
+            source = AsyncSource(store, spool_dir=spool_dir, concurrency=4)
+            fetched = dict()
+            async for handle, path in source.fetch(source.list_files()):
+                self.assertEqual(spool_dir, dirname(path))
+                with open(path, 'rb') as f:
+                    fetched[handle.name] = f.read()
+            return fetched
+
+        with TemporaryDirectory() as spool_dir:
+            self.assertEqual(self.files, asyncio.run(fetch(spool_dir)))
+        self.assertEqual(4, store.max_downloading)
+
+    def test_fetch_w_budget(self):
+        store = StubStore(self.files)
+        # Each download takes the size of it's file (7 or 8 bytes)
+        store.part_size, store.download_concurrency = 1024, 1
+        budget = MemoryBudget(16)
+
+        async def fetch(spool_dir):
+            source = AsyncSource(store, spool_dir=spool_dir, concurrency=4, budget=budget)
+            return [handle.name async for handle, _ in source.fetch(source.list_files())]
+
+        with TemporaryDirectory() as spool_dir:
+            self.assertEqual(sorted(self.files), sorted(asyncio.run(fetch(spool_dir))))
+        self.assertEqual(2, store.max_downloading)
+        self.assertEqual(0, budget.used)
+
+    def test_fetch_wo_spool_dir(self):
+        store = StubStore(self.files)
+
+        async def fetch():
+            source = AsyncSource(store)
+            return [(handle.name, path) async for handle, path in source.fetch(source.list_files())]
+
+        self.assertEqual(sorted((name, None) for name in self.files), sorted(asyncio.run(fetch())))
+        self.assertEqual([], store.downloaded)
+
+    def test_fetch_w_backpressure(self):
+        store = StubStore(self.files, delay=0)
+
+        async def fetch_slowly(spool_dir):
+            source = AsyncSource(store, spool_dir=spool_dir, concurrency=2)
+            queue = asyncio.Queue(maxsize=3)
+            fetched_files = source.fetch(source.list_files())
+            async for fetched in fetched_files:
+                if queue.full():
+                    break
+                await queue.put(fetched)
+            await asyncio.sleep(0.05)
+            await fetched_files.aclose()
+
+        with TemporaryDirectory() as spool_dir:
+            asyncio.run(fetch_slowly(spool_dir))
+        # The queue holds 3 files, the 4th was yielded and at
+        # most 2 more downloads were started meanwhile
+        self.assertLessEqual(len(store.downloaded), 6)
+
+    def test_fetch_w_failed_download(self):
+        store = StubStore(self.files, fail='data/file3.avro')
+
+        async def fetch(spool_dir):
+            source = AsyncSource(store, spool_dir=spool_dir, concurrency=4)
+            fetched = [handle.name async for handle, _ in source.fetch(source.list_files())]
+            return fetched, source.failed
+
+        with TemporaryDirectory() as spool_dir:
+            fetched, failed = asyncio.run(fetch(spool_dir))
+            self.assertEqual(len(self.files) - 1, len(listdir(spool_dir)))
+        self.assertEqual(sorted(set(self.files) - {'data/file3.avro'}), sorted(fetched))
+        self.assertEqual(['data/file3.avro'], list(failed))
+        self.assertIsInstance(failed['data/file3.avro'], ConnectionError)
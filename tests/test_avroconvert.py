@@ -6,10 +6,28 @@
 from unittest import mock, TestCase
 
 from avroconvert import AvroConvert as avc, logger
-
+from avroconvert.avroconvert import check_compression
+from avroconvert.schema import SchemaConverter
+
+from datetime import datetime, timezone
+from fastavro import parse_schema, reader, writer
+from io import BytesIO
+import gzip
+import json
 import pandas as pd
+import pyarrow as pa
 from pyarrow import Table
-from os.path import dirname
+from pyarrow.csv import read_csv
+import pyarrow.dataset as ds
+from pyarrow.parquet import ParquetFile, read_table
+from os import listdir
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 
 class TestAvroconvert(TestCase):
@@ -17,85 +35,175 @@ class TestAvroconvert(TestCase):
 
     def setUp(self):
         """Set up test fixtures, if any."""
-        self.bytes_data = [b'test data1', b'test data2']
-        self.str_data = ['test data1', 'test data2']
-
-    @mock.patch('avroconvert.avroconvert.BytesIO')
-    @mock.patch('avroconvert.avroconvert.reader')
-    def test_convert_avro_w_csv_output(self, mock_rdr, mock_btio):
-        logger.info('[CSV] testing test_convert_avro_w_csv_output function')
-
-        avc_obj = avc(outfolder='./test_output', dst_format='csv')
-
-        mock_btio.side_effects = self.bytes_data
-        mock_rdr.__iter__.return_value = self.str_data
-
-        avc_obj._change_file_extn = mock.Mock(return_value='testinput.csv')
+        self.schema = {'type': 'record', 'name': 'test', 'fields': [
+            {'name': 'name', 'type': 'string'}, {'name': 'address', 'type': 'string'}]}
+        self.records = [{'name': 'John', 'address': 'New York'},
+                        {'name': 'Jane', 'address': 'Mumbai'}]
+        avro_data = BytesIO()
+        writer(avro_data, parse_schema(self.schema), self.records)
+        self.bytes_data = avro_data.getvalue()
+        self.arrow_schema = pa.schema([pa.field('name', pa.string(), nullable=False),
+                                       pa.field('address', pa.string(), nullable=False)])
+
+    def _assert_converted(self, dst_format):
+        avc_obj = avc(outfolder='./test_output', dst_format=dst_format)
+        avc_obj._change_file_extn = mock.Mock(return_value=f'testinput.{dst_format}')
         avc_obj._check_output_folder = mock.Mock(side_effect=[True, True])
-        avc_obj._to_csv = mock.Mock(return_value=True)
+        written = dict()
+
+        def write(batches, schema, outfile):
+            written['schema'] = schema
+            written['records'] = Table.from_batches(batches, schema=schema).to_pylist()
+            return outfile
+        writer_function = mock.Mock(side_effect=write)
+        setattr(avc_obj, f'_to_{dst_format}', writer_function)
 
         actual_response = avc_obj.convert_avro(
             filename='testinput.avro', data=self.bytes_data)
 
-        avc_obj._change_file_extn.assert_called_with('testinput.avro')
-        avc_obj._to_csv.assert_called_with(
-            data=[], outfile='./test_output/testinput.csv')
-        mock_btio.assert_has_calls([mock.call(self.bytes_data)])
-        mock_rdr.assert_has_calls([mock.call(mock_btio())])
+        avc_obj._change_file_extn.assert_called_with('testinput.avro', part=None)
         self.assertEqual(
-            actual_response, 'File ./test_output/testinput.csv complete')
+            f'./test_output/testinput.{dst_format}', writer_function.call_args.kwargs['outfile'])
+        self.assertEqual(self.arrow_schema, written['schema'])
+        self.assertEqual(self.records, written['records'])
+        self.assertEqual(
+            actual_response, f'File ./test_output/testinput.{dst_format} complete')
+
+    def test_convert_avro_w_csv_output(self):
+        logger.info('[CSV] testing test_convert_avro_w_csv_output function')
+        self._assert_converted('csv')
         print("")
 
-    @mock.patch('avroconvert.avroconvert.BytesIO')
-    @mock.patch('avroconvert.avroconvert.reader')
-    def test_convert_avro_w_json_output(self, mock_rdr, mock_btio):
+    def test_convert_avro_w_json_output(self):
         logger.info('[JSON] testing test_convert_avro_w_json_output function')
-        avc_obj = avc(outfolder='./test_output', dst_format='json')
-
-        mock_btio.side_effects = self.bytes_data
-        mock_rdr.__iter__.return_value = self.str_data
-
-        avc_obj._change_file_extn = mock.Mock(return_value='testinput.json')
-        avc_obj._check_output_folder = mock.Mock(side_effect=[True, True])
-        avc_obj._to_json = mock.Mock(return_value=True)
-
-        actual_response = avc_obj.convert_avro(
-            filename='testinput.avro', data=self.bytes_data)
-
-        avc_obj._change_file_extn.assert_called_with('testinput.avro')
-        avc_obj._to_json.assert_called_with(
-            data=[], outfile='./test_output/testinput.json')
-        mock_btio.assert_has_calls([mock.call(self.bytes_data)])
-        mock_rdr.assert_has_calls([mock.call(mock_btio())])
-        self.assertEqual(
-            actual_response, 'File ./test_output/testinput.json complete')
+        self._assert_converted('json')
         print("")
 
-    @mock.patch('avroconvert.avroconvert.BytesIO')
-    @mock.patch('avroconvert.avroconvert.reader')
-    def test_convert_avro_w_parquet_output(self, mock_rdr, mock_btio):
+    def test_convert_avro_w_parquet_output(self):
         logger.info(
             '[PARQUET] testing test_convert_avro_w_parquet_output function')
+        self._assert_converted('parquet')
+        print("")
+
+    def test_convert_avro_in_batches(self):
+        avc_obj = avc(outfolder='./test_output', dst_format='parquet', batch_size=1)
+        avc_obj._check_output_folder = mock.Mock(side_effect=[True, True])
+        avc_obj._to_parquet = mock.Mock(
+            side_effect=lambda batches, schema, outfile: self.assertEqual([1, 1], [b.num_rows for b in batches]))
+        avc_obj.convert_avro(filename='testinput.avro', data=self.bytes_data)
+        avc_obj._to_parquet.assert_called_once()
+
+    def test_split_avro(self):
+        avro_data = BytesIO()
+        writer(avro_data, parse_schema(self.schema), self.records * 50, sync_interval=10)
         avc_obj = avc(outfolder='./test_output', dst_format='parquet')
+        avc_obj._check_output_folder = mock.Mock(return_value=True)
+        avc_obj._to_parquet = mock.Mock(
+            side_effect=lambda batches, schema, outfile: Table.from_batches(batches, schema=schema))
+
+        parts = avc_obj.split_avro(avro_data.getvalue(), 4)
+
+        self.assertEqual(4, len(parts))
+        for part, part_data in enumerate(parts):
+            avc_obj.convert_avro(filename='testinput.avro', data=part_data, part=part)
+        outfiles = [call.kwargs['outfile'] for call in avc_obj._to_parquet.call_args_list]
+        self.assertEqual([f'./test_output/testinput.part-0000{part}.parquet' for part in range(4)], outfiles)
+        self.assertEqual(self.records * 50, [record for part_data in parts
+                                             for record in reader(BytesIO(part_data))])
+
+    def test_convert_avro_w_block_range(self):
+        avro_data = BytesIO()
+        writer(avro_data, parse_schema(self.schema), self.records * 50, sync_interval=10)
+        avro_data = avro_data.getvalue()
+        avc_obj = avc(outfolder='./test_output', dst_format='parquet')
+        avc_obj._check_output_folder = mock.Mock(return_value=True)
+        records = list()
+        avc_obj._to_parquet = mock.Mock(
+            side_effect=lambda batches, schema, outfile: records.extend(Table.from_batches(batches).to_pylist()))
 
-        mock_btio.side_effects = self.bytes_data
-        mock_rdr.__iter__.return_value = self.str_data
+        block_ranges = avc_obj.block_ranges(avro_data, 3)
+        for part, block_range in enumerate(block_ranges):
+            avc_obj.convert_avro(filename='testinput.avro', data=avro_data, block_range=block_range, part=part)
 
-        avc_obj._change_file_extn = mock.Mock(return_value='testinput.parquet')
-        avc_obj._check_output_folder = mock.Mock(side_effect=[True, True])
-        avc_obj._to_parquet = mock.Mock(return_value=True)
+        self.assertEqual(3, len(block_ranges))
+        self.assertEqual(self.records * 50, records)
 
-        actual_response = avc_obj.convert_avro(
-            filename='testinput.avro', data=self.bytes_data)
+    def test_compact_avro(self):
+        avc_obj = avc(outfolder='./test_output', dst_format='parquet')
+        avc_obj._check_output_folder = mock.Mock(return_value=True)
+        records = list()
+        avc_obj._to_parquet = mock.Mock(
+            side_effect=lambda batches, schema, outfile: records.extend(Table.from_batches(batches).to_pylist()))
+
+        inputs = [('data/file1.avro', self.bytes_data), ('data/file2.avro', b''),
+                  ('data/file3.avro', self.bytes_data)]
+        avc_obj.compact_avro(filename='data/file1-compacted.avro', inputs=iter(inputs))
+
+        avc_obj._to_parquet.assert_called_once()
+        self.assertEqual('./test_output/data/file1-compacted.parquet',
+                         avc_obj._to_parquet.call_args.kwargs['outfile'])
+        self.assertEqual(self.records * 2, records)
+        self.assertEqual(None, avc_obj.compact_avro(filename='data/file2.avro', inputs=[('data/file2.avro', b'')]))
+
+    def test_compact_avro_w_different_schemas(self):
+        schema = {'type': 'record', 'name': 'test', 'fields': [{'name': 'id', 'type': 'long'}]}
+        avro_data = BytesIO()
+        writer(avro_data, parse_schema(schema), [{'id': 1}])
+        avc_obj = avc(outfolder='./test_output', dst_format='parquet')
+        avc_obj._check_output_folder = mock.Mock(return_value=True)
+        avc_obj._to_parquet = mock.Mock(
+            side_effect=lambda batches, schema, outfile: Table.from_batches(batches, schema=schema))
 
-        avc_obj._change_file_extn.assert_called_with('testinput.avro')
-        avc_obj._to_parquet.assert_called_with(
-            data=[], outfile='./test_output/testinput.parquet')
-        mock_btio.assert_has_calls([mock.call(self.bytes_data)])
-        mock_rdr.assert_has_calls([mock.call(mock_btio())])
-        self.assertEqual(
-            actual_response, 'File ./test_output/testinput.parquet complete')
-        print("")
+        with self.assertRaises(ValueError):
+            avc_obj.compact_avro(filename='file1.avro', inputs=[('file1.avro', self.bytes_data),
+                                                                ('file2.avro', avro_data.getvalue())])
+
+    def test_read_schema(self):
+        avc_obj = avc(outfolder='./test_output', dst_format='parquet')
+        self.assertEqual('test', avc_obj.read_schema(self.bytes_data)['name'])
+
+    def test_convert_avro_w_columns_and_filter(self):
+        schema = {'type': 'record', 'name': 'test', 'fields': [
+            {'name': 'name', 'type': 'string'}, {'name': 'address', 'type': 'string'},
+            {'name': 'year', 'type': 'int'}]}
+        avro_data = BytesIO()
+        writer(avro_data, parse_schema(schema), [dict(record, year=2020 + i) for i, record in enumerate(self.records)])
+        avc_obj = avc(outfolder='./test_output', dst_format='parquet', columns=['address', 'name'],
+                      filter='year > 2020')
+        avc_obj._check_output_folder = mock.Mock(return_value=True)
+        tables = list()
+        avc_obj._to_parquet = mock.Mock(
+            side_effect=lambda batches, schema, outfile: tables.append(Table.from_batches(batches, schema=schema)))
+
+        avc_obj.convert_avro(filename='testinput.avro', data=avro_data.getvalue())
+
+        self.assertEqual(['address', 'name'], tables[0].column_names)
+        self.assertEqual([{'address': 'Mumbai', 'name': 'Jane'}], tables[0].to_pylist())
+
+    def test_convert_avro_w_unknown_columns(self):
+        for options in ({'columns': ['name', 'city']}, {'filter': "city == 'Mumbai'"}):
+            avc_obj = avc(outfolder='./test_output', dst_format='parquet', **options)
+            avc_obj._check_output_folder = mock.Mock(return_value=True)
+            with self.assertRaises(ValueError):
+                avc_obj.convert_avro(filename='testinput.avro', data=self.bytes_data)
+
+    def test_convert_avro_reuses_schema_mapping(self):
+        other_data = BytesIO()
+        writer(other_data, parse_schema(dict(self.schema, name='other')), self.records)
+        avc_obj = avc(outfolder='./test_output', dst_format='parquet', columns=['name'])
+        avc_obj._check_output_folder = mock.Mock(return_value=True)
+        avc_obj._to_parquet = mock.Mock(
+            side_effect=lambda batches, schema, outfile: Table.from_batches(batches, schema=schema))
+
+        with mock.patch('avroconvert.avroconvert.SchemaConverter', wraps=SchemaConverter) as mock_converter, \
+                mock.patch('avroconvert.avroconvert.SCHEMA_CACHE_SIZE', 1):
+            for data in (self.bytes_data, self.bytes_data, other_data.getvalue(), self.bytes_data):
+                avc_obj.convert_avro(filename='testinput.avro', data=data)
+
+        # The first schema is mapped again after the second one evicted it
+        self.assertEqual(3, mock_converter.call_count)
+        self.assertEqual(1, len(avc_obj._schemas))
+        self.assertEqual(4, avc_obj._to_parquet.call_count)
 
     def test_convert_avro_w_no_data(self):
         logger.info(
@@ -113,77 +221,262 @@ class TestAvroconvert(TestCase):
         with self.assertRaises(Exception) as e:
             avro_obj.convert_avro(filename='test.csv', data=b'test data')
 
-    @mock.patch('avroconvert.avroconvert.DataFrame')
-    @mock.patch('avroconvert.avroconvert.Table')
-    @mock.patch('avroconvert.avroconvert.write_table')
-    def test_to_parquet(self, mock_write_table, mock_table, mock_df):
+    def test_to_parquet(self):
         logger.info(
             '[TO_PARQUET] testing test_to_parquet function')
-        outfile = './test_output_folder/test.parquet'
+        with TemporaryDirectory() as tmpdir:
+            outfile = join(tmpdir, 'test.parquet')
 
-        avc_obj = avc(outfolder='./test_output', dst_format='parquet')
-        avc_obj._check_output_folder = mock.Mock(side_effect=[True, True])
-        data = [{'name': 'John', 'address': 'New York'},
-                {'name': 'Jane', 'address': 'Mumbai'}]
-        df = pd.DataFrame(data)
-        arrow_table = Table.from_pandas(df)
+            avc_obj = avc(outfolder='./test_output', dst_format='parquet')
+            batch = pa.RecordBatch.from_pylist(self.records, schema=self.arrow_schema)
 
-        mock_table.from_pandas.return_value = arrow_table
-        mock_df.return_value = df
+            actual_response = avc_obj._to_parquet(
+                batches=[batch], schema=self.arrow_schema, outfile=outfile)
 
-        actual_response = avc_obj._to_parquet(data=data, outfile=outfile)
+            self.assertEqual(actual_response, outfile)
+            self.assertEqual(self.records, read_table(outfile).to_pylist())
+            self.assertEqual(1, ParquetFile(outfile).num_row_groups)
 
-        mock_df.assert_called_with(data)
-        mock_table.from_pandas.assert_called_with(df)
-        mock_write_table.assert_called_with(
-            arrow_table, outfile, flavor='spark')
+    def test_to_parquet_w_row_group_size(self):
+        with TemporaryDirectory() as tmpdir:
+            outfile = join(tmpdir, 'test.parquet')
+            avc_obj = avc(outfolder=tmpdir, dst_format='parquet', row_group_size=3)
+            batches = [pa.RecordBatch.from_pylist(self.records * 2, schema=self.arrow_schema)] * 4
 
-        self.assertEqual(actual_response, outfile)
+            avc_obj._to_parquet(batches=iter(batches), schema=self.arrow_schema, outfile=outfile)
+
+            metadata = ParquetFile(outfile).metadata
+            self.assertEqual([3] * 5 + [1], [metadata.row_group(i).num_rows
+                                             for i in range(metadata.num_row_groups)])
+            self.assertEqual(self.records * 8, read_table(outfile).to_pylist())
+
+    def test_to_parquet_w_row_group_bytes(self):
+        with TemporaryDirectory() as tmpdir:
+            outfile = join(tmpdir, 'test.parquet')
+            batch = pa.RecordBatch.from_pylist(self.records, schema=self.arrow_schema)
+            avc_obj = avc(outfolder=tmpdir, dst_format='parquet', row_group_bytes=batch.nbytes * 2)
+
+            avc_obj._to_parquet(batches=iter([batch] * 5), schema=self.arrow_schema, outfile=outfile)
+
+            metadata = ParquetFile(outfile).metadata
+            self.assertEqual([4, 4, 2], [metadata.row_group(i).num_rows
+                                         for i in range(metadata.num_row_groups)])
 
     def test_to_parquet_w_invalid_data(self):
         avc_obj = avc(outfolder='./test_output', dst_format='parquet')
         avc_obj._check_output_folder = mock.Mock(side_effect=[True, True])
         data = 'test-data'
-        with self.assertRaises(Exception) as e:
-            avc_obj._to_parquet(data=data, outfile='test.parquet')
+        with TemporaryDirectory() as tmpdir, self.assertRaises(Exception) as e:
+            avc_obj._to_parquet(batches=data, schema=self.arrow_schema, outfile=join(tmpdir, 'test.parquet'))
 
-    @mock.patch('avroconvert.avroconvert.DataFrame')
-    def test_to_json(self, mock_df):
+    def test_to_json(self):
         logger.info(
             '[TO_JSON] testing test_to_json function')
         outfile = './test_output_folder/test.json'
 
         avc_obj = avc(outfolder='./test_output', dst_format='json')
         avc_obj._check_output_folder = mock.Mock(side_effect=[True, True])
+        batch = pa.RecordBatch.from_pylist(self.records, schema=self.arrow_schema)
 
-        data = [{'name': 'John', 'address': 'New York'},
-                {'name': 'Jane', 'address': 'Mumbai'}]
-        df = pd.DataFrame(data)
-
-        mock_df.return_value = df
-
-        with mock.patch.object(df, "to_json") as to_json_mock:
-            actual_response = avc_obj._to_json(data=data, outfile=outfile)
+        with mock.patch.object(pd.DataFrame, "to_json") as to_json_mock:
+            actual_response = avc_obj._to_json(
+                batches=[batch], schema=self.arrow_schema, outfile=outfile)
             to_json_mock.assert_called_with(outfile, orient='records')
 
         self.assertEqual(actual_response, outfile)
         
         print("")
 
-    @mock.patch('avroconvert.avroconvert.csv')
-    def test_to_csv(self, mock_csv):
+    def test_to_json_w_maps(self):
+        schema = pa.schema([pa.field('id', pa.int64()),
+                            pa.field('attributes', pa.map_(pa.string(), pa.int32()))])
+        batch = pa.RecordBatch.from_pylist([{'id': 1, 'attributes': [('x', 1), ('y', 0)]},
+                                            {'id': 2, 'attributes': None}], schema=schema)
+        avc_obj = avc(outfolder='./test_output', dst_format='json')
+        with TemporaryDirectory() as tmpdir:
+            outfile = avc_obj._to_json(batches=[batch], schema=schema, outfile=join(tmpdir, 'test.json'))
+            with open(outfile) as f:
+                self.assertEqual([{'id': 1, 'attributes': {'x': 1, 'y': 0}}, {'id': 2, 'attributes': None}],
+                                 json.load(f))
+
+    def test_convert_avro_w_jsonl_output(self):
+        self._assert_converted('jsonl')
+
+    def test_to_parquet_w_partition_by(self):
+        schema = pa.schema([pa.field('country', pa.string()), pa.field('year', pa.int32()),
+                            pa.field('id', pa.int64())])
+        rows = [{'country': country, 'year': year, 'id': i}
+                for i, (country, year) in enumerate([('IN', 2020), ('IN', 2021), ('US', 2021)] * 5)]
+        batch = pa.RecordBatch.from_pylist(rows, schema=schema)
+        with TemporaryDirectory() as tmpdir:
+            avc_obj = avc(outfolder=tmpdir, dst_format='parquet', partition_by=['country', 'year'])
+            for part in (0, 1):
+                outfile = join(tmpdir, avc_obj._change_file_extn('data/input.avro', part=part))
+                self.assertEqual(tmpdir, avc_obj._to_parquet(batches=iter([batch]), schema=schema, outfile=outfile))
+
+            self.assertEqual(['data_input.part-00000-0.parquet', 'data_input.part-00001-0.parquet'],
+                             sorted(listdir(join(tmpdir, 'country=IN', 'year=2021'))))
+            self.assertEqual(['country=IN', 'country=US'], sorted(listdir(tmpdir)))
+            table = ds.dataset(tmpdir, format='parquet', partitioning='hive').to_table(
+                filter=ds.field('country') == 'US')
+            self.assertEqual(10, table.num_rows)
+            self.assertEqual({2021}, set(table.column('year').to_pylist()))
+
+    def test_to_parquet_w_partition_by_same_schema(self):
+        schema = pa.schema([pa.field('country', pa.string()),
+                            pa.field('created', pa.timestamp('ms', tz='UTC'))])
+        batch = pa.RecordBatch.from_pylist([{'country': 'IN', 'created': datetime(2021, 1, 1, tzinfo=timezone.utc)}],
+                                           schema=schema)
+        with TemporaryDirectory() as tmpdir:
+            outfile = join(tmpdir, 'test.parquet')
+            avc(outfolder=tmpdir, dst_format='parquet')._to_parquet(batches=iter([batch]), schema=schema,
+                                                                    outfile=outfile)
+            dataset_dir = join(tmpdir, 'dataset')
+            avc(outfolder=dataset_dir, dst_format='parquet', partition_by=['country'])._to_parquet(
+                batches=iter([batch]), schema=schema, outfile=join(dataset_dir, 'test.parquet'))
+
+            column = ParquetFile(outfile).schema.column(1)
+            partitioned_column = ParquetFile(join(dataset_dir, 'country=IN', 'test-0.parquet')).schema.column(0)
+            self.assertEqual('INT96', column.physical_type)
+            self.assertEqual(column.physical_type, partitioned_column.physical_type)
+
+    def test_to_parquet_w_unknown_partition_column(self):
+        batch = pa.RecordBatch.from_pylist(self.records, schema=self.arrow_schema)
+        with TemporaryDirectory() as tmpdir:
+            avc_obj = avc(outfolder=tmpdir, dst_format='parquet', partition_by=['country'])
+            with self.assertRaises(ValueError):
+                avc_obj._to_parquet(batches=iter([batch]), schema=self.arrow_schema, outfile=join(tmpdir, 'test.parquet'))
+
+    def test_to_jsonl(self):
+        schema = pa.schema([pa.field('id', pa.int64()),
+                            pa.field('tags', pa.list_(pa.string())),
+                            pa.field('attributes', pa.map_(pa.string(), pa.int32())),
+                            pa.field('checksum', pa.binary()),
+                            pa.field('created', pa.timestamp('ms', tz='UTC'))])
+        batch = pa.RecordBatch.from_pylist([
+            {'id': 1, 'tags': ['a', 'ü'], 'attributes': [('x', 1)], 'checksum': b'\x00\xff',
+             'created': datetime(2021, 1, 1, tzinfo=timezone.utc)},
+            {'id': 2, 'tags': None, 'attributes': None, 'checksum': None, 'created': None}], schema=schema)
+        expected = [{'id': 1, 'tags': ['a', 'ü'], 'attributes': {'x': 1}, 'checksum': '\u0000\u00ff',
+                     'created': '2021-01-01T00:00:00+00:00'},
+                    {'id': 2, 'tags': None, 'attributes': None, 'checksum': None, 'created': None}]
+        avc_obj = avc(outfolder='./test_output', dst_format='jsonl')
+        for encoder in (orjson, None):
+            with TemporaryDirectory() as tmpdir, mock.patch('avroconvert.avroconvert.orjson', encoder):
+                outfile = avc_obj._to_jsonl(batches=[batch, batch], schema=schema,
+                                            outfile=join(tmpdir, 'test.jsonl'))
+                with open(outfile, encoding='utf-8') as f:
+                    self.assertEqual(expected * 2, [json.loads(line) for line in f])
+
+    def test_to_csv(self):
         avc_obj = avc(outfolder='./test_output', dst_format='csv')
-        avc_obj._check_output_folder = mock.Mock(side_effect=[True, True])
-        data = [{
-            'col1': 'val1', 'col2': 'val2'
-        },{
-            'col1': 'val3', 'col2': 'val4'
-        }]
-        with mock.patch('avroconvert.avroconvert.open', mock.mock_open(read_data='bibble')) as m:
-            function_response = avc_obj._to_csv(data=data, outfile='test.csv')
-        self.assertEqual(function_response, 'test.csv')
+        batch = pa.RecordBatch.from_pylist(self.records, schema=self.arrow_schema)
+        with TemporaryDirectory() as tmpdir:
+            outfiles = [join(tmpdir, 'test1.csv'), join(tmpdir, 'test2.csv')]
+            for outfile in outfiles:
+                function_response = avc_obj._to_csv(
+                    batches=[batch, batch], schema=self.arrow_schema, outfile=outfile)
+                self.assertEqual(function_response, outfile)
+            for outfile in outfiles:
+                with open(outfile) as f:
+                    self.assertEqual('"name","address"\n"John","New York"\n"Jane","Mumbai"\n'
+                                     '"John","New York"\n"Jane","Mumbai"\n', f.read())
         print("")
 
+    def test_to_text_w_compression(self):
+        batch = pa.RecordBatch.from_pylist(self.records, schema=self.arrow_schema)
+        with TemporaryDirectory() as tmpdir:
+            for dst_format in ('csv', 'json', 'jsonl'):
+                for compression, level in (('gzip', 9), ('zstd', 5), ('lz4', None)):
+                    avc_obj = avc(outfolder=tmpdir, dst_format=dst_format, compression=compression,
+                                  compression_level=level)
+                    outfile = join(tmpdir, avc_obj._change_file_extn('data/file.avro'))
+                    self.assertTrue(outfile.endswith(f'.{dst_format}.' + {'gzip': 'gz', 'zstd': 'zst', 'lz4': 'lz4'}[compression]))
+                    getattr(avc_obj, f'_to_{dst_format}')(batches=[batch, batch], schema=self.arrow_schema,
+                                                          outfile=outfile)
+                    with pa.CompressedInputStream(outfile, compression) as f:
+                        data = f.read()
+                    if dst_format == 'csv':
+                        self.assertEqual(self.records * 2, read_csv(pa.BufferReader(data)).to_pylist())
+                    elif dst_format == 'json':
+                        self.assertEqual(self.records * 2, json.loads(data))
+                    else:
+                        self.assertEqual(self.records * 2, [json.loads(line) for line in data.splitlines()])
+            with gzip.open(join(tmpdir, 'data', 'file.jsonl.gz')) as f:
+                self.assertEqual(self.records * 2, [json.loads(line) for line in f])
+
+    def test_to_parquet_w_compression(self):
+        batch = pa.RecordBatch.from_pylist(self.records * 100, schema=self.arrow_schema)
+        with TemporaryDirectory() as tmpdir:
+            outfile = join(tmpdir, 'test.parquet')
+            avc_obj = avc(outfolder=tmpdir, dst_format='parquet')
+            self.assertEqual('test.parquet', avc_obj._change_file_extn('test.avro'))
+            avc_obj._to_parquet(batches=[batch], schema=self.arrow_schema, outfile=outfile)
+            column = ParquetFile(outfile).metadata.row_group(0).column(0)
+            self.assertEqual('SNAPPY', column.compression)
+            self.assertIn('RLE_DICTIONARY', column.encodings)
+
+            avc_obj = avc(outfolder=tmpdir, dst_format='parquet', compression='zstd', compression_level=9,
+                          dictionary=False, data_page_size=1024)
+            self.assertEqual('test.parquet', avc_obj._change_file_extn('test.avro'))
+            avc_obj._to_parquet(batches=[batch], schema=self.arrow_schema, outfile=outfile)
+            column = ParquetFile(outfile).metadata.row_group(0).column(0)
+            self.assertEqual('ZSTD', column.compression)
+            self.assertNotIn('RLE_DICTIONARY', column.encodings)
+            self.assertEqual(self.records * 100, read_table(outfile).to_pylist())
+
+            avc_obj = avc(outfolder=join(tmpdir, 'dataset'), dst_format='parquet', partition_by=['name'],
+                          compression='gzip')
+            avc_obj._to_parquet(batches=iter([batch]), schema=self.arrow_schema,
+                                outfile=join(tmpdir, 'dataset', 'test.parquet'))
+            part = join(tmpdir, 'dataset', 'name=Jane', 'test-0.parquet')
+            self.assertEqual('GZIP', ParquetFile(part).metadata.row_group(0).column(0).compression)
+
+    def test_check_compression(self):
+        self.assertIsNone(check_compression('csv'))
+        self.assertIsNone(check_compression('csv', 'none'))
+        self.assertEqual('none', check_compression('parquet', 'NONE'))
+        self.assertEqual('zstd', check_compression('jsonl', 'ZSTD', 19))
+        self.assertEqual('snappy', check_compression('parquet', 'snappy'))
+        with self.assertRaises(ValueError):
+            check_compression('csv', 'snappy')
+        with self.assertRaises(ValueError):
+            check_compression('jsonl', 'brotli')
+        self.assertEqual('brotli', check_compression('parquet', 'brotli', 5))
+        with self.assertRaises(ValueError):
+            check_compression('parquet', 'bz2')
+        with self.assertRaises(ValueError):
+            check_compression('parquet', 'gzip', 10)
+        with self.assertRaises(ValueError):
+            check_compression('parquet', None, 3)
+
+    def test_to_csv_wo_header(self):
+        avc_obj = avc(outfolder='./test_output', dst_format='csv', header=False)
+        batch = pa.RecordBatch.from_pylist(self.records, schema=self.arrow_schema)
+        with TemporaryDirectory() as tmpdir:
+            outfile = avc_obj._to_csv(batches=[batch], schema=self.arrow_schema, outfile=join(tmpdir, 'test.csv'))
+            with open(outfile) as f:
+                self.assertEqual('"John","New York"\n"Jane","Mumbai"\n', f.read())
+
+    def test_to_csv_w_nested_columns(self):
+        schema = pa.schema([pa.field('id', pa.int64()),
+                            pa.field('tags', pa.list_(pa.string())),
+                            pa.field('attributes', pa.map_(pa.string(), pa.int32())),
+                            pa.field('location', pa.struct([pa.field('city', pa.string())])),
+                            pa.field('checksum', pa.binary())])
+        batch = pa.RecordBatch.from_pylist([
+            {'id': 1, 'tags': ['a', 'b'], 'attributes': [('x', 1)], 'location': {'city': 'Pune'},
+             'checksum': b'\x00\xff'},
+            {'id': 2, 'tags': None, 'attributes': None, 'location': None, 'checksum': None}], schema=schema)
+        avc_obj = avc(outfolder='./test_output', dst_format='csv')
+        with TemporaryDirectory() as tmpdir:
+            outfile = avc_obj._to_csv(batches=[batch], schema=schema, outfile=join(tmpdir, 'test.csv'))
+            with open(outfile, encoding='utf-8') as f:
+                lines = f.read().splitlines()
+        self.assertEqual(['"id","tags","attributes","location","checksum"',
+                          '1,"[""a"", ""b""]","{""x"": 1}","{""city"": ""Pune""}","\x00\xff"',
+                          '2,,,,'], lines)
+
     @mock.patch('avroconvert.avroconvert.exists')
     @mock.patch('avroconvert.avroconvert.Path')
     def test_check_output_folder_if(self, mock_path, mock_exists):
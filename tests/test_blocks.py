@@ -0,0 +1,62 @@
+from unittest import TestCase
+from avroconvert.blocks import AvroBlocks, BlockRangeReader, scan_blocks, split_blocks
+from fastavro import parse_schema, reader, writer
+from io import BytesIO
+
+
+class TestBlocks(TestCase):
+
+    def setUp(self):
+        schema = parse_schema({'type': 'record', 'name': 'test', 'fields': [
+            {'name': 'id', 'type': 'long'}, {'name': 'name', 'type': 'string'}]})
+        self.records = [{'id': i, 'name': f'name-{i}'} for i in range(100)]
+        avro_data = BytesIO()
+        writer(avro_data, schema, self.records, codec='deflate', sync_interval=100)
+        self.data = avro_data.getvalue()
+
+    def test_scan_blocks(self):
+        avro_blocks = scan_blocks(BytesIO(self.data))
+        self.assertGreater(len(avro_blocks.blocks), 5)
+        self.assertEqual(avro_blocks.header_size, avro_blocks.blocks[0][0])
+        for (offset, size), (next_offset, _) in zip(avro_blocks.blocks, avro_blocks.blocks[1:]):
+            self.assertEqual(offset + size, next_offset)
+        last_offset, last_size = avro_blocks.blocks[-1]
+        self.assertEqual(len(self.data), last_offset + last_size)
+        self.assertEqual(self.data[-16:], avro_blocks.sync)
+
+    def test_scan_blocks_w_invalid_sync(self):
+        data = self.data[:-1] + bytes([self.data[-1] ^ 0xFF])
+        with self.assertRaises(ValueError):
+            scan_blocks(BytesIO(data))
+
+    def test_split_blocks(self):
+        avro_blocks = scan_blocks(BytesIO(self.data))
+        ranges = split_blocks(avro_blocks, 3)
+        self.assertLessEqual(len(ranges), 3)
+        self.assertEqual(avro_blocks.header_size, ranges[0][0])
+        self.assertEqual(len(self.data), ranges[-1][1])
+        for (_, end), (start, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, start)
+
+        header = self.data[:avro_blocks.header_size]
+        records = [record for start, end in ranges
+                   for record in reader(BytesIO(header + self.data[start:end]))]
+        self.assertEqual(self.records, records)
+
+    def test_block_range_reader(self):
+        avro_blocks = scan_blocks(BytesIO(self.data))
+        start, end = split_blocks(avro_blocks, 2)[1]
+        expected = self.data[:avro_blocks.header_size] + self.data[start:end]
+        with BlockRangeReader(self.data, avro_blocks.header_size, start, end) as avro_file:
+            self.assertEqual(expected, avro_file.read())
+            avro_file.seek(avro_blocks.header_size - 2)
+            self.assertEqual(expected[avro_blocks.header_size - 2:avro_blocks.header_size + 3], avro_file.read(5))
+            avro_file.seek(0)
+            records = list(reader(avro_file))
+        self.assertEqual(self.records[-len(records):], records)
+
+    def test_split_blocks_w_more_parts_than_blocks(self):
+        avro_blocks = AvroBlocks(header_size=10, sync=b'', blocks=[(10, 5), (15, 5)])
+        self.assertEqual([(10, 15), (15, 20)], split_blocks(avro_blocks, 10))
+        self.assertEqual([(10, 20)], split_blocks(avro_blocks, 1))
+        self.assertEqual([], split_blocks(AvroBlocks(10, b'', []), 4))
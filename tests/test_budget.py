@@ -0,0 +1,29 @@
+from unittest import TestCase
+from avroconvert.budget import MemoryBudget
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+
+class TestMemoryBudget(TestCase):
+
+    def test_acquire_waits_for_release(self):
+        budget = MemoryBudget(100)
+        self.assertEqual(60, budget.acquire(60))
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            waiting = pool.submit(budget.acquire, 50)
+            time.sleep(0.05)
+            self.assertFalse(waiting.done())
+            budget.release(60)
+            self.assertEqual(50, waiting.result(timeout=1))
+        self.assertEqual(50, budget.used)
+
+    def test_acquire_more_than_budget(self):
+        budget = MemoryBudget(100)
+        budget.acquire(10)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            waiting = pool.submit(budget.acquire, 500)
+            time.sleep(0.05)
+            self.assertFalse(waiting.done())
+            budget.release(10)
+            # Runs alone once nothing else holds memory
+            self.assertEqual(500, waiting.result(timeout=1))
@@ -5,7 +5,16 @@
 
 from unittest import mock, TestCase
 import avroconvert as avc
+from avroconvert.budget import MemoryBudget
+from avroconvert.execute import CompactTask, ConvertTask, _convert_file, _file_done, _init_worker, _reader
+from avroconvert.sources import FileHandle
+from fastavro import parse_schema, writer
+from os import chdir, getcwd, listdir, makedirs, remove
+from os.path import dirname, exists, join
+from tempfile import TemporaryDirectory
+import asyncio
 import concurrent
+import json
 
 
 class Execute(TestCase):
@@ -22,38 +31,504 @@ class Execute(TestCase):
         self.assertEqual(True, run_res)
 
     @mock.patch('avroconvert.execute.concurrent')
-    @mock.patch('avroconvert.execute.cpu_count')
-    def test_run(self, mock_cpu_count, mock_concurrent):
-        bytes_data = {'filename1': b'test data1', 'filename2': 'test data2'}
+    @mock.patch('avroconvert.execute.available_cpus')
+    def test_run(self, mock_available_cpus, mock_concurrent):
+        bytes_data = {'filename1': b'test data1', 'filename2': b'test data2'}
         avc.s3_reader = mock.Mock(name='s3_reader')
 
-        mock_cpu_count.return_value = 2 # Set the cpu count to 2
+        mock_available_cpus.return_value = 4 # Set the cpu count to 4
         exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder')
         exec_obj._resolve = mock.Mock(name='s3_reader')
-        exec_obj._resolve().get_data = mock.Mock(return_value=bytes_data)
+        reader = exec_obj._resolve()
+        reader.list_files = mock.Mock(return_value=[
+            FileHandle(name=filename, size=len(data), opener=mock.Mock(return_value=data))
+            for filename, data in bytes_data.items()])
+        reader.download.side_effect = lambda filename, fileobj, size, version: fileobj.write(bytes_data[filename][:4])
+        function_response = exec_obj.run()
+        self.assertEqual(True, function_response)
+
+        mock_concurrent.futures.ProcessPoolExecutor.assert_called_with(
+            max_workers=4, initializer=_init_worker, # One process per available cpu
+            initargs=('gs', 'test-bucket', '', {}, {'dst_format': 'parquet', 'outfolder': './test-output-folder'}, None))
+        executor = mock_concurrent.futures.ProcessPoolExecutor().__enter__()
+        tasks = sorted((submit.args[1] for submit in executor.submit.call_args_list), key=lambda task: task.name)
+        self.assertEqual([(_convert_file,)] * 2, [submit.args[:1] for submit in executor.submit.call_args_list])
+        self.assertEqual([ConvertTask(source='gs', bucket='test-bucket', name='filename1', size=10, path=tasks[0].path),
+                          ConvertTask(source='gs', bucket='test-bucket', name='filename2', size=10, path=tasks[1].path)],
+                         tasks)
+        self.assertEqual(1, len(set(dirname(task.path) for task in tasks)))
+        self.assertEqual(['filename1', 'filename2'], sorted(call.args[0] for call in reader.download.call_args_list))
+        for handle in reader.list_files():
+            handle.opener.assert_not_called()
+
+    @mock.patch('avroconvert.execute.concurrent')
+    @mock.patch('avroconvert.execute.available_cpus')
+    def test_run_w_local_files(self, mock_available_cpus, mock_concurrent):
+        mock_available_cpus.return_value = 2
+        exec_obj = avc.Execute(source='fs', bucket='test-folder', dst_format='parquet', outfolder='./test-output-folder')
+        exec_obj._resolve = mock.Mock(name='fs_reader')
+        exec_obj._resolve().list_files = mock.Mock(return_value=[
+            FileHandle(name='test-folder/file1.avro', size=4, opener=mock.Mock())])
+
+        self.assertEqual(True, exec_obj.run())
+
+        executor = mock_concurrent.futures.ProcessPoolExecutor().__enter__()
+        executor.submit.assert_called_once_with(
+            _convert_file, ConvertTask(source='fs', bucket='test-folder', name='test-folder/file1.avro', size=4))
+        exec_obj._resolve().download.assert_not_called()
+
+    @mock.patch('avroconvert.execute.concurrent')
+    @mock.patch('avroconvert.execute.available_cpus')
+    def test_run_in_event_loop(self, mock_available_cpus, mock_concurrent):
+        mock_available_cpus.return_value = 2
+        exec_obj = avc.Execute(source='fs', bucket='test-folder', dst_format='parquet', outfolder='./test-output-folder')
+        exec_obj._resolve = mock.Mock(name='fs_reader')
+        exec_obj._resolve().list_files = mock.Mock(return_value=[
+            FileHandle(name='test-folder/file1.avro', size=4, opener=mock.Mock())])
+
+        async def notebook_cell():
+            return exec_obj.run()
+
+        self.assertEqual(True, asyncio.run(notebook_cell()))
+        mock_concurrent.futures.ProcessPoolExecutor().__enter__().submit.assert_called_once()
+
+    @mock.patch('avroconvert.execute.concurrent')
+    @mock.patch('avroconvert.execute.available_cpus')
+    def test_run_bounds_files_in_flight(self, mock_available_cpus, mock_concurrent):
+        mock_available_cpus.return_value = 2 # At most 2 files in flight
+        exec_obj = avc.Execute(source='fs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder')
+        exec_obj._resolve = mock.Mock(name='fs_reader')
+        exec_obj._resolve().list_files = mock.Mock(return_value=[
+            FileHandle(name=f'file{i}.avro', size=4, opener=mock.Mock()) for i in range(5)])
+        executor = mock_concurrent.futures.ProcessPoolExecutor().__enter__()
+        executor.submit.side_effect = lambda *args, **kwargs: mock.Mock()
+        mock_concurrent.futures.wait.side_effect = lambda fs, return_when: (set(), set(list(fs)[1:]))
+
         function_response = exec_obj.run()
+
         self.assertEqual(True, function_response)
+        self.assertEqual(3, mock_concurrent.futures.wait.call_count)
+        self.assertEqual(5, executor.submit.call_count)
+
+    @mock.patch('avroconvert.execute.AsyncSource')
+    @mock.patch('avroconvert.execute.concurrent')
+    @mock.patch('avroconvert.execute.available_cpus')
+    def test_run_w_workers(self, mock_available_cpus, mock_concurrent, mock_source):
+        async def no_files(*args):
+            return
+            yield
+        mock_source().list_files = no_files
+        mock_source().fetch = no_files
+        mock_source().failed = dict()
+        exec_obj = avc.Execute(source='s3', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder',
+                               workers='3', io_workers=16, download_concurrency=4)
+        exec_obj._resolve = mock.Mock(name='s3_reader')
+
+        self.assertEqual(None, exec_obj.run())
+
+        mock_available_cpus.assert_not_called()
+        self.assertEqual(3, mock_concurrent.futures.ProcessPoolExecutor.call_args.kwargs['max_workers'])
+        self.assertEqual(16, mock_source.call_args.kwargs['concurrency'])
+
+    @mock.patch('avroconvert.execute.concurrent')
+    @mock.patch('avroconvert.execute.available_cpus')
+    def test_run_w_failed_download(self, mock_available_cpus, mock_concurrent):
+        mock_available_cpus.return_value = 1
+        exec_obj = avc.Execute(source='s3', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder')
+        exec_obj._resolve = mock.Mock(name='s3_reader')
+        exec_obj._resolve().list_files = mock.Mock(return_value=[
+            FileHandle(name=f'file{i}.avro', size=4, opener=mock.Mock()) for i in range(5)])
+        exec_obj._resolve().download.side_effect = ConnectionError('Connection reset')
+
+        with self.assertRaises(Exception) as e:
+            exec_obj.run()
+        self.assertEqual('Download of 5 files failed: file0.avro, file1.avro, file2.avro, file3.avro, file4.avro',
+                         str(e.exception))
+        self.assertIsInstance(e.exception.__cause__, ConnectionError)
+        mock_concurrent.futures.ProcessPoolExecutor().__enter__().submit.assert_not_called()
+
+    @mock.patch('avroconvert.execute.concurrent')
+    @mock.patch('avroconvert.execute.available_cpus')
+    def test_run_w_some_failed_downloads(self, mock_available_cpus, mock_concurrent):
+        mock_available_cpus.return_value = 8
+        exec_obj = avc.Execute(source='s3', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder')
+        exec_obj._resolve = mock.Mock(name='s3_reader')
+        exec_obj._resolve().list_files = mock.Mock(return_value=[
+            FileHandle(name=f'file{i}.avro', size=4, opener=mock.Mock()) for i in range(5)])
+
+        def download(filename, fileobj, size=None, version=None):
+            if filename == 'file2.avro':
+                raise ConnectionError('Connection reset')
+            fileobj.write(b'data')
+        exec_obj._resolve().download.side_effect = download
+
+        with self.assertRaises(Exception) as e:
+            exec_obj.run()
+        self.assertEqual('Download of 1 files failed: file2.avro', str(e.exception))
+        submitted = mock_concurrent.futures.ProcessPoolExecutor().__enter__().submit.call_args_list
+        self.assertEqual(['file0.avro', 'file1.avro', 'file3.avro', 'file4.avro'],
+                         sorted(call.args[1].name for call in submitted))
+
+    def test_tasks_w_split_size(self):
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder',
+                               split_size='1KB')
+        avro_object = mock.Mock()
+        avro_object.block_ranges.side_effect = lambda data, num_parts: self.assertEqual(b'large', data[:]) or \
+            [(10, 10, 2000), (10, 2000, 4096)]
+        small_file = FileHandle(name='small.avro', size=1024, opener=mock.Mock())
+        large_file = FileHandle(name='large.avro', size=4096, opener=mock.Mock())
+
+        with TemporaryDirectory() as spool_dir:
+            path = join(spool_dir, 'large.avro')
+            with open(path, 'wb') as f:
+                f.write(b'large')
+            self.assertEqual([ConvertTask(source='gs', bucket='test-bucket', name='small.avro', size=1024, path='small')],
+                             exec_obj._tasks(small_file, 'small', avro_object, num_process=8))
+            tasks = exec_obj._tasks(large_file, path, avro_object, num_process=8)
+
+        self.assertEqual([((10, 10, 2000), 0, path), ((10, 2000, 4096), 1, path)],
+                         [(task.block_range, task.part, task.path) for task in tasks])
+        avro_object.block_ranges.assert_called_once_with(mock.ANY, 4)
+        large_file.opener.assert_not_called()
+
+    @mock.patch('avroconvert.execute.FileSystem')
+    def test_tasks_w_local_files(self, mock_fs):
+        exec_obj = avc.Execute(source='fs', bucket='test-folder', dst_format='parquet', outfolder='./test-output-folder',
+                               split_size='1KB')
+        avro_object = mock.Mock()
+        avro_object.block_ranges.return_value = [(10, 10, 2000), (10, 2000, 4096)]
+        large_file = FileHandle(name='large.avro', size=4096, opener=mock.Mock())
+
+        tasks = exec_obj._tasks(large_file, None, avro_object, num_process=2)
+
+        self.assertEqual([ConvertTask(source='fs', bucket='test-folder', name='large.avro', size=4096,
+                                      block_range=(10, 10, 2000), part=0),
+                          ConvertTask(source='fs', bucket='test-folder', name='large.avro', size=4096,
+                                      block_range=(10, 2000, 4096), part=1)], tasks)
+        mock_fs.map_file.assert_called_once_with('large.avro')
+        avro_object.block_ranges.assert_called_once_with(mock_fs.map_file().__enter__(), 2)
+
+    def test_run_incremental(self):
+        schema = parse_schema({'type': 'record', 'name': 'test', 'fields': [{'name': 'id', 'type': 'long'}]})
+        cwd = getcwd()
+        with TemporaryDirectory() as tmpdir:
+            chdir(tmpdir)
+            try:
+                makedirs('input')
+                for name in ('file1.avro', 'file2.avro'):
+                    with open(join('input', name), 'wb') as f:
+                        writer(f, schema, [{'id': i} for i in range(10)])
+                exec_obj = avc.Execute(source='fs', bucket='input', dst_format='csv', outfolder='output',
+                                       incremental=True)
+
+                self.assertEqual(True, exec_obj.run())
+                self.assertEqual(['file1.csv', 'file2.csv'], sorted(listdir(join('output', 'input'))))
+                self.assertEqual(None, exec_obj.run())
+
+                with open(join('input', 'file2.avro'), 'wb') as f:
+                    writer(f, schema, [{'id': i} for i in range(5)])
+                remove(join('output', 'input', 'file1.csv'))
+                self.assertEqual(True, exec_obj.run())
+                self.assertEqual(['file2.csv'], listdir(join('output', 'input')))
+                self.assertTrue(exists(join('output', '.avroconvert-manifest.sqlite')))
+            finally:
+                chdir(cwd)
+
+    def test_run_w_target_file_size(self):
+        schema = parse_schema({'type': 'record', 'name': 'test', 'fields': [{'name': 'id', 'type': 'long'}]})
+        other_schema = parse_schema({'type': 'record', 'name': 'other', 'fields': [{'name': 'id', 'type': 'string'}]})
+        cwd = getcwd()
+        with TemporaryDirectory() as tmpdir:
+            chdir(tmpdir)
+            try:
+                makedirs(join('input', 'sub'))
+                for name in ('file1.avro', 'file2.avro', 'file3.avro', join('sub', 'file4.avro')):
+                    with open(join('input', name), 'wb') as f:
+                        writer(f, schema, [{'id': i} for i in range(10)])
+                with open(join('input', 'file5.avro'), 'wb') as f:
+                    writer(f, other_schema, [{'id': str(i)} for i in range(10)])
+                with open(join('input', 'large.avro'), 'wb') as f:
+                    writer(f, schema, [{'id': i} for i in range(10000)])
+                exec_obj = avc.Execute(source='fs', bucket='input', dst_format='csv', outfolder='output',
+                                       target_file_size='4KB')
+
+                self.assertEqual(True, exec_obj.run())
+
+                self.assertEqual(['file1-compacted.csv', 'file5.csv', 'large.csv', 'sub'],
+                                 sorted(listdir(join('output', 'input'))))
+                self.assertEqual(['file4.csv'], listdir(join('output', 'input', 'sub')))
+                with open(join('output', 'input', 'file1-compacted.csv')) as f:
+                    self.assertEqual(31, len(f.read().splitlines()))
+            finally:
+                chdir(cwd)
+
+    def test_execute_validate_incremental_w_target_file_size(self):
+        # An incremental run would regroup only a changed file and a new
+        # file, and overwrite the compacted output of the unchanged files
+        with self.assertRaises(ValueError):
+            avc.Execute(source='fs', bucket='input', dst_format='parquet', outfolder='output',
+                        target_file_size='1MB', incremental=True)
+
+    def test_group(self):
+        exec_obj = avc.Execute(source='fs', bucket='input', dst_format='parquet', outfolder='output',
+                               target_file_size=10)
+        avro_object = mock.Mock()
+        avro_object.read_schema.side_effect = lambda data: {'name': data}
+        groups = dict()
+        handles = [FileHandle(name=f'input/file{i}.avro', size=4, opener=mock.Mock()) for i in range(3)]
+
+        with mock.patch('avroconvert.execute.FileSystem') as mock_fs:
+            mock_fs.map_file().__enter__.return_value = 'test'
+            large = FileHandle(name='input/large.avro', size=10, opener=mock.Mock())
+            self.assertEqual([[(large, 'spool0')]], exec_obj._group(groups, large, 'spool0', avro_object))
+            self.assertEqual([], exec_obj._group(groups, handles[1], 'spool2', avro_object))
+            self.assertEqual([], exec_obj._group(groups, handles[2], 'spool3', avro_object))
+            self.assertEqual([[(handles[1], 'spool2'), (handles[2], 'spool3'), (handles[0], 'spool1')]],
+                             exec_obj._group(groups, handles[0], 'spool1', avro_object))
+        self.assertEqual({}, groups)
+
+    def test_run_w_max_memory(self):
+        schema = parse_schema({'type': 'record', 'name': 'test', 'fields': [{'name': 'id', 'type': 'long'}]})
+        cwd = getcwd()
+        with TemporaryDirectory() as tmpdir:
+            chdir(tmpdir)
+            try:
+                makedirs('input')
+                for i in range(4):
+                    with open(join('input', f'file{i}.avro'), 'wb') as f:
+                        writer(f, schema, [{'id': i} for i in range(100)])
+                exec_obj = avc.Execute(source='fs', bucket='input', dst_format='csv', outfolder='output',
+                                       max_memory='1KB', workers=2)
+
+                with mock.patch('avroconvert.execute.MemoryBudget', wraps=MemoryBudget) as mock_budget:
+                    self.assertEqual(True, exec_obj.run())
+
+                self.assertEqual([f'file{i}.csv' for i in range(4)], sorted(listdir(join('output', 'input'))))
+                mock_budget.assert_called_once_with(1024)
+            finally:
+                chdir(cwd)
+
+    def test_task_memory(self):
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder',
+                               row_group_bytes=1000, max_memory='1GB')
+        self.assertEqual(1024 ** 3, exec_obj.max_memory)
+        task = ConvertTask(source='gs', bucket='test-bucket', name='file.avro', size=100)
+        self.assertEqual(400, exec_obj._task_memory(task))
+        self.assertEqual(4000, exec_obj._task_memory(task._replace(size=10000)))
+        self.assertEqual(200, exec_obj._task_memory(task._replace(size=10000, block_range=(10, 100, 150))))
+        self.assertEqual(800, exec_obj._task_memory(CompactTask(name='file.avro', inputs=(task, task))))
+
+    def test_task_memory_w_remote_outfolder(self):
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='s3://bucket/out',
+                               row_group_bytes=1000)
+        task = ConvertTask(source='gs', bucket='test-bucket', name='file.avro', size=100)
+        self.assertEqual(400 + 5 * 16 * 1024 ** 2, exec_obj._task_memory(task))
+        with mock.patch.object(exec_obj, '_storage_options', return_value={'part_size': 100, 'concurrency': 2}):
+            self.assertEqual(400 + 300, exec_obj._task_memory(task))
+
+    def test_task_memory_w_json_output(self):
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='json', outfolder='./test-output-folder',
+                               row_group_bytes=1000)
+        task = ConvertTask(source='gs', bucket='test-bucket', name='file.avro', size=10000)
+        # The json writer holds the whole file, not a row group
+        self.assertEqual(40000, exec_obj._task_memory(task))
+
+    def test_storage_options(self):
+        exec_obj = avc.Execute(source='s3', bucket='test-bucket', dst_format='parquet', outfolder='s3://bucket/out',
+                               access_key='key', secret_key='secret', endpoint_url='http://localhost:5000',
+                               part_size=1024)
+        self.assertEqual({'access_key': 'key', 'secret_key': 'secret', 'endpoint_url': 'http://localhost:5000'},
+                         exec_obj._storage_options())
+        exec_obj = avc.Execute(source='s3', bucket='test-bucket', dst_format='parquet', outfolder='gs://bucket/out',
+                               access_key='key', secret_key='secret')
+        self.assertEqual({}, exec_obj._storage_options())
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='gs://bucket',
+                               auth_file='auth.json', retries=2)
+        self.assertEqual({'auth_file': 'auth.json', 'retries': 2}, exec_obj._storage_options())
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./output',
+                               auth_file='auth.json')
+        self.assertEqual({}, exec_obj._storage_options())
+
+    def test_execute_validate_remote_outfolder(self):
+        with self.assertRaises(ValueError):
+            avc.Execute(source='s3', bucket='test-bucket', dst_format='parquet', outfolder='s3:///out')
+        with self.assertRaises(ValueError):
+            avc.Execute(source='s3', bucket='test-bucket', dst_format='parquet', outfolder='s3://bucket/out',
+                        incremental=True)
+        avc.Execute(source='s3', bucket='test-bucket', dst_format='parquet', outfolder='s3://bucket/out',
+                    incremental=True, manifest='manifest.sqlite')
+
+    def test_run_w_report(self):
+        schema = parse_schema({'type': 'record', 'name': 'test', 'fields': [{'name': 'id', 'type': 'long'}]})
+        cwd = getcwd()
+        with TemporaryDirectory() as tmpdir:
+            chdir(tmpdir)
+            try:
+                makedirs('input')
+                for name in ('file1.avro', 'file2.avro'):
+                    with open(join('input', name), 'wb') as f:
+                        writer(f, schema, [{'id': i} for i in range(10)])
+                with open(join('input', 'invalid.avro'), 'wb') as f:
+                    f.write(b'not avro')
+                exec_obj = avc.Execute(source='fs', bucket='input', dst_format='csv', outfolder='output',
+                                       report='report.json', prometheus_file='avroconvert.prom')
+
+                with self.assertRaises(Exception) as e:
+                    exec_obj.run()
+                self.assertEqual('Conversion of 1 files failed: input/invalid.avro', str(e.exception))
+
+                with open('report.json') as f:
+                    report = json.load(f)
+                self.assertEqual(report['seconds'], exec_obj.metrics.report()['seconds'])
+                self.assertEqual(20, report['records'])
+                self.assertEqual(['input/invalid.avro'], report['failed_files'])
+                self.assertEqual(10, report['per_file']['input/file1.avro']['records'])
+                self.assertEqual(2, report['stages']['decode']['files'])
+                self.assertTrue(exists('avroconvert.prom'))
+            finally:
+                chdir(cwd)
+
+    def test_run_w_profile(self):
+        schema = parse_schema({'type': 'record', 'name': 'test', 'fields': [{'name': 'id', 'type': 'long'}]})
+        cwd = getcwd()
+        with TemporaryDirectory() as tmpdir:
+            chdir(tmpdir)
+            try:
+                makedirs('input')
+                for name in ('file1.avro', 'file2.avro'):
+                    with open(join('input', name), 'wb') as f:
+                        writer(f, schema, [{'id': i} for i in range(10)])
+                exec_obj = avc.Execute(source='fs', bucket='input', dst_format='csv', outfolder='output',
+                                       workers=2, profile='profile')
+
+                self.assertEqual(True, exec_obj.run())
+
+                files = sorted(listdir('profile'))
+                self.assertEqual(['merged.pstats', 'parent.pstats', 'profile.txt'], files[:3])
+                self.assertTrue(files[3].startswith('worker-'))
+            finally:
+                chdir(cwd)
+
+    def test_file_done(self):
+        manifest = mock.Mock()
+        handle = FileHandle(name='test.avro', size=9, opener=mock.Mock(), version='1')
+        succeeded, failed = mock.Mock(), mock.Mock()
+        succeeded.cancelled.return_value = failed.cancelled.return_value = False
+        succeeded.exception.return_value = None
+        failed.exception.return_value = ValueError('Invalid sync marker')
+        with TemporaryDirectory() as tmpdir:
+            path = join(tmpdir, 'test.avro')
+            open(path, 'wb').close()
+            _file_done(handle, path, manifest, [succeeded, failed])
+            self.assertFalse(exists(path))
+        manifest.record.assert_not_called()
+        _file_done(handle, None, manifest, [succeeded, succeeded])
+        manifest.record.assert_called_once_with(handle)
+
+    def test_convert_file(self):
+        reader = mock.MagicMock()
+        reader.open_file().__enter__.return_value = b'avro data'
+        converter = mock.Mock()
+        task = ConvertTask(source='gs', bucket='test-bucket', name='test.avro', size=9, block_range=(1, 2, 3), part=0)
+        with mock.patch.dict('avroconvert.execute._worker', {'reader': reader, 'converter': converter}):
+            response = _convert_file(task)
+        reader.open_file.assert_called_with('test.avro', size=9)
+        converter.convert_avro.assert_called_once_with(
+            filename='test.avro', data=b'avro data', block_range=(1, 2, 3), part=0, stats=response)
+        self.assertEqual({'name': 'test.avro', 'size': 9, 'bytes': 1}, response)
+
+    def test_convert_file_w_local_copy(self):
+        converter = mock.Mock()
+        converter.convert_avro.side_effect = lambda filename, data, block_range, part, stats: stats.update(
+            records=len(data[:]))
+        with TemporaryDirectory() as tmpdir:
+            path = join(tmpdir, 'test.avro')
+            with open(path, 'wb') as f:
+                f.write(b'avro data')
+            task = ConvertTask(source='gs', bucket='test-bucket', name='data/test.avro', size=9, path=path)
+            with mock.patch.dict('avroconvert.execute._worker', {'reader': mock.Mock(), 'converter': converter}):
+                response = _convert_file(task)
+        self.assertEqual({'name': 'data/test.avro', 'size': 9, 'bytes': 9, 'records': 9}, response)
+        self.assertEqual('data/test.avro', converter.convert_avro.call_args.kwargs['filename'])
+
+    def test_init_worker(self):
+        avc.gs_reader = mock.Mock(name='gs_reader')
+        with mock.patch.dict('avroconvert.execute._worker'):
+            _init_worker('gs', 'test-bucket', 'test-prefix', {'auth_file': 'test.json'},
+                         {'dst_format': 'csv', 'outfolder': './test-output-folder'})
+            avc.gs_reader.assert_not_called()
+            self.assertEqual('csv', avc.execute._worker['converter'].dst_format)
+            self.assertEqual(avc.gs_reader(), _reader())
+            self.assertEqual(_reader(), _reader())
+            avc.gs_reader.assert_called_with(bucket='test-bucket', prefix='test-prefix', auth_file='test.json')
+            self.assertEqual(2, avc.gs_reader.call_count)
+
+    @mock.patch('avroconvert.execute.start_worker_profile')
+    def test_init_worker_w_profile(self, mock_start_worker_profile):
+        avc.gs_reader = mock.Mock(name='gs_reader')
+        with mock.patch.dict('avroconvert.execute._worker'):
+            _init_worker('gs', 'test-bucket', '', {}, {'dst_format': 'csv', 'outfolder': './test-output-folder'})
+            mock_start_worker_profile.assert_not_called()
+            _init_worker('gs', 'test-bucket', '', {}, {'dst_format': 'csv', 'outfolder': './test-output-folder'},
+                         'profile')
+            mock_start_worker_profile.assert_called_once_with('profile')
+
+    def test_convert_options(self):
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder',
+                               row_group_size=1000, row_group_bytes='64MB')
+        self.assertEqual({'row_group_size': 1000, 'row_group_bytes': 64 * 1024 * 1024}, exec_obj.convert_options)
+
+    def test_convert_options_w_compression(self):
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder',
+                               compression='ZSTD', compression_level=9, dictionary=False, data_page_size='2MB')
+        self.assertEqual({'compression': 'zstd', 'compression_level': 9, 'dictionary': False,
+                          'data_page_size': 2 * 1024 * 1024}, exec_obj.convert_options)
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='csv', outfolder='./test-output-folder',
+                               compression='none')
+        self.assertEqual({}, exec_obj.convert_options)
+        with self.assertRaises(ValueError):
+            avc.Execute(source='gs', bucket='test-bucket', dst_format='csv', outfolder='./test-output-folder',
+                        compression='snappy')
+        with self.assertRaises(Exception) as e:
+            avc.Execute(source='gs', bucket='test-bucket', dst_format='json', outfolder='./test-output-folder',
+                        dictionary=False)
+        self.assertIn('only supported for the parquet format', e.exception.args[0])
+
+    def test_convert_options_w_partition_by(self):
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder',
+                               partition_by='country, year')
+        self.assertEqual({'partition_by': ['country', 'year']}, exec_obj.convert_options)
+        with self.assertRaises(Exception) as e:
+            avc.Execute(source='gs', bucket='test-bucket', dst_format='csv', outfolder='./test-output-folder',
+                        partition_by=['country'])
+        self.assertEqual(('Partitioned output is only supported for the parquet format, not csv',), e.exception.args)
 
-        mock_concurrent.futures.ProcessPoolExecutor.assert_called_with(max_workers=4) # Formula used to calculate total process is cpu_count * 2
+    def test_convert_options_w_columns_and_filter(self):
+        exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder',
+                               columns='name, city', filter="country == 'IN'")
+        self.assertEqual({'columns': ['name', 'city'], 'filter': "country == 'IN'"}, exec_obj.convert_options)
+        with self.assertRaises(ValueError):
+            avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder',
+                        filter='country ==')
 
     def test_run_no_data(self):
         avc.s3_reader = mock.Mock(name='s3_reader')
 
         exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='parquet', outfolder='./test-output-folder')
         exec_obj._resolve = mock.Mock(name='s3_reader')
-        exec_obj._resolve().get_data = mock.Mock(return_value={})
+        exec_obj._resolve().list_files = mock.Mock(return_value=iter([]))
         function_response = exec_obj.run()
         self.assertEqual(None, function_response)
     
     def test_execute_missing_output_format(self):
         with self.assertRaises(AttributeError) as e:
             exec_obj = avc.Execute(source='abc', bucket='test-bucket', dst_format=None, outfolder='test-output', prefix='test-prefix')
-        self.assertEqual(("Output format not specified, should be one of ['parquet', 'csv', 'json']",), e.exception.args)
+        self.assertEqual(("Output format not specified, should be one of ['parquet', 'csv', 'json', 'jsonl']",), e.exception.args)
 
     def test_execute_validate_output_format(self):
         with self.assertRaises(Exception) as e:
             exec_obj = avc.Execute(source='gs', bucket='test-bucket', dst_format='random_format', outfolder='test-output', prefix='test-prefix')
-        self.assertEqual(("Invalid format random_format. It should be one of ['parquet', 'csv', 'json']",), e.exception.args)
+        self.assertEqual(("Invalid format random_format. It should be one of ['parquet', 'csv', 'json', 'jsonl']",), e.exception.args)
 
     def test_execute_validate_source(self):
         with self.assertRaises(Exception) as e:
@@ -0,0 +1,41 @@
+from unittest import TestCase
+from avroconvert.filters import RecordFilter
+
+
+class TestRecordFilter(TestCase):
+
+    def setUp(self):
+        self.records = [
+            {'name': 'John', 'country': 'IN', 'year': 2021, 'address': {'city': 'Mumbai'}},
+            {'name': 'Jane', 'country': 'US', 'year': 2020, 'address': {'city': 'New York'}},
+            {'name': 'Joe', 'country': 'IN', 'year': None, 'address': None},
+        ]
+
+    def _names(self, expression):
+        return [record['name'] for record in self.records if RecordFilter(expression)(record)]
+
+    def test_comparisons(self):
+        self.assertEqual(['John', 'Joe'], self._names("country == 'IN'"))
+        self.assertEqual(['Jane'], self._names("country != 'IN'"))
+        self.assertEqual(['John'], self._names('year >= 2021'))
+        self.assertEqual(['Jane'], self._names('2019 < year < 2021'))
+        self.assertEqual(['John', 'Jane'], self._names("country in ['IN', 'US'] and year is not None"))
+        self.assertEqual(['Jane'], self._names("name not in ('John', 'Joe')"))
+
+    def test_boolean_operators(self):
+        self.assertEqual(['John', 'Jane'], self._names("year == 2021 or country == 'US'"))
+        self.assertEqual(['Jane', 'Joe'], self._names('not (year > 2020)'))
+
+    def test_nested_fields(self):
+        self.assertEqual(['John'], self._names("address.city == 'Mumbai'"))
+        self.assertEqual(['Joe'], self._names('address.city is None'))
+        self.assertEqual(['address'], RecordFilter("address.city == 'Mumbai'").fields)
+
+    def test_fields(self):
+        self.assertEqual(['country', 'year'], RecordFilter("country == 'IN' and year > 2020 or year < 2000").fields)
+
+    def test_invalid_expressions(self):
+        for expression in ('year >', "__import__('os')", 'year + 1 > 2020', 'name.upper() == 1',
+                           'year > len(name)'):
+            with self.assertRaises(ValueError, msg=expression):
+                RecordFilter(expression)
@@ -0,0 +1,54 @@
+from unittest import TestCase
+from avroconvert.sources.filesystem.reader import FileSystem
+from os import makedirs, path
+from tempfile import TemporaryDirectory
+
+
+class TestFsReader(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.folder = self.tmpdir.name
+        makedirs(path.join(self.folder, 'nested'))
+        for filename, data in {'test-1.avro': b'data1', 'other.avro': b'data2',
+                               'nested/test-2.avro': b'data33', 'test-3.csv': b'csv'}.items():
+            with open(path.join(self.folder, filename), 'wb') as f:
+                f.write(data)
+
+    def test_list_files(self):
+        fs_reader = FileSystem(bucket=self.folder, prefix='test')
+        handles = sorted(fs_reader.list_files())
+        self.assertEqual([path.join(self.folder, 'nested', 'test-2.avro'),
+                          path.join(self.folder, 'test-1.avro')],
+                         [handle.name for handle in handles])
+        self.assertEqual([6, 5], [handle.size for handle in handles])
+        self.assertEqual(b'data33', handles[0].opener())
+
+    def test_get_data(self):
+        fs_reader = FileSystem(bucket=self.folder)
+        self.assertEqual({path.join(self.folder, 'test-1.avro'): b'data1',
+                          path.join(self.folder, 'other.avro'): b'data2',
+                          path.join(self.folder, 'nested', 'test-2.avro'): b'data33'},
+                         fs_reader.get_data())
+
+    def test_get_data_wrong_format(self):
+        fs_reader = FileSystem(bucket=self.folder, datatype='random')
+        with self.assertRaises(TypeError) as e:
+            fs_reader.get_data()
+        self.assertEqual(
+            ('Given datatype random not supported yet',), e.exception.args)
+
+    def test_map_file(self):
+        with FileSystem.map_file(path.join(self.folder, 'nested', 'test-2.avro')) as data:
+            self.assertEqual(b'data33', data[:])
+        empty = path.join(self.folder, 'empty.avro')
+        open(empty, 'wb').close()
+        with FileSystem.map_file(empty) as data:
+            self.assertEqual(b'', data)
+
+    def test_fs_w_no_folder(self):
+        with self.assertRaises(AttributeError):
+            FileSystem(bucket=None)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
@@ -1,5 +1,6 @@
 from unittest import TestCase, mock
 from avroconvert.sources.gcs.reader import GCS
+from io import BytesIO
 from os import environ
 
 
@@ -16,15 +17,34 @@ class TestGcsReader(TestCase):
         mock_strg.Client.from_service_account_json.return_value = gcs_client
         gcs_reader = GCS(bucket='test')
         gcs_reader._filter = mock.Mock(
-            return_value=['file1.avro', 'file2.avro'])
-        gcs_reader._read_files = mock.Mock(side_effect=[b'data1', b'data2'])
+            return_value=[self._blob('file1.avro'), self._blob('folder/'), self._blob('file2.avro')])
+        gcs_reader._read_files = mock.Mock(
+            side_effect=lambda filename, size, blob: {'file1.avro': b'data1', 'file2.avro': b'data2'}[filename])
         extract_response = gcs_reader._extract_raw_data()
         gcs_reader._filter.assert_called_with()
-        gcs_reader._read_files.assert_has_calls(
-            [mock.call(filename='file1.avro'), mock.call(filename='file2.avro')])
+        self.assertEqual(['file1.avro', 'file2.avro'],
+                         sorted(call.kwargs['filename'] for call in gcs_reader._read_files.call_args_list))
         self.assertEqual(
             {'file1.avro': b'data1', 'file2.avro': b'data2'}, extract_response)
 
+    @mock.patch('avroconvert.sources.gcs.reader.storage')
+    def test_list_files(self, mock_strg):
+        gcs_client = mock.MagicMock()
+        mock_strg.Client.from_service_account_json.return_value = gcs_client
+        gcs_reader = GCS(bucket='test')
+        gcs_reader.client.list_blobs.return_value = [
+            self._blob('data/', 0), self._blob('data/file1.avro', 10), self._blob('data/file2.txt', 20)]
+        gcs_reader._read_files = mock.Mock(return_value=b'data1')
+
+        handles = list(gcs_reader.list_files())
+
+        gcs_reader._read_files.assert_not_called()
+        self.assertEqual(['data/file1.avro'], [handle.name for handle in handles])
+        self.assertEqual(10, handles[0].size)
+        self.assertEqual(b'data1', handles[0].opener())
+        gcs_reader._read_files.assert_called_with(filename='data/file1.avro', size=10,
+                                                  blob=gcs_reader.client.list_blobs.return_value[1])
+
     @mock.patch('avroconvert.sources.gcs.reader.storage')
     def test_extract_raw_data_w_no_files(self, mock_strg):
         gcs_client = mock.MagicMock()
@@ -67,6 +87,66 @@ class TestGcsReader(TestCase):
         gcs_reader = GCS(bucket='test')
         res = gcs_reader._read_files(filename='test.avro')
 
+    @mock.patch('avroconvert.sources.gcs.reader.storage')
+    def test_read_files_w_listed_blob(self, mock_strg):
+        gcs_reader = GCS(bucket='test')
+        blob = self._blob('test.avro', 9)
+        blob.download_as_bytes.return_value = b'test-data'
+        self.assertEqual(b'test-data', gcs_reader._read_files(filename='test.avro', size=9, blob=blob))
+        gcs_reader.client.get_blob.assert_not_called()
+        gcs_reader.client.blob.assert_not_called()
+
+    @mock.patch('avroconvert.sources.gcs.reader.storage')
+    def test_read_files_w_ranges(self, mock_strg):
+        data = bytes(range(256)) * 4
+        gcs_reader = GCS(bucket='test', part_size=300)
+        blob = gcs_reader.client.blob.return_value
+        blob.download_as_bytes.side_effect = lambda start, end, checksum: data[start:end + 1]
+
+        self.assertEqual(data, gcs_reader._read_files(filename='test.avro', size=len(data)))
+        gcs_reader.client.blob.assert_called_once_with('test.avro')
+        self.assertEqual([(0, 299), (300, 599), (600, 899), (900, 1023)],
+                         sorted((call.kwargs['start'], call.kwargs['end'])
+                                for call in blob.download_as_bytes.call_args_list))
+
+    @mock.patch('avroconvert.sources.gcs.reader.storage')
+    def test_download_w_ranges(self, mock_strg):
+        data = bytes(range(256)) * 4
+        gcs_reader = GCS(bucket='test', part_size=300, download_concurrency=2)
+        blob = gcs_reader.client.blob.return_value
+        blob.download_as_bytes.side_effect = lambda start, end, checksum: data[start:end + 1]
+        fileobj = BytesIO()
+
+        gcs_reader.download('test.avro', fileobj, size=len(data), version='1600000000000001')
+
+        self.assertEqual(data, fileobj.getvalue())
+        blob.download_to_file.assert_not_called()
+        # Every ranged read is pinned to the listed generation
+        gcs_reader.client.blob.assert_called_once_with('test.avro', generation=1600000000000001)
+
+    @mock.patch('avroconvert.sources.retry.time.sleep')
+    @mock.patch('avroconvert.sources.gcs.reader.storage')
+    def test_download_w_retries(self, mock_strg, mock_sleep):
+        gcs_reader = GCS(bucket='test', retries=2)
+        blob = gcs_reader.client.blob.return_value
+        attempts = list()
+
+        def download_to_file(fileobj):
+            attempts.append(fileobj.tell())
+            fileobj.write(b'test')
+            if len(attempts) == 1:
+                raise ConnectionResetError('Connection reset by peer')
+            fileobj.write(b'-data')
+        blob.download_to_file.side_effect = download_to_file
+        fileobj = BytesIO(b'header')
+        fileobj.seek(0, 2)
+
+        gcs_reader.download('test.avro', fileobj, size=9)
+
+        # The partial data of the failed attempt is dropped
+        self.assertEqual(b'headertest-data', fileobj.getvalue())
+        self.assertEqual([6, 6], attempts)
+
     @mock.patch('avroconvert.sources.gcs.reader.storage')
     def test_get_data(self, mock_strg):
         gcs_client = mock.MagicMock()
@@ -92,6 +172,12 @@ class TestGcsReader(TestCase):
         self.assertEqual(
             ('Given datatype random not supported yet',), e.exception.args)
 
+    def _blob(self, name, size=0):
+        blob = mock.Mock()
+        blob.name = name
+        blob.size = size
+        return blob
+
     @classmethod
     def tearDownClass(cls):
         pass
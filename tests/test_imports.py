@@ -0,0 +1,50 @@
+from unittest import TestCase
+from fastavro import parse_schema, writer
+from os import makedirs
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ('boto3', 'google.cloud.storage', 'pandas', 'pyarrow', 'pyarrow.dataset', 'pyarrow.parquet')
+
+
+def imported_modules(code: str, cwd: str = None) -> list:
+    '''
+    Run `code` in a new interpreter and return the heavy
+    modules it imported
+    '''
+    script = f'{code}\nimport json, sys\nprint(json.dumps([m for m in {HEAVY_MODULES!r} if m in sys.modules]))'
+    env = dict(os.environ, PYTHONPATH=dirname(dirname(__file__)))
+    output = subprocess.run([sys.executable, '-c', script], cwd=cwd, env=env, capture_output=True,
+                            text=True, check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+class TestImports(TestCase):
+
+    def test_import_package(self):
+        self.assertEqual([], imported_modules('import avroconvert'))
+        self.assertEqual([], imported_modules('import avroconvert.sources'))
+
+    def test_import_cli(self):
+        self.assertEqual(['pyarrow'], imported_modules('import avroconvert.cli'))
+
+    def test_lazy_attributes(self):
+        self.assertEqual(['boto3', 'pyarrow'], imported_modules('from avroconvert import s3_reader, Execute'))
+        self.assertEqual(['google.cloud.storage'], imported_modules('from avroconvert.sources import gs_reader'))
+        with self.assertRaises(subprocess.CalledProcessError):
+            imported_modules('from avroconvert import missing')
+
+    def test_convert_local_files_to_csv(self):
+        schema = parse_schema({'type': 'record', 'name': 'test', 'fields': [{'name': 'id', 'type': 'long'}]})
+        with TemporaryDirectory() as tmpdir:
+            makedirs(join(tmpdir, 'input'))
+            with open(join(tmpdir, 'input', 'file1.avro'), 'wb') as f:
+                writer(f, schema, [{'id': 1}])
+            modules = imported_modules("import avroconvert as avc\n"
+                                       "avc.Execute(source='fs', bucket='input', dst_format='csv', "
+                                       "outfolder='output', workers=1).run()", cwd=tmpdir)
+        self.assertEqual(['pyarrow'], modules)
@@ -0,0 +1,45 @@
+from unittest import TestCase, mock
+from avroconvert.manifest import Manifest
+from avroconvert.sources import FileHandle
+from os.path import join
+from tempfile import TemporaryDirectory
+
+
+class TestManifest(TestCase):
+
+    def setUp(self):
+        self.tmpdir = TemporaryDirectory()
+        self.path = join(self.tmpdir.name, 'output', 'manifest.sqlite')
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _handle(self, name='data/file1.avro', size=10, version='"etag1"'):
+        return FileHandle(name=name, size=size, opener=mock.Mock(), version=version)
+
+    def test_record(self):
+        with Manifest(self.path, source='s3', bucket='test-bucket', dst_format='parquet') as manifest:
+            self.assertFalse(manifest.is_converted(self._handle()))
+            manifest.record(self._handle())
+            self.assertTrue(manifest.is_converted(self._handle()))
+
+        with Manifest(self.path, source='s3', bucket='test-bucket', dst_format='parquet') as manifest:
+            self.assertEqual(1, len(manifest))
+            self.assertTrue(manifest.is_converted(self._handle()))
+            self.assertFalse(manifest.is_converted(self._handle(version='"etag2"')))
+            self.assertFalse(manifest.is_converted(self._handle(size=11)))
+            self.assertFalse(manifest.is_converted(self._handle(name='data/file2.avro')))
+
+    def test_record_per_format_and_bucket(self):
+        with Manifest(self.path, source='s3', bucket='test-bucket', dst_format='parquet') as manifest:
+            manifest.record(self._handle())
+        with Manifest(self.path, source='s3', bucket='test-bucket', dst_format='csv') as manifest:
+            self.assertFalse(manifest.is_converted(self._handle()))
+        with Manifest(self.path, source='s3', bucket='other-bucket', dst_format='parquet') as manifest:
+            self.assertFalse(manifest.is_converted(self._handle()))
+
+    def test_record_wo_version(self):
+        with Manifest(self.path, source='s3', bucket='test-bucket', dst_format='parquet') as manifest:
+            manifest.record(self._handle(version=None))
+            self.assertFalse(manifest.is_converted(self._handle(version=None)))
+            self.assertEqual(0, len(manifest))
@@ -0,0 +1,54 @@
+from unittest import TestCase
+from avroconvert.metrics import RunMetrics
+from os.path import join
+from tempfile import TemporaryDirectory
+import json
+
+
+class TestRunMetrics(TestCase):
+
+    def setUp(self):
+        self.metrics = RunMetrics(source='s3', bucket='test-bucket', dst_format='parquet')
+        self.metrics.record_listing(0.5, files=2)
+        self.metrics.record_download('data/file1.avro', 1024 ** 2, 0.25)
+        self.metrics.record_download('data/file2.avro', 1024 ** 2, 0.25)
+        # file1 was split in two parts
+        for part in range(2):
+            self.metrics.record_task({'name': 'data/file1.avro', 'size': 1024 ** 2, 'bytes': 512 * 1024,
+                                      'records': 500, 'decode_seconds': 0.5, 'write_seconds': 0.25})
+        self.metrics.record_error('data/file2.avro', ValueError('Invalid sync marker'))
+        self.metrics.finish()
+
+    def test_report(self):
+        report = self.metrics.report()
+
+        self.assertEqual(2, report['files'])
+        self.assertEqual(1000, report['records'])
+        self.assertEqual(['data/file2.avro'], report['failed_files'])
+        self.assertEqual({'seconds': 0.5, 'bytes': 2 * 1024 ** 2, 'files': 2, 'records': 0, 'mb_per_s': 4.0},
+                         report['stages']['download'])
+        self.assertEqual({'seconds': 1.0, 'bytes': 1024 ** 2, 'files': 1, 'records': 1000, 'mb_per_s': 1.0,
+                          'records_per_s': 1000.0}, report['stages']['decode'])
+        self.assertEqual(0.5, report['stages']['write']['seconds'])
+        self.assertEqual({'size': 1024 ** 2, 'download_seconds': 0.25, 'records': 1000, 'decode_seconds': 1.0,
+                          'write_seconds': 0.5, 'tasks': 2, 'errors': []}, report['per_file']['data/file1.avro'])
+        self.assertEqual(['ValueError: Invalid sync marker'], report['per_file']['data/file2.avro']['errors'])
+
+    def test_write_report(self):
+        with TemporaryDirectory() as tmpdir:
+            path = join(tmpdir, 'reports', 'run.json')
+            self.metrics.write_report(path)
+            with open(path) as f:
+                self.assertEqual(self.metrics.report(), json.load(f))
+
+    def test_write_prometheus(self):
+        with TemporaryDirectory() as tmpdir:
+            path = join(tmpdir, 'avroconvert.prom')
+            self.metrics.write_prometheus(path)
+            with open(path) as f:
+                lines = f.read().splitlines()
+        labels = 'source="s3",bucket="test-bucket",dst_format="parquet"'
+        self.assertIn(f'avroconvert_records{{{labels}}} 1000', lines)
+        self.assertIn(f'avroconvert_failed_files{{{labels}}} 1', lines)
+        self.assertIn(f'avroconvert_stage_seconds{{{labels},stage="decode"}} 1.0', lines)
+        self.assertIn(f'avroconvert_stage_bytes{{{labels},stage="download"}} {2 * 1024 ** 2}', lines)
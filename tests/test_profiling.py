@@ -0,0 +1,72 @@
+from unittest import mock, TestCase
+from avroconvert.profiling import Profiler, _package, clear_profiles, merge_profiles, start_worker_profile
+from os import listdir
+from os.path import join
+from tempfile import TemporaryDirectory
+from threading import Thread
+import pstats
+
+
+def busy(n):
+    return sum(i * i for i in range(n))
+
+
+def spin(n):
+    return busy(n)
+
+
+class TestProfiler(TestCase):
+
+    def test_dump(self):
+        with TemporaryDirectory() as tmpdir:
+            profiler = Profiler(tmpdir, 'parent')
+            profiler.start()
+            thread = Thread(target=lambda: (profiler.start(), spin(1000)))
+            thread.start()
+            thread.join()
+            busy(1000)
+            self.assertEqual(join(tmpdir, 'parent.pstats'), profiler.dump())
+            functions = {name for _, _, name in pstats.Stats(profiler.path).stats}
+            self.assertIn('busy', functions)
+            self.assertIn('spin', functions)
+            self.assertIsNone(profiler.dump())
+
+    def test_start_worker_profile(self):
+        with TemporaryDirectory() as tmpdir, \
+                mock.patch('avroconvert.profiling.Finalize') as mock_finalize:
+            profiler = start_worker_profile(tmpdir)
+            mock_finalize.assert_called_once_with(None, profiler.dump, exitpriority=10)
+            profiler.dump()
+            self.assertEqual(1, len([name for name in listdir(tmpdir) if name.startswith('worker-')]))
+
+    def test_merge_profiles(self):
+        with TemporaryDirectory() as tmpdir:
+            self.assertIsNone(merge_profiles(tmpdir))
+            for name in ('parent', 'worker-1', 'worker-2'):
+                profiler = Profiler(tmpdir, name)
+                profiler.start()
+                busy(1000)
+                profiler.dump()
+
+            report_path = merge_profiles(tmpdir, top=5)
+
+            self.assertEqual(join(tmpdir, 'profile.txt'), report_path)
+            with open(report_path) as f:
+                report = f.read()
+            self.assertIn('Merged profile of 3 processes: parent.pstats, worker-1.pstats, worker-2.pstats', report)
+            self.assertIn('Own time per package of the parent process', report)
+            self.assertIn('Own time per package of the worker processes', report)
+            self.assertIn('Top 5 functions by own time', report)
+            self.assertEqual(3, pstats.Stats(join(tmpdir, 'merged.pstats')).stats[(__file__, 10, 'busy')][0])
+
+            clear_profiles(tmpdir)
+            self.assertEqual(['profile.txt'], listdir(tmpdir))
+
+    def test_package(self):
+        self.assertEqual('pyarrow', _package(('/venv/lib/python3.11/site-packages/pyarrow/parquet/core.py',
+                                              1200, 'write_table')))
+        self.assertEqual('avroconvert', _package(('/src/avroconvert/schema.py', 165, 'to_batches')))
+        self.assertEqual('stdlib', _package(('/usr/lib/python3.11/json/decoder.py', 332, 'decode')))
+        self.assertEqual('posix', _package(('~', 0, '<built-in method posix.read>')))
+        self.assertEqual('_thread', _package(('~', 0, "<method 'acquire' of '_thread.lock' objects>")))
+        self.assertEqual('builtins', _package(('~', 0, "<method 'extend' of 'list' objects>")))
@@ -0,0 +1,84 @@
+from unittest import TestCase, mock
+from avroconvert.sources.ranges import SharedReads, read_ranges
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import time
+
+
+class TestRanges(TestCase):
+
+    def test_read_ranges(self):
+        data = bytes(range(100))
+        parts = list(read_ranges(lambda start, end: data[start:end + 1], len(data), part_size=30))
+        self.assertEqual([30, 30, 30, 10], [len(part) for part in parts])
+        self.assertEqual(data, b''.join(parts))
+
+    def test_read_ranges_bounds_reads_in_flight(self):
+        lock, running, max_running = Lock(), [0], [0]
+
+        def read_range(start, end):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return bytes(end - start + 1)
+
+        parts = list(read_ranges(read_range, 100, part_size=10, concurrency=3))
+
+        self.assertEqual(10, len(parts))
+        self.assertLessEqual(max_running[0], 3)
+
+    def test_read_ranges_shares_reads_in_flight(self):
+        lock, running, max_running = Lock(), [0], [0]
+
+        def read_range(start, end):
+            with lock:
+                running[0] += 1
+                max_running[0] = max(max_running[0], running[0])
+            time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return bytes(end - start + 1)
+
+        shared = SharedReads(4)
+        # Each file could run 4 reads, but the 8 files share 4
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            sizes = list(pool.map(lambda _: sum(map(len, read_ranges(read_range, 100, part_size=10, concurrency=4,
+                                                                     shared=shared))), range(8)))
+
+        self.assertEqual([100] * 8, sizes)
+        self.assertLessEqual(max_running[0], 4)
+        self.assertEqual(2, shared.read(lambda x: x + 1, 1))
+        # Every slot was released
+        for _ in range(4):
+            self.assertTrue(shared.slots.acquire(blocking=False))
+
+    def test_read_ranges_releases_slots(self):
+        shared = SharedReads(2)
+        parts = read_ranges(lambda start, end: bytes(end - start + 1), 100, part_size=10, shared=shared)
+        next(parts)
+        parts.close()
+        for _ in range(2):
+            self.assertTrue(shared.slots.acquire(blocking=False))
+
+    @mock.patch('avroconvert.sources.retry.time.sleep')
+    def test_read_ranges_w_retries(self, mock_sleep):
+        data = bytes(range(100))
+        reads = list()
+
+        def read_range(start, end):
+            reads.append(start)
+            if start == 30 and reads.count(30) == 1:
+                raise ConnectionResetError('Connection reset by peer')
+            return data[start:end + 1]
+
+        self.assertEqual(data, b''.join(read_ranges(read_range, len(data), part_size=30, concurrency=1)))
+        # Only the part which failed is read again
+        self.assertEqual([0, 30, 30, 60, 90], reads)
+        with self.assertRaises(ConnectionResetError):
+            list(read_ranges(mock.Mock(side_effect=ConnectionResetError()), len(data), part_size=30, retries=1))
+
+    def test_read_ranges_empty(self):
+        self.assertEqual([], list(read_ranges(lambda start, end: b'', 0)))
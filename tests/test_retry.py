@@ -0,0 +1,68 @@
+from unittest import TestCase, mock
+from avroconvert.sources.retry import is_transient, with_retries
+
+
+class ClientError(Exception):
+    '''
+    Stand-in of botocore's ClientError
+    '''
+
+    def __init__(self, code: str, status: int):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}, 'ResponseMetadata': {'HTTPStatusCode': status}}
+
+
+class GoogleAPICallError(Exception):
+    '''
+    Stand-in of google-api-core's GoogleAPICallError
+    '''
+
+    def __init__(self, code: int):
+        super().__init__(code)
+        self.code = code
+
+
+class ResponseStreamingError(Exception):
+    pass
+
+
+class TestRetry(TestCase):
+
+    def test_is_transient(self):
+        self.assertTrue(is_transient(ConnectionResetError('Connection reset by peer')))
+        self.assertTrue(is_transient(TimeoutError()))
+        self.assertTrue(is_transient(ResponseStreamingError()))
+        self.assertTrue(is_transient(ClientError('SlowDown', 503)))
+        self.assertTrue(is_transient(ClientError('Throttling', 400)))
+        self.assertTrue(is_transient(ClientError('InternalError', 500)))
+        self.assertTrue(is_transient(GoogleAPICallError(429)))
+        self.assertTrue(is_transient(GoogleAPICallError(503)))
+        self.assertFalse(is_transient(ClientError('NoSuchKey', 404)))
+        self.assertFalse(is_transient(ClientError('AccessDenied', 403)))
+        self.assertFalse(is_transient(GoogleAPICallError(404)))
+        self.assertFalse(is_transient(FileNotFoundError()))
+        self.assertFalse(is_transient(ValueError()))
+
+    @mock.patch('avroconvert.sources.retry.time.sleep')
+    def test_with_retries(self, mock_sleep):
+        function = mock.Mock(side_effect=[ConnectionError(), ClientError('SlowDown', 503), b'data'])
+
+        self.assertEqual(b'data', with_retries(function, 'file.avro', retries=3, backoff=1, start=0))
+
+        function.assert_called_with('file.avro', start=0)
+        self.assertEqual(3, function.call_count)
+        waits = [call.args[0] for call in mock_sleep.call_args_list]
+        self.assertEqual(2, len(waits))
+        self.assertTrue(0 <= waits[0] <= 1 and 0 <= waits[1] <= 2)
+
+    @mock.patch('avroconvert.sources.retry.time.sleep')
+    def test_with_retries_gives_up(self, mock_sleep):
+        function = mock.Mock(side_effect=ConnectionError('Connection reset'))
+        with self.assertRaises(ConnectionError):
+            with_retries(function, retries=2)
+        self.assertEqual(3, function.call_count)
+
+        function = mock.Mock(side_effect=ClientError('NoSuchKey', 404))
+        with self.assertRaises(ClientError):
+            with_retries(function, retries=2)
+        self.assertEqual(1, function.call_count)
@@ -0,0 +1,122 @@
+from unittest import TestCase, mock, skipIf
+from avroconvert.sources.s3.reader import S3
+from io import BytesIO
+
+try:
+    import moto.server
+except ImportError:
+    moto = None
+
+
+class TestS3Reader(TestCase):
+
+    @mock.patch('avroconvert.sources.s3.reader.bt')
+    def test_auth(self, mock_bt):
+        S3(bucket='test-bucket', download_concurrency=32, endpoint_url='http://localhost:5000')
+        kwargs = mock_bt.resource.call_args.kwargs
+        self.assertEqual('http://localhost:5000', kwargs['endpoint_url'])
+        self.assertEqual(32, kwargs['config'].max_pool_connections)
+        mock_bt.resource().Bucket.assert_called_with('test-bucket')
+
+    @mock.patch('avroconvert.sources.s3.reader.bt')
+    def test_read_files_w_ranges(self, mock_bt):
+        data = bytes(range(256)) * 4
+        s3_reader = S3(bucket='test-bucket', part_size=300)
+
+        def get_object(Bucket, Key, Range=None):
+            start, end = map(int, Range[len('bytes='):].split('-'))
+            return {'Body': BytesIO(data[start:end + 1])}
+        s3_reader.client.meta.client.get_object.side_effect = get_object
+
+        self.assertEqual(data, s3_reader._read_files('test.avro', size=len(data)))
+        self.assertEqual(['bytes=0-299', 'bytes=300-599', 'bytes=600-899', 'bytes=900-1023'],
+                         sorted(call.kwargs['Range'] for call in
+                                s3_reader.client.meta.client.get_object.call_args_list))
+
+    @mock.patch('avroconvert.sources.s3.reader.bt')
+    def test_read_files_small(self, mock_bt):
+        s3_reader = S3(bucket='test-bucket', part_size=300)
+        s3_reader.client.meta.client.get_object.return_value = {'Body': BytesIO(b'data')}
+
+        self.assertEqual(b'data', s3_reader._read_files('test.avro', size=4))
+        s3_reader.client.meta.client.get_object.assert_called_once_with(Bucket='test-bucket', Key='test.avro')
+
+    @mock.patch('avroconvert.sources.s3.reader.bt')
+    def test_extract_raw_data(self, mock_bt):
+        s3_reader = S3(bucket='test-bucket', download_concurrency=4)
+        s3_reader.client.objects.filter.return_value = [
+            mock.Mock(key=f'file{i}.avro', size=5) for i in range(10)] + [mock.Mock(key='file.txt', size=5)]
+        s3_reader.client.meta.client.get_object.side_effect = \
+            lambda Bucket, Key, IfMatch: {'Body': BytesIO(Key.encode())}
+
+        extract_response = s3_reader._extract_raw_data()
+
+        s3_reader.client.objects.filter.assert_called_once_with(Prefix='')
+        self.assertEqual({f'file{i}.avro': f'file{i}.avro'.encode() for i in range(10)}, extract_response)
+
+    @mock.patch('avroconvert.sources.retry.time.sleep')
+    @mock.patch('avroconvert.sources.s3.reader.bt')
+    def test_download(self, mock_bt, mock_sleep):
+        data = bytes(range(256)) * 4
+        s3_reader = S3(bucket='test-bucket', download_concurrency=2, part_size=300, retries=2)
+        failures = {'bytes=300-599': 1}
+
+        def get_object(Bucket, Key, IfMatch, Range=None):
+            self.assertEqual('"etag"', IfMatch)
+            if failures.get(Range):
+                failures[Range] -= 1
+                raise ConnectionResetError('Connection reset by peer')
+            start, end = map(int, Range[len('bytes='):].split('-'))
+            return {'Body': BytesIO(data[start:end + 1])}
+        s3_reader.client.meta.client.get_object.side_effect = get_object
+
+        fileobj = BytesIO()
+        s3_reader.download('test.avro', fileobj, size=len(data), version='"etag"')
+
+        self.assertEqual(data, fileobj.getvalue())
+        self.assertEqual(['bytes=0-299', 'bytes=300-599', 'bytes=300-599', 'bytes=600-899', 'bytes=900-1023'],
+                         sorted(call.kwargs['Range'] for call in
+                                s3_reader.client.meta.client.get_object.call_args_list))
+        mock_sleep.assert_called_once()
+
+    @mock.patch('avroconvert.sources.retry.time.sleep')
+    @mock.patch('avroconvert.sources.s3.reader.bt')
+    def test_download_wo_size(self, mock_bt, mock_sleep):
+        s3_reader = S3(bucket='test-bucket', retries=1)
+        s3_reader.client.meta.client.get_object.side_effect = [
+            TimeoutError(), {'Body': BytesIO(b'data')}, TimeoutError(), TimeoutError()]
+
+        fileobj = BytesIO()
+        s3_reader.download('test.avro', fileobj)
+        self.assertEqual(b'data', fileobj.getvalue())
+        with self.assertRaises(TimeoutError):
+            s3_reader.download('test.avro', fileobj)
+
+    @skipIf(moto is None, 'moto is not installed')
+    def test_read_files_from_server(self):
+        server = moto.server.ThreadedMotoServer(port=0, verbose=False)
+        server.start()
+        try:
+            host, port = server.get_host_and_port()
+            credentials = dict(access_key='testing', secret_key='testing', session_token='testing')
+            with mock.patch.dict('os.environ', {'AWS_DEFAULT_REGION': 'us-east-1'}):
+                s3_reader = S3(bucket='test-bucket', endpoint_url=f'http://{host}:{port}',
+                               part_size=1024, **credentials)
+                s3_reader.client.create()
+                data = bytes(range(256)) * 20
+                s3_reader.client.put_object(Key='data/large.avro', Body=data)
+                s3_reader.client.put_object(Key='data/small.avro', Body=b'small')
+
+                self.assertEqual({'data/large.avro': data, 'data/small.avro': b'small'}, s3_reader.get_data())
+                fileobj = BytesIO()
+                s3_reader.download('data/large.avro', fileobj)
+                self.assertEqual(data, fileobj.getvalue())
+
+                # Overwritten after it was listed
+                handle = next(handle for handle in s3_reader.list_files() if handle.name == 'data/large.avro')
+                s3_reader.client.put_object(Key='data/large.avro', Body=data[::-1])
+                with self.assertRaises(Exception) as e:
+                    s3_reader.download('data/large.avro', BytesIO(), size=handle.size, version=handle.version)
+                self.assertEqual(412, e.exception.response['ResponseMetadata']['HTTPStatusCode'])
+        finally:
+            server.stop()
@@ -0,0 +1,132 @@
+from unittest import TestCase
+from avroconvert.schema import SchemaConverter, project_schema
+from datetime import date, datetime, timezone
+from decimal import Decimal
+from fastavro import block_reader, parse_schema, writer
+from io import BytesIO
+from uuid import UUID
+import pyarrow as pa
+
+
+class TestSchemaConverter(TestCase):
+
+    def setUp(self):
+        self.schema = parse_schema({
+            'type': 'record', 'name': 'event', 'namespace': 'test', 'fields': [
+                {'name': 'id', 'type': 'long'},
+                {'name': 'score', 'type': ['null', 'double']},
+                {'name': 'kind', 'type': {'type': 'enum', 'name': 'kind', 'symbols': ['A', 'B']}},
+                {'name': 'tags', 'type': {'type': 'array', 'items': 'string'}},
+                {'name': 'attrs', 'type': {'type': 'map', 'values': 'int'}},
+                {'name': 'inner', 'type': {'type': 'record', 'name': 'inner', 'fields': [
+                    {'name': 'x', 'type': 'int'},
+                    {'name': 'any', 'type': ['null', 'int', 'string']}]}},
+                {'name': 'other', 'type': ['null', 'inner']},
+                {'name': 'created', 'type': {'type': 'long', 'logicalType': 'timestamp-millis'}},
+                {'name': 'day', 'type': {'type': 'int', 'logicalType': 'date'}},
+                {'name': 'amount', 'type': {'type': 'bytes', 'logicalType': 'decimal',
+                                            'precision': 10, 'scale': 2}},
+                {'name': 'uid', 'type': {'type': 'string', 'logicalType': 'uuid'}},
+                {'name': 'digest', 'type': {'type': 'fixed', 'name': 'md5', 'size': 16}},
+            ]})
+        self.record = {
+            'id': 1, 'score': None, 'kind': 'B', 'tags': ['a', 'b'], 'attrs': {'k': 1},
+            'inner': {'x': 1, 'any': 5}, 'other': {'x': 2, 'any': 'five'},
+            'created': datetime(2021, 6, 17, tzinfo=timezone.utc), 'day': date(2021, 6, 17),
+            'amount': Decimal('12.34'), 'uid': UUID('12345678123456781234567812345678'),
+            'digest': b'0123456789abcdef'}
+
+    def test_arrow_schema(self):
+        inner = pa.struct([pa.field('x', pa.int32(), nullable=False), pa.field('any', pa.string())])
+        expected = pa.schema([
+            pa.field('id', pa.int64(), nullable=False),
+            pa.field('score', pa.float64()),
+            pa.field('kind', pa.string(), nullable=False),
+            pa.field('tags', pa.list_(pa.string()), nullable=False),
+            pa.field('attrs', pa.map_(pa.string(), pa.int32()), nullable=False),
+            pa.field('inner', inner, nullable=False),
+            pa.field('other', inner),
+            pa.field('created', pa.timestamp('ms', tz='UTC'), nullable=False),
+            pa.field('day', pa.date32(), nullable=False),
+            pa.field('amount', pa.decimal128(10, 2), nullable=False),
+            pa.field('uid', pa.string(), nullable=False),
+            pa.field('digest', pa.binary(16), nullable=False),
+        ])
+        self.assertEqual(expected, SchemaConverter(self.schema).arrow_schema)
+
+    def test_to_batches(self):
+        avro_data = BytesIO()
+        writer(avro_data, self.schema, [self.record] * 5, sync_interval=1)
+        avro_data.seek(0)
+        avro_blocks = block_reader(avro_data)
+        converter = SchemaConverter(avro_blocks.writer_schema)
+
+        batches = list(converter.to_batches(avro_blocks, batch_size=2))
+
+        self.assertEqual([2, 2, 1], [batch.num_rows for batch in batches])
+        row = batches[0].to_pylist()[0]
+        self.assertEqual({'x': 1, 'any': '5'}, row['inner'])
+        self.assertEqual({'x': 2, 'any': 'five'}, row['other'])
+        self.assertEqual([('k', 1)], row['attrs'])
+        self.assertEqual('12345678-1234-5678-1234-567812345678', row['uid'])
+        self.assertEqual(Decimal('12.34'), row['amount'])
+
+    def test_non_record_schema(self):
+        converter = SchemaConverter('long')
+        self.assertEqual(pa.schema([pa.field('value', pa.int64(), nullable=False)]),
+                         converter.arrow_schema)
+        self.assertEqual([{'value': 1}, {'value': 2}], converter.to_batch([1, 2]).to_pylist())
+
+    def test_recursive_schema(self):
+        schema = parse_schema({'type': 'record', 'name': 'node', 'fields': [
+            {'name': 'value', 'type': 'long'}, {'name': 'next', 'type': ['null', 'node']}]})
+        converter = SchemaConverter(schema)
+
+        self.assertEqual(pa.schema([pa.field('value', pa.int64(), nullable=False),
+                                    pa.field('next', pa.string())]), converter.arrow_schema)
+        records = [{'value': 1, 'next': {'value': 2, 'next': None}}, {'value': 3, 'next': None}]
+        self.assertEqual([{'value': 1, 'next': '{"value": 2, "next": null}'}, {'value': 3, 'next': None}],
+                         converter.to_batch(records).to_pylist())
+
+    def test_named_decimal(self):
+        schema = parse_schema({'type': 'record', 'name': 'test', 'fields': [
+            {'name': 'price', 'type': {'type': 'fixed', 'name': 'D', 'size': 8,
+                                       'logicalType': 'decimal', 'precision': 10, 'scale': 2}},
+            {'name': 'cost', 'type': 'D'}]})
+        converter = SchemaConverter(schema)
+
+        self.assertEqual([pa.decimal128(10, 2)] * 2, converter.arrow_schema.types)
+        batch = converter.to_batch([{'price': Decimal('1.50'), 'cost': Decimal('0.25')}])
+        self.assertEqual([{'price': Decimal('1.50'), 'cost': Decimal('0.25')}], batch.to_pylist())
+
+    def test_to_batches_w_record_filter(self):
+        converter = SchemaConverter(self.schema)
+        records = [dict(self.record, id=i) for i in range(5)]
+
+        batches = list(converter.to_batches([records[:3], records[3:]], batch_size=2,
+                                            record_filter=lambda record: record['id'] % 2 == 0))
+
+        self.assertEqual([0, 2, 4], [row['id'] for batch in batches for row in batch.to_pylist()])
+
+    def test_project_schema(self):
+        avro_data = BytesIO()
+        writer(avro_data, self.schema, [self.record])
+        avro_data.seek(0)
+        writer_schema = block_reader(avro_data).writer_schema
+
+        reader_schema = project_schema(writer_schema, ['other', 'id', 'inner'])
+
+        self.assertEqual(['other', 'id', 'inner'], [field['name'] for field in reader_schema['fields']])
+        # The inner record is defined by the first field which uses it
+        self.assertEqual(['null', 'test.inner'], writer_schema['fields'][6]['type'])
+        self.assertEqual('test.inner', reader_schema['fields'][0]['type'][1]['name'])
+        self.assertEqual('test.inner', reader_schema['fields'][2]['type'])
+        avro_data.seek(0)
+        records = [record for block in block_reader(avro_data, reader_schema=reader_schema) for record in block]
+        self.assertEqual([{'other': {'x': 2, 'any': 'five'}, 'id': 1, 'inner': {'x': 1, 'any': 5}}], records)
+
+    def test_project_schema_w_unknown_columns(self):
+        with self.assertRaises(ValueError):
+            project_schema(self.schema, ['id', 'unknown'])
+        with self.assertRaises(ValueError):
+            project_schema('long', ['value'])
@@ -0,0 +1,205 @@
+from unittest import TestCase, mock, skipIf
+from avroconvert import AvroConvert
+from avroconvert.sinks import CompressedWriter, GCSWriter, S3Writer, dataset_filesystem, is_remote, open_output, split_url, \
+    upload_memory
+from fastavro import parse_schema, writer
+from io import BytesIO
+import gzip
+import pyarrow as pa
+from pyarrow.parquet import read_table
+
+try:
+    import boto3
+    import moto.server
+except ImportError:
+    moto = None
+
+MB = 1024 * 1024
+
+
+class TestUrls(TestCase):
+
+    def test_is_remote(self):
+        self.assertTrue(is_remote('s3://bucket/data'))
+        self.assertTrue(is_remote('gs://bucket'))
+        self.assertFalse(is_remote('./data'))
+        self.assertFalse(is_remote('/tmp/s3://data'))
+        self.assertFalse(is_remote(None))
+
+    def test_split_url(self):
+        self.assertEqual(('s3', 'bucket', 'data/file.parquet'), split_url('s3://bucket/data/file.parquet'))
+        self.assertEqual(('gs', 'bucket', ''), split_url('gs://bucket'))
+        with self.assertRaises(ValueError):
+            split_url('s3:///data')
+        with self.assertRaises(ValueError):
+            split_url('hdfs://bucket/data')
+
+    def test_upload_memory(self):
+        self.assertEqual(5 * 16 * MB, upload_memory())
+        self.assertEqual(3 * MB, upload_memory(part_size=MB, concurrency=2))
+
+
+class TestCompressedWriter(TestCase):
+
+    def test_write(self):
+        data = bytes(range(256)) * 100
+        for compression in ('gzip', 'zstd', 'lz4'):
+            sink = BytesIO()
+            with CompressedWriter(sink, compression, chunk_size=1000) as f:
+                for start in range(0, len(data), 300):
+                    f.write(data[start:start + 300])
+                self.assertEqual(len(data), f.tell())
+            self.assertFalse(sink.closed)
+            self.assertLess(len(sink.getvalue()), len(data))
+            self.assertEqual(data, pa.CompressedInputStream(pa.BufferReader(sink.getvalue()), compression).read())
+
+    def test_brotli(self):
+        with self.assertRaises(ValueError):
+            CompressedWriter(BytesIO(), 'brotli')
+
+    def test_write_empty_file(self):
+        sink = BytesIO()
+        with CompressedWriter(sink, 'gzip', compression_level=1):
+            pass
+        self.assertEqual(b'', gzip.decompress(sink.getvalue()))
+
+
+class TestGCSWriter(TestCase):
+
+    def setUp(self):
+        self.bucket = mock.Mock()
+        self.blobs = dict()
+
+        def blob(name):
+            if name not in self.blobs:
+                self.blobs[name] = mock.Mock()
+                self.blobs[name].name = name
+            return self.blobs[name]
+        self.bucket.blob.side_effect = blob
+
+    def test_write(self):
+        with GCSWriter('gs://bucket/data/file.parquet', self.bucket, part_size=4, concurrency=3) as f:
+            for _ in range(40):
+                f.write(b'abcdef')
+            self.assertEqual(240, f.tell())
+
+        parts = sorted(name for name in self.blobs if name != 'data/file.parquet')
+        self.assertEqual(60, len(parts))
+        self.assertTrue(all(name.startswith('data/file.parquet.avroconvert-upload-') for name in parts))
+        self.assertEqual(b'abcd', self.blobs[parts[0]].upload_from_string.call_args.args[0])
+        blob = self.blobs['data/file.parquet']
+        # 32 parts, then the object and the 28 other parts
+        self.assertEqual(2, blob.compose.call_count)
+        first, second = (call.args[0] for call in blob.compose.call_args_list)
+        self.assertEqual([self.blobs[name] for name in parts[:32]], first)
+        self.assertEqual([blob] + [self.blobs[name] for name in parts[32:]], second)
+        for name in parts:
+            self.blobs[name].delete.assert_called_once_with()
+
+    def test_write_small_file(self):
+        with GCSWriter('gs://bucket/file.json', self.bucket) as f:
+            f.write(b'[]')
+        self.assertEqual(['file.json'], list(self.blobs))
+        self.blobs['file.json'].upload_from_string.assert_called_once_with(b'[]')
+
+    def test_abort(self):
+        with self.assertRaises(RuntimeError):
+            with GCSWriter('gs://bucket/file.csv', self.bucket, part_size=4) as f:
+                f.write(b'a' * 10)
+                raise RuntimeError('conversion failed')
+        self.assertTrue(f.closed)
+        # The second part is deleted, or cancelled before it was uploaded
+        self.assertTrue(self.blobs)
+        for blob in self.blobs.values():
+            blob.compose.assert_not_called()
+            blob.delete.assert_called_once_with()
+
+    def test_failed_part(self):
+        self.bucket.blob.side_effect = None
+        self.bucket.blob.return_value.upload_from_string.side_effect = [None, PermissionError('forbidden')]
+        with self.assertRaises(PermissionError):
+            with GCSWriter('gs://bucket/file.csv', self.bucket, part_size=4, concurrency=1, retries=0) as f:
+                f.write(b'a' * 12)
+        self.assertTrue(f.closed)
+        self.bucket.blob.return_value.compose.assert_not_called()
+
+
+@skipIf(moto is None, 'moto is not installed')
+class TestS3Writer(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = moto.server.ThreadedMotoServer(port=0, verbose=False)
+        cls.server.start()
+        host, port = cls.server.get_host_and_port()
+        cls.endpoint_url = f'http://{host}:{port}'
+        cls.environ = mock.patch.dict('os.environ', {'AWS_DEFAULT_REGION': 'us-east-1',
+                                                     'AWS_ACCESS_KEY_ID': 'testing',
+                                                     'AWS_SECRET_ACCESS_KEY': 'testing'})
+        cls.environ.start()
+        cls.client = boto3.client('s3', endpoint_url=cls.endpoint_url)
+        cls.client.create_bucket(Bucket='test-bucket')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.environ.stop()
+        cls.server.stop()
+
+    def _read(self, key: str) -> bytes:
+        return self.client.get_object(Bucket='test-bucket', Key=key)['Body'].read()
+
+    def test_write(self):
+        data = bytes(range(256)) * (12 * MB // 256 + 1)
+        with S3Writer('s3://test-bucket/data/large.bin', self.client, part_size=5 * MB, concurrency=2) as f:
+            for start in range(0, len(data), MB):
+                f.write(data[start:start + MB])
+            self.assertIsNotNone(f.upload_id)
+        self.assertEqual(3, len(f._parts))
+        self.assertEqual(data, self._read('data/large.bin'))
+
+    def test_write_small_file(self):
+        with open_output('s3://test-bucket/small.csv', endpoint_url=self.endpoint_url) as f:
+            f.write(b'id\n1\n')
+        self.assertIsNone(f.upload_id)
+        self.assertEqual(b'id\n1\n', self._read('small.csv'))
+
+    def test_abort(self):
+        with self.assertRaises(RuntimeError):
+            with S3Writer('s3://test-bucket/aborted.bin', self.client, part_size=5 * MB) as f:
+                f.write(b'a' * (6 * MB))
+                raise RuntimeError('conversion failed')
+        self.assertEqual([], self.client.list_multipart_uploads(Bucket='test-bucket').get('Uploads', []))
+        self.assertNotIn('Contents', self.client.list_objects_v2(Bucket='test-bucket', Prefix='aborted'))
+
+    def test_convert_avro(self):
+        schema = {'type': 'record', 'name': 'test', 'fields': [
+            {'name': 'country', 'type': 'string'}, {'name': 'id', 'type': 'long'}]}
+        records = [{'country': 'IN' if i % 2 else 'US', 'id': i} for i in range(100)]
+        avro_data = BytesIO()
+        writer(avro_data, parse_schema(schema), records)
+        storage_options = dict(endpoint_url=self.endpoint_url)
+
+        for dst_format in ('parquet', 'csv', 'json', 'jsonl'):
+            converter = AvroConvert(outfolder='s3://test-bucket/out', dst_format=dst_format,
+                                    storage_options=storage_options)
+            converter.convert_avro('data/file.avro', avro_data.getvalue())
+            self.assertTrue(self._read(f'out/data/file.{dst_format}'))
+        self.assertEqual(records, read_table(BytesIO(self._read('out/data/file.parquet'))).to_pylist())
+
+        converter = AvroConvert(outfolder='s3://test-bucket/dataset', partition_by=['country'],
+                                storage_options=storage_options)
+        converter.convert_avro('data/file.avro', avro_data.getvalue())
+        keys = sorted(obj['Key'] for obj in
+                      self.client.list_objects_v2(Bucket='test-bucket', Prefix='dataset/')['Contents'])
+        self.assertEqual(['dataset/country=IN/data_file-0.parquet', 'dataset/country=US/data_file-0.parquet'], keys)
+        table = read_table(BytesIO(self._read('dataset/country=IN/data_file-0.parquet')))
+        self.assertEqual(list(range(1, 100, 2)), table.column('id').to_pylist())
+
+    def test_dataset_filesystem(self):
+        filesystem, base_dir = dataset_filesystem('s3://test-bucket/tables/', endpoint_url=self.endpoint_url)
+        self.assertEqual('tables', base_dir)
+        with filesystem.open_output_stream('tables/file.txt') as f:
+            f.write(b'data')
+        self.assertEqual(b'data', self._read('tables/file.txt'))
+        with self.assertRaises(NotImplementedError):
+            filesystem.delete_file('tables/file.txt')
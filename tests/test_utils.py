@@ -0,0 +1,45 @@
+from unittest import mock, TestCase
+from avroconvert.utils import available_cpus, parse_size
+from os import makedirs
+from os.path import join
+from tempfile import TemporaryDirectory
+
+
+class TestUtils(TestCase):
+
+    def test_parse_size(self):
+        self.assertEqual(512, parse_size('512'))
+        self.assertEqual(512, parse_size(512))
+        self.assertEqual(64 * 1024, parse_size('64KB'))
+        self.assertEqual(128 * 1024 ** 2, parse_size('128MB'))
+        self.assertEqual(128 * 1024 ** 2, parse_size('128 mib'))
+        self.assertEqual(int(1.5 * 1024 ** 3), parse_size('1.5G'))
+
+    def test_parse_size_w_invalid_size(self):
+        with self.assertRaises(ValueError) as e:
+            parse_size('12 parsecs')
+        self.assertEqual(('Invalid size 12 parsecs',), e.exception.args)
+
+    @mock.patch('avroconvert.utils.os.sched_getaffinity', create=True)
+    def test_available_cpus(self, mock_affinity):
+        mock_affinity.return_value = set(range(8))
+        with TemporaryDirectory() as cgroup_root:
+            self.assertEqual(8, available_cpus(cgroup_root))
+            # cgroup v1
+            makedirs(join(cgroup_root, 'cpu'))
+            with open(join(cgroup_root, 'cpu', 'cpu.cfs_quota_us'), 'w') as f:
+                f.write('250000\n')
+            with open(join(cgroup_root, 'cpu', 'cpu.cfs_period_us'), 'w') as f:
+                f.write('100000\n')
+            self.assertEqual(3, available_cpus(cgroup_root))
+            # cgroup v2
+            with open(join(cgroup_root, 'cpu.max'), 'w') as f:
+                f.write('max 100000\n')
+            self.assertEqual(8, available_cpus(cgroup_root))
+            with open(join(cgroup_root, 'cpu.max'), 'w') as f:
+                f.write('50000 100000\n')
+            self.assertEqual(1, available_cpus(cgroup_root))
+            mock_affinity.return_value = {0}
+            with open(join(cgroup_root, 'cpu.max'), 'w') as f:
+                f.write('400000 100000\n')
+            self.assertEqual(1, available_cpus(cgroup_root))